@@ -1,37 +1,140 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, stream_with_context
 import requests
 import re
 import random
-import csv
-import io
 import json
-from datetime import datetime, timedelta
+import os
+import hashlib
+import tempfile
+import atexit
+import time
+from functools import partial
+from itertools import chain
+from datetime import datetime
 from urllib.parse import quote
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 from db_config import (
     save_multiple_cpe_to_database,
+    open_cpe_record_stream,
+    get_cpe_records_page,
+    count_cpe_records,
     load_db_connections, 
-    save_db_connections,
+    modify_db_connections,
     test_db_connection,
     set_current_db_config,
     get_current_db_config,
+    configure_connection_pool,
+    configure_sqlite_data_dir,
+    resolve_sqlite_path,
+    get_connection_pool_stats,
+    configure_circuit_breaker,
+    get_circuit_breaker_state,
+    check_db_connections,
     is_localhost,
-    ALLOWED_LOCALHOST_NAMES
+    ALLOWED_LOCALHOST_NAMES,
+    DB_BACKENDS,
+    DEFAULT_DB_BACKEND,
+    POOL_MIN_SIZE,
+    POOL_MAX_SIZE,
+    POOL_IDLE_TIMEOUT,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+    BREAKER_MAX_RESET_TIMEOUT,
+    HEALTH_CHECK_DEADLINE,
+    SQLITE_DATA_DIR,
+    INSERT_CHUNK_SIZE,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE
+)
+from cpe_index import CPEIndex
+from cpe_store import open_cpe_store, DEFAULT_STORE_PATH
+from cpe_match import CPEMatcher
+from cpe_parser import parse_cpe_uri
+from cpe_record import RECORD_FIELDS, parse_cpe_record, records_to_dicts
+from cpe_cache import LRUCache, memoize, DEFAULT_CACHE_SIZE
+from json_stream import iter_json_array
+from cpe_export import iter_csv_export, iter_json_export, write_xlsx_export
+from json_provider import init_json_provider, export_dumps
+from cpe_generation import (
+    CPEGenerator,
+    MAX_GENERATION_WORKERS,
+    attach_installation_metadata,
+    generate_installation_metadata
+)
+from jobs import JobManager, DEFAULT_JOB_WORKERS, iter_chunks
+from write_behind import (
+    WriteBehindQueue,
+    QueueFullError,
+    QueueClosedError,
+    DEFAULT_QUEUE_ROWS,
+    DEFAULT_BATCH_ROWS
+)
+from result_store import (
+    open_result_store,
+    DEFAULT_RESULT_STORE_PATH,
+    DEFAULT_RESULT_TTL,
+    DEFAULT_RESULT_MAX_ROWS,
+    DEFAULT_PAGE_ROWS,
+    MAX_PAGE_ROWS
+)
+from metrics import (
+    METRICS,
+    EXPORT_BYTES,
+    ROWS_EXPORTED,
+    ROWS_PRODUCED,
+    STAGE_LATENCY,
+    count_bytes,
+    count_rows,
+    init_app as init_metrics,
+    time_stage
 )
 
 app = Flask(__name__)
 
-# Common vendor names for random generation
-COMMON_VENDORS = [
-    'microsoft', 'google', 'apple', 'oracle', 'adobe', 'mozilla', 
-    'cisco', 'ibm', 'intel', 'hp', 'dell', 'lenovo', 'asus',
-    'samsung', 'sony', 'lg', 'vmware', 'redhat', 'canonical',
-    'apache', 'nginx', 'nodejs', 'python', 'java', 'php'
-]
+# Per-route latency and payload sizes, served in Prometheus format at /metrics
+init_metrics(app, os.environ.get('CPE_METRICS_PATH', '/metrics'))
+
+# JSON encoder for API responses and exports: 'auto' uses orjson when it
+# is installed, 'orjson' or 'stdlib' force one or the other
+JSON_BACKEND = init_json_provider(app, os.environ.get('CPE_JSON_PROVIDER', 'auto'))
 
-PRODUCT_PREFIXES = ['server', 'client', 'pro', 'enterprise', 'professional', 'community', 'standard', 'ultimate']
-PRODUCT_TYPES = ['suite', 'manager', 'viewer', 'editor', 'player', 'reader', 'browser', 'office', 'database', 'framework']
+# Database connection pool limits (one pool per connection config)
+configure_connection_pool(
+    min_size=int(os.environ.get('CPE_DB_POOL_MIN_SIZE', POOL_MIN_SIZE)),
+    max_size=int(os.environ.get('CPE_DB_POOL_MAX_SIZE', POOL_MAX_SIZE)),
+    idle_timeout=int(os.environ.get('CPE_DB_POOL_IDLE_TIMEOUT', POOL_IDLE_TIMEOUT))
+)
+# Fail fast while a database is known to be down instead of waiting out
+# the connection timeout on every request
+configure_circuit_breaker(
+    failure_threshold=int(os.environ.get('CPE_DB_BREAKER_THRESHOLD', BREAKER_FAILURE_THRESHOLD)),
+    reset_timeout=float(os.environ.get('CPE_DB_BREAKER_RESET_TIMEOUT', BREAKER_RESET_TIMEOUT)),
+    max_reset_timeout=float(os.environ.get('CPE_DB_BREAKER_MAX_RESET_TIMEOUT', BREAKER_MAX_RESET_TIMEOUT))
+)
+# SQLite connections may only name files below this directory
+configure_sqlite_data_dir(os.environ.get('CPE_SQLITE_DATA_DIR', SQLITE_DATA_DIR))
+DB_INSERT_CHUNK_SIZE = int(os.environ.get('CPE_DB_INSERT_CHUNK_SIZE', INSERT_CHUNK_SIZE))
+# Upsert saves merge on a content hash instead of appending, so saving the
+# same records twice leaves one row each. Requests opt in with "upsert": true;
+# CPE_DB_UPSERT=1 makes it the default (and the mode of write-behind saves).
+DB_UPSERT_DEFAULT = os.environ.get('CPE_DB_UPSERT', '0').lower() in ('1', 'true')
+
+def save_to_database(records, upsert=DB_UPSERT_DEFAULT):
+    """Bulk insert (or upsert) records into the current database in committed chunks"""
+    return save_multiple_cpe_to_database(records, chunk_size=DB_INSERT_CHUNK_SIZE, upsert=upsert)
+
+# Write-behind saves: acknowledged with a ticket, written by a background
+# flusher in coalesced batches. Requests opt in with "write_behind": true;
+# CPE_WRITE_BEHIND=1 makes it the default.
+WRITE_BEHIND_DEFAULT = os.environ.get('CPE_WRITE_BEHIND', '0').lower() in ('1', 'true')
+WRITE_BEHIND = WriteBehindQueue(
+    save_to_database,
+    max_rows=int(os.environ.get('CPE_WRITE_BEHIND_MAX_ROWS', DEFAULT_QUEUE_ROWS)),
+    batch_rows=int(os.environ.get('CPE_WRITE_BEHIND_BATCH_ROWS', DEFAULT_BATCH_ROWS))
+)
+# Write out everything still queued before the process exits
+atexit.register(WRITE_BEHIND.close)
+
+EXPORT_JSON_DUMPS = export_dumps(JSON_BACKEND)
 
 # CPE Dictionary - Sample CPE entries representing real-world software, hardware and OS
 CPE_DICTIONARY = [
@@ -138,130 +241,114 @@ CPE_DICTIONARY = [
     'cpe:2.3:h:fortinet:fortigate_600e:*:*:*:*:*:*:*:*'
 ]
 
-def parse_cpe_uri(cpe_string):
+# Index over CPE_DICTIONARY, built once at load time
+CPE_INDEX = CPEIndex(CPE_DICTIONARY)
+
+# Local store ingested from the NVD official dictionary (see cpe_store.py).
+# When present it replaces the built-in sample dictionary for all lookups.
+CPE_STORE = open_cpe_store(os.environ.get('CPE_STORE_PATH', DEFAULT_STORE_PATH))
+CPE_SOURCE = CPE_STORE if CPE_STORE is not None else CPE_INDEX
+
+# Nearest-match engine used to correct generated CPEs to real entries;
+# it reads the source on the first match, not at import
+CPE_MATCHER = CPEMatcher(CPE_SOURCE)
+
+# Random generation; worker processes open the same CPE source by path
+CPE_GENERATOR = CPEGenerator(
+    CPE_MATCHER,
+    ('store', CPE_STORE.path) if CPE_STORE is not None else ('dictionary', CPE_DICTIONARY),
+    max_workers=int(os.environ.get('CPE_GENERATION_WORKERS', MAX_GENERATION_WORKERS))
+)
+atexit.register(CPE_GENERATOR.shutdown)
+
+# String seeds are echoed in the X-Generation-Seed header, so they are
+# limited to characters that are safe there
+SEED_PATTERN = re.compile(r'[A-Za-z0-9._:-]{1,128}')
+
+def generation_options(data):
     """
-    Parse CPE URI format (cpe:2.3:a:vendor:product:version:...)
-    Returns dict with parsed components
+    seed and workers for random generation from request data
+    Without a seed a random one is drawn, so the run can be reproduced
+    Returns (seed, workers, error_message)
     """
-    try:
-        if not cpe_string.startswith('cpe:'):
-            return None
-        
-        parts = cpe_string.split(':')
-        if len(parts) < 5:
-            return None
-        
-        # Extract category (part type: a, o, h)
-        part_type = parts[2] if len(parts) > 2 else ''
-        category_map = {
-            'a': 'Application',
-            'o': 'Operating System',
-            'h': 'Hardware'
-        }
-        category = category_map.get(part_type, 'Unknown')
-        
-        result = {
-            'cpe': cpe_string,
-            'category': category,
-            'category_code': part_type,
-            'vendor': parts[3] if len(parts) > 3 and parts[3] != '*' else '',
-            'product': parts[4] if len(parts) > 4 and parts[4] != '*' else '',
-            'version': parts[5] if len(parts) > 5 and parts[5] != '*' else '',
-            'update': parts[6] if len(parts) > 6 and parts[6] != '*' else '',
-            'edition': parts[7] if len(parts) > 7 and parts[7] != '*' else '',
-            'language': parts[8] if len(parts) > 8 and parts[8] != '*' else '',
-            'sw_edition': parts[9] if len(parts) > 9 and parts[9] != '*' else '',
-            'target_sw': parts[10] if len(parts) > 10 and parts[10] != '*' else '',
-            'target_hw': parts[11] if len(parts) > 11 and parts[11] != '*' else '',
-        }
-        
-        # Create other fields description
-        other_fields = []
-        if result['update']:
-            other_fields.append(f"Update: {result['update']}")
-        if result['edition']:
-            other_fields.append(f"Edition: {result['edition']}")
-        if result['language']:
-            other_fields.append(f"Language: {result['language']}")
-        if result['sw_edition']:
-            other_fields.append(f"SW Edition: {result['sw_edition']}")
-        if result['target_sw']:
-            other_fields.append(f"Target SW: {result['target_sw']}")
-        if result['target_hw']:
-            other_fields.append(f"Target HW: {result['target_hw']}")
-        
-        result['other_fields'] = ', '.join(other_fields) if other_fields else 'None'
-        
-        return result
-    except Exception as e:
-        print(f"Error parsing CPE: {e}")
-        return None
+    seed = data.get('seed')
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(63)
+    elif isinstance(seed, bool) or not isinstance(seed, (int, str)):
+        return None, None, 'Seed must be an integer or string'
+    elif isinstance(seed, str) and not SEED_PATTERN.fullmatch(seed):
+        return None, None, 'Seed strings must be 1-128 letters, digits or . _ : -'
+    workers = data.get('workers', 1)
+    if not isinstance(workers, int) or isinstance(workers, bool) or workers < 1:
+        return None, None, 'Workers must be a positive integer'
+    return seed, min(workers, CPE_GENERATOR.max_workers), None
 
-def generate_installation_metadata():
-    """Generate simulated installation metadata"""
-    # Random size between 10MB and 2000MB
-    size_mb = round(random.uniform(10, 2000), 2)
+def check_cpe_with_nvd(cpe_string):
+    """
+    Validate CPE against NVD CPE dictionary
+    Returns True if valid, False otherwise; errors (e.g. from the
+    dictionary store) propagate, so only real answers get cached
+    """
+    # Try to search for the CPE in NVD
+    # Note: In production, you would use NVD API with proper rate limiting
+    # For this implementation, we'll do basic validation
     
-    # Random installation date within last 2 years
-    days_ago = random.randint(0, 730)
-    install_date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d')
+    # Basic format validation
+    if not cpe_string.startswith('cpe:2.3:'):
+        return False
     
-    # Installation location (default C drive)
-    locations = [
-        'C:\\Program Files\\',
-        'C:\\Program Files (x86)\\',
-        'C:\\Users\\Public\\',
-        'C:\\ProgramData\\'
-    ]
-    location = random.choice(locations)
+    parts = cpe_string.split(':')
+    if len(parts) < 6:
+        return False
     
-    return {
-        'size_mb': size_mb,
-        'install_date': install_date,
-        'install_location': location
-    }
+    # Check if vendor and product are not empty
+    if parts[3] == '*' or parts[4] == '*':
+        return False
+    
+    # Check the entry exists when the full NVD dictionary is available
+    if CPE_STORE is not None:
+        return cpe_string in CPE_STORE
+    
+    return True
 
 def validate_cpe_with_nvd(cpe_string):
     """
     Validate CPE against NVD CPE dictionary
-    Returns True if valid, False otherwise
+    Returns True if valid, False otherwise (including on errors)
     """
     try:
-        # Try to search for the CPE in NVD
-        # Note: In production, you would use NVD API with proper rate limiting
-        # For this implementation, we'll do basic validation
-        
-        # Basic format validation
-        if not cpe_string.startswith('cpe:2.3:'):
-            return False
-        
-        parts = cpe_string.split(':')
-        if len(parts) < 6:
-            return False
-        
-        # Check if vendor and product are not empty
-        if parts[3] == '*' or parts[4] == '*':
-            return False
-        
-        return True
+        return check_cpe_with_nvd(cpe_string)
     except Exception as e:
         print(f"Error validating CPE: {e}")
         return False
 
+def search_dictionary_cpe(vendor, product, version=''):
+    """
+    Search the CPE dictionary for entries matching vendor, product, and optionally version
+    Returns list of matching CPEs (empty if none); results are deterministic
+    """
+    if CPE_STORE is not None:
+        return CPE_STORE.search(vendor, product, version)
+    
+    return [
+        cpe for cpe in CPE_INDEX.product_entries(vendor, product)
+        if not version or cpe.split(':')[5].startswith(version)
+    ]
+
 def search_nvd_cpe(vendor, product, version=''):
     """
     Search NVD for CPE entries matching vendor, product, and optionally version
     Returns list of matching CPEs
     """
     try:
-        # Note: This is a simplified implementation
-        # In production, use the official NVD CPE API: https://nvd.nist.gov/developers/products
+        cpes = search_dictionary_cpe(vendor, product, version)
+        if cpes:
+            return cpes
         
-        # For demonstration, generate some sample CPEs
-        cpes = []
+        # Note: This is a simplified implementation
+        # In production, ingest the NVD dictionary with cpe_store.py
         
-        # Generate a few variations
-        base_cpe = f"cpe:2.3:a:{vendor}:{product}:{version if version else '*'}"
+        # For demonstration, generate a few variations
         for i in range(3):
             v = version if version else f"{random.randint(1,10)}.{random.randint(0,9)}.{random.randint(0,9)}"
             cpe = f"cpe:2.3:a:{vendor}:{product}:{v}:*:*:*:*:*:*:*"
@@ -272,177 +359,464 @@ def search_nvd_cpe(vendor, product, version=''):
         print(f"Error searching NVD: {e}")
         return []
 
-def generate_random_cpe():
-    """Generate random CPE with metadata"""
-    vendor = random.choice(COMMON_VENDORS)
-    
-    # Generate product name
-    if random.random() > 0.5:
-        product = f"{random.choice(PRODUCT_PREFIXES)}_{random.choice(PRODUCT_TYPES)}"
-    else:
-        product = f"{vendor}_{random.choice(PRODUCT_TYPES)}"
-    
-    # Generate version
-    major = random.randint(1, 20)
-    minor = random.randint(0, 9)
-    patch = random.randint(0, 99)
-    version = f"{major}.{minor}.{patch}"
+# Bounded caches for the deterministic parse/validate steps of the lookup
+# routes. Size is configurable through the CPE_CACHE_SIZE environment variable.
+CPE_CACHE_SIZE = int(os.environ.get('CPE_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+PARSE_CACHE = LRUCache(CPE_CACHE_SIZE)
+VALIDATE_CACHE = LRUCache(CPE_CACHE_SIZE)
+
+cached_parse_cpe_record = memoize(PARSE_CACHE)(parse_cpe_record)
+# Memoizes the raising variant: a transient error must not be cached as "invalid"
+cached_validate_cpe = memoize(VALIDATE_CACHE)(check_cpe_with_nvd)
+
+# Server-side result sets, so exports can reference a result ID instead of
+# uploading the rows again. Set CPE_RESULT_STORE_PATH to '' to disable.
+RESULT_STORE = open_result_store(
+    os.environ.get('CPE_RESULT_STORE_PATH', DEFAULT_RESULT_STORE_PATH),
+    ttl=int(os.environ.get('CPE_RESULT_TTL', DEFAULT_RESULT_TTL)),
+    max_rows=int(os.environ.get('CPE_RESULT_MAX_ROWS', DEFAULT_RESULT_MAX_ROWS))
+)
+
+def store_result_requested(data):
+    """True when store_result is set in the request body or query string"""
+    value = data.get('store_result') if data and 'store_result' in data else request.args.get('store_result', '')
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+def attach_stored_result(response, records, kind):
+    """Keep the result set in the result store and return its ID in X-Result-Id"""
+    if RESULT_STORE is not None:
+        response.headers['X-Result-Id'] = RESULT_STORE.put(records, kind)
+    return response
+
+def page_options(sort, direction, limit):
+    """
+    Validate sort/direction/page size for paged result reads
+    Returns (sort, descending, limit, error)
+    """
+    if sort and sort not in RECORD_FIELDS:
+        return None, False, 0, f'Invalid sort field: {sort}'
+    if direction not in (None, '', 'asc', 'desc'):
+        return None, False, 0, 'direction must be asc or desc'
+    try:
+        limit = int(limit) if limit not in (None, '') else DEFAULT_PAGE_ROWS
+    except (TypeError, ValueError):
+        return None, False, 0, 'Page size must be an integer'
+    if not 1 <= limit <= MAX_PAGE_ROWS:
+        return None, False, 0, f'Page size must be between 1 and {MAX_PAGE_ROWS}'
+    return sort or None, direction == 'desc', limit, None
+
+def result_page(info, sort=None, descending=False, limit=DEFAULT_PAGE_ROWS, cursor=None, summary=False):
+    """One page of a stored result set as a JSON-ready dict (data + paging metadata)"""
+    records, next_cursor = RESULT_STORE.page(info['id'], sort, descending, cursor, limit)
+    page = {
+        'result_id': info['id'],
+        'total': info['row_count'],
+        'limit': limit,
+        'next_cursor': next_cursor
+    }
+    if cursor is None:
+        page.update(sort=sort, direction='desc' if descending else 'asc')
+    if summary:
+        page.update(RESULT_STORE.summary(info['id']))
+    return records_to_dicts(records), page
+
+def first_page_options(data):
+    """
+    Paging requested in a result-producing request body (page_size, sort,
+    direction); None when not requested or there is no store to page from
+    Returns (options, error)
+    """
+    if RESULT_STORE is None or not data.get('page_size'):
+        return None, None
+    sort, descending, limit, error = page_options(data.get('sort'), data.get('direction'), data.get('page_size'))
+    return (sort, descending, limit), error
+
+def stored_first_page(records, kind, options):
+    """
+    Keep the result set in the result store and return (first page rows,
+    paging metadata); further pages come from GET /api/results/<id>/rows
+    """
+    info = RESULT_STORE.info(RESULT_STORE.put(records, kind))
+    return result_page(info, *options, summary=True)
+
+def lookup_etag(payload):
+    """
+    ETag over the deterministic part of a lookup response
+    The simulated installation metadata is excluded, so the tag is weak
+    """
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+def lookup_cpe(cpe_input):
+    """
+    Validate and parse one user-supplied CPE string through the lookup caches
+    Returns (record, error_message); errors while validating propagate
+    """
+    if not cpe_input:
+        return None, 'CPE string is required'
     
-    # Create CPE string
-    cpe_string = f"cpe:2.3:a:{vendor}:{product}:{version}:*:*:*:*:*:*:*"
+    # Validate CPE
+    if not isinstance(cpe_input, str) or not cached_validate_cpe(cpe_input):
+        return None, 'Invalid CPE format or CPE not found in dictionary'
     
-    # Check if similar CPE exists and adjust if needed
-    similar_cpes = search_nvd_cpe(vendor, product)
-    if similar_cpes and random.random() > 0.5:
-        # Sometimes use a similar existing CPE
-        cpe_string = random.choice(similar_cpes)
+    # Parse CPE
+    record = cached_parse_cpe_record(cpe_input)
+    if not record:
+        return None, 'Failed to parse CPE'
     
-    return {
-        'vendor': vendor,
-        'product': product,
-        'version': version,
-        'cpe': cpe_string,
-        **generate_installation_metadata()
-    }
+    return record, None
+
+def not_modified(etag):
+    """Empty 304 response for a matching If-None-Match"""
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return response
 
 @app.route('/')
 def index():
     """Main page"""
     return render_template('index.html')
 
+def fetch_records(cpe_strings):
+    """
+    Validate and parse dictionary CPE strings into records with simulated
+    installation metadata, skipping any that fail
+    """
+    # Each stage runs over the whole batch, so it is timed once per batch
+    with time_stage('validate'):
+        valid = [cpe_string for cpe_string in cpe_strings if validate_cpe_with_nvd(cpe_string)]
+    with time_stage('parse'):
+        records = [record for record in map(parse_cpe_record, valid) if record]
+    
+    # Add installation metadata for all rows in one call
+    with time_stage('metadata'):
+        records = attach_installation_metadata(records)
+    ROWS_PRODUCED.labels('auto-fetch').inc(len(records))
+    return records
+
 @app.route('/api/auto-fetch-cpe', methods=['POST'])
 def auto_fetch_cpe():
     """
     Auto-fetch CPE entries from CPE dictionary
     Expected input: count (number of CPE entries to fetch, default 10)
+    Optional input: save_to_db, upsert to merge with existing rows instead
+    of appending, and write_behind to queue the save and return a ticket
+    instead of waiting for the database (queued saves use CPE_DB_UPSERT);
+    page_size (with sort, direction) to store the rows and return only the
+    first sorted page, with its paging metadata under "page"
     Tries to evenly distribute h, o, a types
     """
     try:
         data = request.json
         count = data.get('count', 10)
         count = min(max(1, count), 100)  # Limit between 1 and 100
+        paging, error = first_page_options(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         # Check if data should be saved to database
         save_to_db = data.get('save_to_db', False)
         
-        # Separate CPEs by category
-        cpe_by_category = {'a': [], 'o': [], 'h': []}
-        for cpe_string in CPE_DICTIONARY:
-            parts = cpe_string.split(':')
-            if len(parts) > 2:
-                category = parts[2]
-                if category in cpe_by_category:
-                    cpe_by_category[category].append(cpe_string)
-        
-        # Calculate distribution for even split
-        per_category = count // 3
-        remainder = count % 3
-        
-        selected_cpes = []
-        
-        # Select evenly from each category
-        for idx, (category, cpes) in enumerate(cpe_by_category.items()):
-            # Add extra items to first categories for remainder
-            category_count = per_category + (1 if idx < remainder else 0)
-            if cpes:
-                # Select random CPEs from this category
-                available = min(category_count, len(cpes))
-                selected = random.sample(cpes, available)
-                selected_cpes.extend(selected)
-        
-        # If we don't have enough CPEs, fill from any available
-        if len(selected_cpes) < count:
-            all_cpes = [cpe for cpes in cpe_by_category.values() for cpe in cpes]
-            remaining_cpes = [cpe for cpe in all_cpes if cpe not in selected_cpes]
-            if remaining_cpes:
-                additional = min(count - len(selected_cpes), len(remaining_cpes))
-                selected_cpes.extend(random.sample(remaining_cpes, additional))
-        
-        # Shuffle to randomize order
-        random.shuffle(selected_cpes)
-        
-        results = []
-        for cpe_string in selected_cpes:
-            # Validate CPE
-            if validate_cpe_with_nvd(cpe_string):
-                # Parse CPE
-                parsed = parse_cpe_uri(cpe_string)
-                if parsed:
-                    # Add installation metadata
-                    metadata = generate_installation_metadata()
-                    results.append({**parsed, **metadata})
+        # Draw evenly across a/o/h from the dictionary index
+        selected_cpes = CPE_SOURCE.sample_stratified(count)
         
+        results = fetch_records(selected_cpes)
+        if paging:
+            rows, page = stored_first_page(results, 'auto-fetch', paging)
+        else:
+            rows, page = records_to_dicts(results), None
+        
+        body = {'data': rows}
+        if page:
+            body['page'] = page
+        
+        # Queue the save and acknowledge at once with a ticket
+        if save_to_db and results and data.get('write_behind', WRITE_BEHIND_DEFAULT):
+            try:
+                ticket = WRITE_BEHIND.submit(results)
+            except (QueueFullError, QueueClosedError) as e:
+                response = jsonify({'error': str(e)})
+                response.status_code = 503
+                response.headers['Retry-After'] = '1'
+                return response
+            body['database'] = {
+                'queued': True,
+                'ticket_id': ticket.id,
+                'status_url': f'/api/write-behind/{ticket.id}'
+            }
+            response = jsonify(body)
         # Save to database if requested
-        if save_to_db and results:
-            db_result = save_multiple_cpe_to_database(results)
-            return jsonify({
-                'data': results,
-                'database': {
-                    'saved': db_result['success'] > 0,
-                    'success_count': db_result['success'],
-                    'failed_count': db_result['failed'],
-                    'message': db_result.get('message', '')
-                }
-            })
-        
-        return jsonify(results)
+        elif save_to_db and results:
+            db_result = save_to_database(results, upsert=bool(data.get('upsert', DB_UPSERT_DEFAULT)))
+            body['database'] = {
+                'saved': db_result['success'] > 0,
+                'success_count': db_result['success'],
+                'failed_count': db_result['failed'],
+                'inserted': db_result.get('inserted', 0),
+                'updated': db_result.get('updated', 0),
+                'skipped': db_result.get('skipped', 0),
+                'rows_per_sec': db_result.get('rows_per_sec', 0),
+                'errors': db_result.get('errors', []),
+                'message': db_result.get('message', '')
+            }
+            response = jsonify(body)
+        else:
+            # Unpaged results without a save keep the plain array response
+            response = jsonify(body if page else rows)
+        
+        if page:
+            response.headers['X-Result-Id'] = page['result_id']
+        elif store_result_requested(data):
+            attach_stored_result(response, results, 'auto-fetch')
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/fetch-cpe', methods=['POST'])
+@app.route('/api/fetch-cpe', methods=['GET', 'POST'])
 def fetch_cpe():
     """
     Fetch and parse CPE from user input
     Expected input: CPE string or search parameters
+    GET requests (?cpe_string=...) are answered with 304 on a matching If-None-Match
     """
     try:
-        data = request.json
-        cpe_input = data.get('cpe_string', '')
-        
-        if not cpe_input:
-            return jsonify({'error': 'CPE string is required'}), 400
+        data = request.args if request.method == 'GET' else request.json
+        record, error = lookup_cpe(data.get('cpe_string', ''))
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Validate CPE
-        if not validate_cpe_with_nvd(cpe_input):
-            return jsonify({'error': 'Invalid CPE format or CPE not found in dictionary'}), 400
-        
-        # Parse CPE
-        parsed = parse_cpe_uri(cpe_input)
-        if not parsed:
-            return jsonify({'error': 'Failed to parse CPE'}), 400
+        # A client asking for a stored result needs a fresh result ID
+        store_result = store_result_requested(data)
+        etag = lookup_etag(record.to_dict())
+        if not store_result and request.method == 'GET' and request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
         
         # Add installation metadata
-        metadata = generate_installation_metadata()
-        result = {**parsed, **metadata}
-        
-        return jsonify(result)
+        result = record.with_metadata(generate_installation_metadata())
+        ROWS_PRODUCED.labels('fetch').inc()
+        
+        response = jsonify(result.to_dict())
+        response.set_etag(etag, weak=True)
+        if store_result:
+            attach_stored_result(response, [result], 'fetch')
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/search-cpe', methods=['POST'])
+# Result lines buffered per chunk of the bulk lookup response
+BULK_LINES_PER_CHUNK = 100
+
+class BulkInputError(ValueError):
+    """One NDJSON input line that could not be decoded; `line` is its text"""
+    
+    def __init__(self, message, line):
+        super().__init__(message)
+        self.line = line
+
+def iter_bulk_input():
+    """
+    Yield CPE strings from the request body without reading it all into memory
+    Accepts NDJSON (application/x-ndjson, one JSON string or {"cpe_string": ...}
+    per line, plain text lines also accepted), a JSON array, or {"cpe_strings": [...]}
+    A malformed NDJSON line is yielded as a BulkInputError in its place, so
+    the lines after it are still looked up
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl', 'text/plain'):
+        for raw_line in request.stream:
+            line = raw_line.decode('utf-8-sig', errors='replace').strip()
+            if not line:
+                continue
+            if line[0] not in '"{':
+                yield line
+                continue
+            try:
+                yield app.json.loads(line)
+            except ValueError as e:
+                yield BulkInputError(f'Invalid JSON line: {e}', line)
+        return
+    
+    yield from iter_json_array(request.stream, key='cpe_strings')
+
+@app.route('/api/fetch-cpe/bulk', methods=['POST'])
+def fetch_cpe_bulk():
+    """
+    Bulk CPE lookup
+    Streams one NDJSON line per input CPE string, in input order:
+      {"index": 0, "cpe_string": "...", "data": {...}}
+      {"index": 1, "cpe_string": "...", "error": "..."}
+    Neither the input nor the output is held in memory as a whole
+    With ?store_result=1 the successful rows are also kept in the result
+    store under the ID returned in X-Result-Id
+    """
+    result_id = None
+    if RESULT_STORE is not None and store_result_requested(None):
+        result_id = RESULT_STORE.create('bulk')
+    
+    produced = ROWS_PRODUCED.labels('bulk')
+    
+    def generate():
+        lines = []
+        stored = []
+        stored_count = 0
+        found = 0
+        try:
+            for index, item in enumerate(iter_bulk_input()):
+                if isinstance(item, BulkInputError):
+                    record, error, cpe_input = None, str(item), item.line
+                else:
+                    cpe_input = item.get('cpe_string', '') if isinstance(item, dict) else item
+                    try:
+                        record, error = lookup_cpe(cpe_input)
+                    except Exception as e:
+                        record, error = None, f'Lookup failed: {e}'
+                if error:
+                    line = {'index': index, 'cpe_string': cpe_input, 'error': error}
+                else:
+                    result = record.with_metadata(generate_installation_metadata())
+                    line = {'index': index, 'cpe_string': cpe_input, 'data': result.to_dict()}
+                    stored.append(result)
+                    found += 1
+                lines.append(app.json.dumps(line))
+                if len(lines) >= BULK_LINES_PER_CHUNK:
+                    yield '\n'.join(lines) + '\n'
+                    lines = []
+                    if result_id:
+                        stored_count += RESULT_STORE.append(result_id, stored, stored_count)
+                    stored = []
+        except Exception as e:
+            # Headers are already sent; a JSON array body that cannot be
+            # parsed any further is reported as a final line
+            lines.append(app.json.dumps({'error': f'Invalid request body: {e}'}))
+        if result_id:
+            stored_count += RESULT_STORE.append(result_id, stored, stored_count)
+            RESULT_STORE.finish(result_id, stored_count)
+        produced.inc(found)
+        if lines:
+            yield '\n'.join(lines) + '\n'
+    
+    response = app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if result_id:
+        response.headers['X-Result-Id'] = result_id
+    return response
+
+@app.route('/api/search-cpe', methods=['GET', 'POST'])
 def search_cpe():
     """
     Search for CPE entries based on vendor/product
+    GET requests (?vendor=...&product=...) are answered with 304 on a matching
+    If-None-Match when the results come from the CPE dictionary
     """
     try:
-        data = request.json
+        data = request.args if request.method == 'GET' else request.json
         vendor = data.get('vendor', '')
         product = data.get('product', '')
         
         if not vendor or not product:
             return jsonify({'error': 'Vendor and product are required'}), 400
         
-        # Search for CPEs
-        cpes = search_nvd_cpe(vendor, product)
-        
-        results = []
-        for cpe in cpes[:10]:  # Limit to 10 results
-            parsed = parse_cpe_uri(cpe)
-            if parsed:
-                metadata = generate_installation_metadata()
-                results.append({**parsed, **metadata})
+        # Search for CPEs; only dictionary hits are deterministic enough to tag
+        store_result = store_result_requested(data)
+        cpes = search_dictionary_cpe(vendor, product)[:10]  # Limit to 10 results
+        etag = lookup_etag(cpes) if cpes else None
+        if etag and not store_result and request.method == 'GET' and request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        if not cpes:
+            cpes = search_nvd_cpe(vendor, product)[:10]
+        
+        records = [record for record in map(cached_parse_cpe_record, cpes) if record]
+        results = attach_installation_metadata(records)
+        
+        response = jsonify(records_to_dicts(results))
+        if etag:
+            response.set_etag(etag, weak=True)
+        if store_result:
+            attach_stored_result(response, results, 'search')
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """
+    Hit/miss/eviction counters of the lookup caches
+    """
+    return jsonify({
+        'parse': PARSE_CACHE.stats(),
+        'validate': VALIDATE_CACHE.stats(),
+        'results': RESULT_STORE.stats() if RESULT_STORE is not None else None
+    })
+
+def collect_component_metrics():
+    """
+    Counters the caches, connection pools and write-behind queue already
+    keep, read when /metrics is scraped
+    """
+    caches = [('parse', PARSE_CACHE.stats()), ('validate', VALIDATE_CACHE.stats())]
+    yield ('cpe_cache_lookups_total', 'counter', 'Lookup cache hits and misses',
+           [({'cache': name, 'result': result}, stats[key])
+            for name, stats in caches for result, key in (('hit', 'hits'), ('miss', 'misses'))])
+    yield ('cpe_cache_evictions_total', 'counter', 'Entries evicted from the lookup caches',
+           [({'cache': name}, stats['evictions']) for name, stats in caches])
+    yield ('cpe_cache_hit_ratio', 'gauge', 'Hits over lookups since start',
+           [({'cache': name}, stats['hit_ratio']) for name, stats in caches])
+    yield ('cpe_cache_entries', 'gauge', 'Entries held in the lookup caches',
+           [({'cache': name}, stats['size']) for name, stats in caches])
+    
+    pools = get_connection_pool_stats()
+    yield ('cpe_db_pool_connections', 'gauge', 'Pooled database connections by state',
+           [({'pool': pool['label'], 'state': state}, pool[state]) for pool in pools for state in ('idle', 'in_use')])
+    yield ('cpe_db_pool_checkouts_total', 'counter', 'Connections taken from the pool, by how they were obtained',
+           [({'pool': pool['label'], 'source': source}, pool[source]) for pool in pools for source in ('created', 'reused')])
+    yield ('cpe_db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting for a free connection',
+           [({'pool': pool['label']}, pool['timeouts']) for pool in pools])
+    
+    queue = WRITE_BEHIND.stats()
+    yield ('cpe_write_behind_pending_rows', 'gauge', 'Rows waiting in the write-behind queue',
+           [({}, queue['pending_rows'])])
+    yield ('cpe_write_behind_rejected_total', 'counter', 'Saves refused because the write-behind queue was full',
+           [({}, queue['rejected'])])
+
+METRICS.register_collector(collect_component_metrics)
+
+@app.route('/api/results/<result_id>', methods=['GET'])
+def get_result_info(result_id):
+    """
+    Metadata (kind, row count, expiry) of a stored result set
+    """
+    info = RESULT_STORE.info(result_id) if RESULT_STORE is not None else None
+    if info is None:
+        return jsonify({'error': 'Result not found or expired'}), 404
+    return jsonify(info)
+
+@app.route('/api/results/<result_id>/rows', methods=['GET'])
+def get_result_rows(result_id):
+    """
+    One page of a stored result set, sorted on the server
+    Query parameters: sort (any record field), direction (asc/desc),
+    limit (rows per page), cursor (next_cursor of the previous page;
+    it keeps the sort of the first page), summary=1 for distinct
+    vendor/product counts
+    Returns {"data": [...], "page": {"total", "limit", "next_cursor", ...}}
+    """
+    try:
+        info = RESULT_STORE.info(result_id) if RESULT_STORE is not None else None
+        if info is None:
+            return jsonify({'error': 'Result not found or expired'}), 404
         
-        return jsonify(results)
+        sort, descending, limit, error = page_options(
+            request.args.get('sort'), request.args.get('direction'), request.args.get('limit')
+        )
+        if error:
+            return jsonify({'error': error}), 400
+        try:
+            rows, page = result_page(
+                info, sort, descending, limit, request.args.get('cursor') or None,
+                summary=request.args.get('summary', '').lower() in ('1', 'true', 'yes')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'data': rows, 'page': page})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -450,72 +824,131 @@ def search_cpe():
 def generate_random():
     """
     Generate random CPE entries
+    Optional input: seed (same seed, same rows) and workers (processes to use);
+    page_size (with sort, direction) to store the rows and return only the
+    first sorted page as {"data", "page"}
     """
     try:
         data = request.json
         count = data.get('count', 5)
         count = min(count, 50)  # Limit to 50 entries
         
-        results = []
-        for _ in range(count):
-            cpe_data = generate_random_cpe()
-            # Parse the generated CPE to get all fields including category
-            parsed = parse_cpe_uri(cpe_data['cpe'])
-            if parsed:
-                # Merge parsed data with generated metadata
-                results.append({**parsed, **generate_installation_metadata()})
-            else:
-                # Fallback to original data if parsing fails
-                results.append(cpe_data)
-        
-        return jsonify(results)
+        seed, workers, error = generation_options(data)
+        if error:
+            return jsonify({'error': error}), 400
+        paging, error = first_page_options(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        with time_stage('generate'):
+            results = CPE_GENERATOR.generate(count, seed, workers)
+        ROWS_PRODUCED.labels('generate').inc(len(results))
+        
+        if paging:
+            rows, page = stored_first_page(results, 'generate', paging)
+            response = jsonify({'data': rows, 'page': page})
+            response.headers['X-Result-Id'] = page['result_id']
+        else:
+            response = jsonify(records_to_dicts(results))
+            if store_result_requested(data):
+                attach_stored_result(response, results, 'generate')
+        response.headers['X-Generation-Seed'] = str(seed)
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def export_source(data):
+    """
+    Rows to export: the stored result sets named by result_id / result_ids,
+    or else the uploaded data array
+    Each result_ids entry is an ID or {"result_id", "sort", "direction"};
+    sort/direction reproduce the table order shown in the browser
+    Returns (items, total, error_response)
+    """
+    refs = data.get('result_ids') or ([data['result_id']] if data.get('result_id') else [])
+    if not refs:
+        cpe_data = data.get('data', [])
+        return cpe_data, len(cpe_data), None
+    
+    sources = []
+    for ref in refs:
+        if not isinstance(ref, dict):
+            ref = {'result_id': ref, 'sort': data.get('sort'), 'direction': data.get('direction')}
+        if ref.get('sort') and ref['sort'] not in RECORD_FIELDS:
+            return None, 0, (jsonify({'error': f"Invalid sort field: {ref['sort']}"}), 400)
+        info = RESULT_STORE.info(ref.get('result_id')) if RESULT_STORE is not None else None
+        if info is None:
+            return None, 0, (jsonify({'error': 'Result not found or expired'}), 404)
+        sources.append((info, ref))
+    
+    items = chain.from_iterable(
+        RESULT_STORE.iter_records(info['id'], ref.get('sort') or None, ref.get('direction') == 'desc')
+        for info, ref in sources
+    )
+    return items, sum(info['row_count'] for info, _ in sources), None
+
+def export_filename(extension):
+    return f'cpe_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+def download_response(chunks, mimetype, filename):
+    """Streamed file download with the same headers send_file would set"""
+    response = app.response_class(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.cache_control.no_cache = True
+    return response
+
+def export_response(export_format, items, total):
+    """Download response for rows in csv, xlsx or json format"""
+    items = count_rows(items, ROWS_EXPORTED.labels(export_format))
+    export_bytes = EXPORT_BYTES.labels(export_format)
+    export_latency = STAGE_LATENCY.labels(f'export_{export_format}')
+    
+    if export_format == 'csv':
+        # Stream the file in batches instead of building it in memory
+        chunks = count_bytes(iter_csv_export(items), export_bytes, export_latency)
+        return download_response(chunks, 'text/csv', export_filename('csv'))
+    
+    if export_format == 'json':
+        # Stream the header and then the data array item by item
+        export_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        chunks = iter_json_export(items, total, export_date, EXPORT_JSON_DUMPS)
+        chunks = count_bytes(chunks, export_bytes, export_latency)
+        return download_response(chunks, 'application/json', export_filename('json'))
+    
+    # Stream rows through a write-only workbook spooled to a temp file
+    output = tempfile.TemporaryFile()
+    try:
+        with export_latency.time():
+            write_xlsx_export(items, output)
+        export_bytes.inc(output.tell())
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
+    
+    return send_file(
+        output,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=export_filename('xlsx')
+    )
+
 @app.route('/api/export-csv', methods=['POST'])
 def export_csv():
     """
     Export CPE data to CSV
+    Expected input: data (result rows), or result_id / result_ids of stored results
     """
     try:
         data = request.json
-        cpe_data = data.get('data', [])
+        cpe_data, total, error = export_source(data)
+        if error:
+            return error
         
-        if not cpe_data:
+        if not total:
             return jsonify({'error': 'No data to export'}), 400
         
-        # Create CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'CPE', 'Category', 'Vendor', 'Product', 'Version', 
-            'Other Fields', 'Size (MB)', 'Install Date', 'Install Location'
-        ])
-        
-        # Write data
-        for item in cpe_data:
-            writer.writerow([
-                item.get('cpe', ''),
-                item.get('category', ''),
-                item.get('vendor', ''),
-                item.get('product', ''),
-                item.get('version', ''),
-                item.get('other_fields', ''),
-                item.get('size_mb', ''),
-                item.get('install_date', ''),
-                item.get('install_location', '')
-            ])
-        
-        # Prepare response
-        output.seek(0)
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8-sig')),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'cpe_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        )
+        return export_response('csv', cpe_data, total)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -523,72 +956,18 @@ def export_csv():
 def export_xlsx():
     """
     Export CPE data to XLSX (Excel)
+    Expected input: data (result rows), or result_id / result_ids of stored results
     """
     try:
         data = request.json
-        cpe_data = data.get('data', [])
+        cpe_data, total, error = export_source(data)
+        if error:
+            return error
         
-        if not cpe_data:
+        if not total:
             return jsonify({'error': 'No data to export'}), 400
         
-        # Create workbook and worksheet
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "CPE Data"
-        
-        # Define headers
-        headers = [
-            'CPE', 'Category', 'Vendor', 'Product', 'Version', 
-            'Other Fields', 'Size (MB)', 'Install Date', 'Install Location'
-        ]
-        
-        # Style headers
-        header_fill = PatternFill(start_color="667EEA", end_color="667EEA", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        # Write headers
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Write data
-        for row_num, item in enumerate(cpe_data, 2):
-            ws.cell(row=row_num, column=1, value=item.get('cpe', ''))
-            ws.cell(row=row_num, column=2, value=item.get('category', ''))
-            ws.cell(row=row_num, column=3, value=item.get('vendor', ''))
-            ws.cell(row=row_num, column=4, value=item.get('product', ''))
-            ws.cell(row=row_num, column=5, value=item.get('version', ''))
-            ws.cell(row=row_num, column=6, value=item.get('other_fields', ''))
-            ws.cell(row=row_num, column=7, value=item.get('size_mb', ''))
-            ws.cell(row=row_num, column=8, value=item.get('install_date', ''))
-            ws.cell(row=row_num, column=9, value=item.get('install_location', ''))
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Save to BytesIO
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=f'cpe_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        )
+        return export_response('xlsx', cpe_data, total)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -596,33 +975,286 @@ def export_xlsx():
 def export_json():
     """
     Export CPE data to JSON
+    Expected input: data (result rows), or result_id / result_ids of stored results
     """
     try:
         data = request.json
-        cpe_data = data.get('data', [])
+        cpe_data, total, error = export_source(data)
+        if error:
+            return error
         
-        if not cpe_data:
+        if not total:
             return jsonify({'error': 'No data to export'}), 400
         
-        # Format the data for JSON export
-        json_output = {
-            'export_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'total_entries': len(cpe_data),
-            'data': cpe_data
-        }
-        
-        # Convert to JSON string with proper formatting
-        json_string = json.dumps(json_output, ensure_ascii=False, indent=2)
+        return export_response('json', cpe_data, total)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Background jobs for runs beyond the interactive limits (100 fetched /
+# 50 generated); results go to the result store, so jobs need it enabled
+JOB_MAX_COUNT = int(os.environ.get('CPE_JOB_MAX_COUNT', 1000000))
+JOB_MANAGER = (
+    JobManager(RESULT_STORE, int(os.environ.get('CPE_JOB_WORKERS', DEFAULT_JOB_WORKERS)))
+    if RESULT_STORE is not None else None
+)
+if JOB_MANAGER is not None:
+    # Registered after the generator pool and write-behind queue, so at
+    # exit jobs stop first and their last rows are still flushed
+    atexit.register(JOB_MANAGER.shutdown)
+JOB_TYPES = ('auto-fetch', 'generate')
+
+def job_work(job_type, count, seed=None, workers=1):
+    """Chunked producer for a job: yields (processed, records)"""
+    def work():
+        if job_type == 'auto-fetch':
+            for processed, chunk in iter_chunks(CPE_SOURCE.sample_stratified(count)):
+                yield processed, fetch_records(chunk)
+        else:
+            produced = ROWS_PRODUCED.labels('generate')
+            for processed, records in CPE_GENERATOR.iter_blocks(count, seed, workers):
+                produced.inc(len(records))
+                yield processed, records
+    return work
+
+def get_job_or_error(job_id):
+    """Returns (job, error_response)"""
+    if JOB_MANAGER is None:
+        return None, (jsonify({'error': 'Background jobs require the result store (CPE_RESULT_STORE_PATH)'}), 503)
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        return None, (jsonify({'error': 'Job not found'}), 404)
+    return job, None
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Start a background auto-fetch or random-generation run
+    Expected input: type ('auto-fetch' or 'generate'), count, save_to_db, upsert,
+    and for generate jobs optionally seed and workers
+    Returns 202 with the job status; poll GET /api/jobs/<id>
+    """
+    try:
+        if JOB_MANAGER is None:
+            return jsonify({'error': 'Background jobs require the result store (CPE_RESULT_STORE_PATH)'}), 503
         
-        return send_file(
-            io.BytesIO(json_string.encode('utf-8')),
-            mimetype='application/json',
-            as_attachment=True,
-            download_name=f'cpe_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+        data = request.json
+        job_type = data.get('type', '')
+        count = data.get('count', 0)
+        save_to_db = bool(data.get('save_to_db', False))
+        upsert = bool(data.get('upsert', DB_UPSERT_DEFAULT))
+        
+        if job_type not in JOB_TYPES:
+            return jsonify({'error': f"Job type must be one of: {', '.join(JOB_TYPES)}"}), 400
+        if not isinstance(count, int) or not 1 <= count <= JOB_MAX_COUNT:
+            return jsonify({'error': f'Count must be between 1 and {JOB_MAX_COUNT}'}), 400
+        seed, workers, error = generation_options(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        total = min(count, len(CPE_SOURCE)) if job_type == 'auto-fetch' else count
+        params = {'count': count, 'save_to_db': save_to_db}
+        if save_to_db:
+            params['upsert'] = upsert
+        if job_type == 'generate':
+            params.update(seed=seed, workers=workers)
+        job = JOB_MANAGER.submit(
+            job_type, total, job_work(job_type, count, seed, workers),
+            params=params,
+            save=partial(save_to_database, upsert=upsert) if save_to_db else None
+        )
+        response = jsonify(job.to_dict())
+        response.status_code = 202
+        response.headers['Location'] = f'/api/jobs/{job.id}'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """
+    Status of all known jobs, newest first
+    """
+    if JOB_MANAGER is None:
+        return jsonify([])
+    return jsonify([job.to_dict() for job in reversed(JOB_MANAGER.list())])
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Status and progress of a job
+    """
+    job, error = get_job_or_error(job_id)
+    if error:
+        return error
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """
+    Cancel a queued or running job; rows produced so far stay available
+    """
+    job, error = get_job_or_error(job_id)
+    if error:
+        return error
+    JOB_MANAGER.cancel(job_id)
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """
+    Download a finished job's rows
+    Query parameters: format (csv, xlsx or json; default json), sort, direction
+    """
+    try:
+        job, error = get_job_or_error(job_id)
+        if error:
+            return error
+        if not job.done or not job.result_id:
+            return jsonify({'error': f'Job has no result yet (status: {job.status})'}), 409
+        
+        export_format = request.args.get('format', 'json')
+        if export_format not in ('csv', 'xlsx', 'json'):
+            return jsonify({'error': 'Format must be csv, xlsx or json'}), 400
+        
+        items, total, error = export_source({
+            'result_id': job.result_id,
+            'sort': request.args.get('sort'),
+            'direction': request.args.get('direction')
+        })
+        if error:
+            return error
+        return export_response(export_format, items, total)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>/save-to-db', methods=['POST'])
+def save_job_result(job_id):
+    """
+    Save a finished job's rows to the current database as a new background job
+    Optional input: upsert
+    """
+    try:
+        job, error = get_job_or_error(job_id)
+        if error:
+            return error
+        if not job.done or not job.result_id:
+            return jsonify({'error': f'Job has no result yet (status: {job.status})'}), 409
+        
+        info = RESULT_STORE.info(job.result_id)
+        if info is None:
+            return jsonify({'error': 'Result not found or expired'}), 404
+        
+        result_id = job.result_id
+        upsert = bool((request.get_json(silent=True) or {}).get('upsert', DB_UPSERT_DEFAULT))
+        save_job = JOB_MANAGER.submit(
+            'save-to-db', info['row_count'],
+            lambda: iter_chunks(RESULT_STORE.iter_records(result_id)),
+            params={'source_job': job.id, 'result_id': result_id, 'upsert': upsert},
+            save=partial(save_to_database, upsert=upsert), store=False
         )
+        response = jsonify(save_job.to_dict())
+        response.status_code = 202
+        response.headers['Location'] = f'/api/jobs/{save_job.id}'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def record_filters(args):
+    """
+    篩選條件：vendor、product、version（可用 * 萬用字元）與
+    date_from、date_to（YYYY-MM-DD，安裝日期範圍）
+    Returns (filters, error)
+    """
+    filters = {}
+    for name in ('vendor', 'product', 'version'):
+        value = args.get(name, '').strip()
+        if value:
+            filters[name] = value
+    for name in ('date_from', 'date_to'):
+        value = args.get(name, '').strip()
+        if value:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                return None, f'{name} 必須為 YYYY-MM-DD 格式'
+            filters[name] = value
+    return filters, None
+
+@app.route('/api/cpe-records', methods=['GET'])
+def list_cpe_records():
+    """
+    分頁讀取資料庫中的 CPE 記錄
+    查詢參數：篩選條件（見 record_filters）、limit（每頁筆數）、
+    after（上一頁回應的 next_after）
+    """
+    try:
+        filters, error = record_filters(request.args)
+        if error:
+            return jsonify({'error': error}), 400
+        try:
+            limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+            after = request.args.get('after')
+            after = int(after) if after else None
+        except ValueError:
+            return jsonify({'error': 'limit 與 after 必須為整數'}), 400
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify({'error': f'limit 必須介於 1 到 {MAX_PAGE_SIZE}'}), 400
+        
+        page, error = get_cpe_records_page(filters, after, limit)
+        if error:
+            return jsonify({'error': error}), 503
+        page['limit'] = limit
+        return jsonify(page)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/cpe-records/export', methods=['GET'])
+def export_cpe_records():
+    """
+    從資料庫串流匯出 CPE 記錄
+    查詢參數：format（csv、json 或 xlsx，預設 csv）與篩選條件（見 record_filters）
+    """
+    try:
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ('csv', 'json', 'xlsx'):
+            return jsonify({'error': 'format 必須為 csv、json 或 xlsx'}), 400
+        filters, error = record_filters(request.args)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        # JSON 匯出的標頭需要總筆數
+        total = 0
+        if export_format == 'json':
+            total, error = count_cpe_records(filters)
+            if error:
+                return jsonify({'error': error}), 503
+        stream, error = open_cpe_record_stream(filters)
+        if error:
+            return jsonify({'error': error}), 503
+        try:
+            return export_response(export_format, stream, total)
+        except Exception:
+            stream.close()
+            raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/write-behind', methods=['GET'])
+def write_behind_stats():
+    """取得寫入佇列的狀態"""
+    return jsonify(WRITE_BEHIND.stats())
+
+@app.route('/api/write-behind/<ticket_id>', methods=['GET'])
+def write_behind_ticket(ticket_id):
+    """
+    取得寫入佇列中一筆請求的結果
+    status: queued、writing、completed（failed_count 為無法寫入的筆數）或 failed
+    """
+    ticket = WRITE_BEHIND.get(ticket_id)
+    if ticket is None:
+        return jsonify({'error': '找不到此寫入編號（可能已過期）'}), 404
+    return jsonify(ticket.to_dict())
+
 @app.route('/api/db-connections', methods=['GET'])
 def get_db_connections():
     """取得所有已儲存的資料庫連線"""
@@ -634,12 +1266,15 @@ def get_db_connections():
             safe_config = config.copy()
             if 'password' in safe_config:
                 safe_config['password'] = '***' if safe_config['password'] else ''
+            # 熔斷器狀態：closed（正常）、open（暫停連線）或 half_open（試探中）
+            safe_config['circuit_breaker'] = get_circuit_breaker_state(config)
             safe_connections[name] = safe_config
         
         current_config = get_current_db_config()
         return jsonify({
             'connections': safe_connections,
-            'current_connection': current_config.get('name', 'default') if current_config else 'default'
+            'current_connection': current_config.get('name', 'default') if current_config else 'default',
+            'current_circuit_breaker': get_circuit_breaker_state(current_config)
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -654,15 +1289,25 @@ def add_db_connection():
         if not name:
             return jsonify({'error': '連線名稱為必填項目'}), 400
         
-        # 驗證必要欄位
-        required_fields = ['server', 'database']
+        backend = data.get('backend') or DEFAULT_DB_BACKEND
+        if backend not in DB_BACKENDS:
+            return jsonify({'error': f"backend 必須為 {'、'.join(DB_BACKENDS)}"}), 400
+        
+        # 驗證必要欄位（SQLite 的 database 為檔案路徑，不需要伺服器）
+        required_fields = ['database'] if backend == 'sqlite' else ['server', 'database']
         for field in required_fields:
             if not data.get(field):
                 return jsonify({'error': f'{field} 為必填項目'}), 400
         
+        # SQLite 的檔案必須位於資料目錄之下
+        if backend == 'sqlite':
+            _, error_msg = resolve_sqlite_path(data.get('database'))
+            if error_msg:
+                return jsonify({'error': error_msg}), 400
+        
         # 驗證伺服器位址是否為本地主機
         server = data.get('server')
-        if not is_localhost(server):
+        if backend == 'sqlserver' and not is_localhost(server):
             error_msg = f"❌ 安全限制：此應用程式僅支援連線到本地資料庫\n"
             error_msg += f"您嘗試設定的伺服器: {server}\n\n"
             error_msg += "🔒 允許的本地伺服器位址:\n"
@@ -673,29 +1318,28 @@ def add_db_connection():
             error_msg += "   • 如果您使用 SQL Server Express，可以嘗試 'localhost\\SQLEXPRESS'\n"
             return jsonify({'error': error_msg}), 400
         
-        # 載入現有連線
-        connections = load_db_connections()
-        
         # 建立連線配置
         connection_config = {
             'name': name,
-            'server': data.get('server'),
+            'backend': backend,
+            'server': data.get('server', ''),
             'database': data.get('database'),
             'username': data.get('username', ''),
             'password': data.get('password', ''),
             'trusted_connection': data.get('trusted_connection', False)
         }
         
-        # 儲存連線
-        connections[name] = connection_config
+        # 儲存連線（在檔案鎖內讀取最新設定後寫回）
+        def store(connections):
+            connections[name] = connection_config
         
-        if save_db_connections(connections):
-            return jsonify({
-                'success': True,
-                'message': f'連線 "{name}" 已儲存'
-            })
-        else:
+        _, error = modify_db_connections(store)
+        if error:
             return jsonify({'error': '儲存連線失敗'}), 500
+        return jsonify({
+            'success': True,
+            'message': f'連線 "{name}" 已儲存'
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -710,11 +1354,18 @@ def update_db_connection(name):
             return jsonify({'error': f'連線 "{name}" 不存在'}), 404
         
         # 更新連線配置
-        connection_config = connections[name]
+        if 'backend' in data and data['backend'] not in DB_BACKENDS:
+            return jsonify({'error': f"backend 必須為 {'、'.join(DB_BACKENDS)}"}), 400
+        backend = data.get('backend') or connections[name].get('backend') or DEFAULT_DB_BACKEND
+        if backend == 'sqlite':
+            # SQLite 的檔案必須位於資料目錄之下
+            _, error_msg = resolve_sqlite_path(data.get('database', connections[name].get('database')))
+            if error_msg:
+                return jsonify({'error': error_msg}), 400
         if 'server' in data:
             # 驗證伺服器位址是否為本地主機
             server = data['server']
-            if not is_localhost(server):
+            if backend == 'sqlserver' and not is_localhost(server):
                 error_msg = f"❌ 安全限制：此應用程式僅支援連線到本地資料庫\n"
                 error_msg += f"您嘗試設定的伺服器: {server}\n\n"
                 error_msg += "🔒 允許的本地伺服器位址:\n"
@@ -724,25 +1375,27 @@ def update_db_connection(name):
                 error_msg += "   • 請將伺服器位址改為 'localhost' 或 '127.0.0.1'\n"
                 error_msg += "   • 如果您使用 SQL Server Express，可以嘗試 'localhost\\SQLEXPRESS'\n"
                 return jsonify({'error': error_msg}), 400
-            connection_config['server'] = data['server']
-        if 'database' in data:
-            connection_config['database'] = data['database']
-        if 'username' in data:
-            connection_config['username'] = data['username']
-        if 'password' in data and data['password']:  # Only update password if provided
-            connection_config['password'] = data['password']
-        if 'trusted_connection' in data:
-            connection_config['trusted_connection'] = data['trusted_connection']
-        
-        connections[name] = connection_config
-        
-        if save_db_connections(connections):
-            return jsonify({
-                'success': True,
-                'message': f'連線 "{name}" 已更新'
-            })
-        else:
+        
+        def update(connections):
+            # 其他行程可能已刪除此連線
+            if name not in connections:
+                return False
+            connection_config = connections[name]
+            for field in ('backend', 'server', 'database', 'username', 'trusted_connection'):
+                if field in data:
+                    connection_config[field] = data[field]
+            if 'password' in data and data['password']:  # Only update password if provided
+                connection_config['password'] = data['password']
+        
+        updated, error = modify_db_connections(update)
+        if error:
             return jsonify({'error': '更新連線失敗'}), 500
+        if updated is False:
+            return jsonify({'error': f'連線 "{name}" 不存在'}), 404
+        return jsonify({
+            'success': True,
+            'message': f'連線 "{name}" 已更新'
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -750,20 +1403,20 @@ def update_db_connection(name):
 def delete_db_connection(name):
     """刪除資料庫連線設定"""
     try:
-        connections = load_db_connections()
-        
-        if name not in connections:
-            return jsonify({'error': f'連線 "{name}" 不存在'}), 404
-        
-        del connections[name]
+        def delete(connections):
+            if name not in connections:
+                return False
+            del connections[name]
         
-        if save_db_connections(connections):
-            return jsonify({
-                'success': True,
-                'message': f'連線 "{name}" 已刪除'
-            })
-        else:
+        deleted, error = modify_db_connections(delete)
+        if error:
             return jsonify({'error': '刪除連線失敗'}), 500
+        if deleted is False:
+            return jsonify({'error': f'連線 "{name}" 不存在'}), 404
+        return jsonify({
+            'success': True,
+            'message': f'連線 "{name}" 已刪除'
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -773,15 +1426,26 @@ def test_connection():
     try:
         data = request.json
         
-        # 驗證必要欄位
-        required_fields = ['server', 'database']
+        backend = data.get('backend') or DEFAULT_DB_BACKEND
+        if backend not in DB_BACKENDS:
+            return jsonify({'error': f"backend 必須為 {'、'.join(DB_BACKENDS)}"}), 400
+        
+        # 驗證必要欄位（SQLite 的 database 為檔案路徑，不需要伺服器）
+        required_fields = ['database'] if backend == 'sqlite' else ['server', 'database']
         for field in required_fields:
             if not data.get(field):
                 return jsonify({'error': f'{field} 為必填項目'}), 400
         
+        # SQLite 的檔案必須位於資料目錄之下
+        if backend == 'sqlite':
+            _, error_msg = resolve_sqlite_path(data.get('database'))
+            if error_msg:
+                return jsonify({'error': error_msg}), 400
+        
         # 建立測試配置
         test_config = {
-            'server': data.get('server'),
+            'backend': backend,
+            'server': data.get('server', ''),
             'database': data.get('database'),
             'username': data.get('username', ''),
             'password': data.get('password', ''),
@@ -797,6 +1461,51 @@ def test_connection():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/db-connections/pool-stats', methods=['GET'])
+def db_pool_stats():
+    """取得資料庫連線池的統計資訊"""
+    try:
+        return jsonify({'pools': get_connection_pool_stats()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Upper bound for the ?deadline= of a health check
+MAX_HEALTH_CHECK_DEADLINE = 60
+
+@app.route('/api/db-connections/health', methods=['GET'])
+def db_connections_health():
+    """
+    Check every saved connection at once on a bounded thread pool
+    Streams one NDJSON line per connection as its check finishes:
+      {"name": "...", "status": "ok", "latency_ms": 12.3, "circuit_breaker": {...}}
+      {"name": "...", "status": "error", "error": "...", "suggestion": "...", ...}
+    Connections still unfinished at ?deadline= seconds (default
+    HEALTH_CHECK_DEADLINE) are reported with status "timeout", then a
+    final {"summary": {...}} line closes the stream
+    """
+    try:
+        deadline = float(request.args.get('deadline', HEALTH_CHECK_DEADLINE))
+    except ValueError:
+        return jsonify({'error': 'deadline must be a number of seconds'}), 400
+    if not 0 < deadline <= MAX_HEALTH_CHECK_DEADLINE:
+        return jsonify({'error': f'deadline must be between 0 and {MAX_HEALTH_CHECK_DEADLINE} seconds'}), 400
+    
+    try:
+        connections = load_db_connections()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        start = time.monotonic()
+        summary = {'total': len(connections), 'ok': 0, 'error': 0, 'timeout': 0}
+        for result in check_db_connections(connections, deadline=deadline):
+            summary[result['status']] += 1
+            yield app.json.dumps(result) + '\n'
+        summary['elapsed_ms'] = round((time.monotonic() - start) * 1000, 1)
+        yield app.json.dumps({'summary': summary}) + '\n'
+    
+    return app.response_class(generate(), mimetype='application/x-ndjson')
+
 @app.route('/api/db-connections/set-current', methods=['POST'])
 def set_current_connection():
     """設定目前使用的資料庫連線"""
@@ -823,6 +1532,5 @@ def set_current_connection():
 
 if __name__ == '__main__':
     # Note: For production deployment, set debug=False and use a production WSGI server
-    import os
     debug_mode = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     app.run(debug=debug_mode, host='0.0.0.0', port=5000)
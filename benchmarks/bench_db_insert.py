@@ -0,0 +1,126 @@
+# bench_db_insert.py - Bulk insert, upsert and streamed read throughput on the SQLite backend
+"""
+Usage:
+    python benchmarks/bench_db_insert.py [count] [--chunks 100 1000 10000]
+
+Runs against a temporary SQLite database, so neither SQL Server nor
+pyodbc is needed. Each run starts from an empty table.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_config
+from db_config import (
+    CPE_RECORDS_TABLE,
+    close_connection_pool,
+    configure_sqlite_data_dir,
+    get_db_connection,
+    open_cpe_record_stream,
+    save_multiple_cpe_to_database,
+    set_current_db_config
+)
+
+
+def sample_rows(count):
+    rng = random.Random(1)
+    # Unique product names, so upsert keys do not collide
+    return [
+        {
+            'vendor': f'vendor{rng.randrange(500)}',
+            'product': f'product_{index}',
+            'version': f'{rng.randrange(20)}.{rng.randrange(10)}',
+            'size_mb': round(rng.uniform(10, 2000), 2),
+            'install_date': f'2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}',
+            'install_location': 'C:\\Program Files\\'
+        }
+        for index in range(count)
+    ]
+
+
+def clear_table():
+    conn, error = get_db_connection(create=True)
+    if error:
+        raise SystemExit(error)
+    conn.execute("DELETE FROM " + CPE_RECORDS_TABLE)
+    conn.commit()
+    conn.close()
+
+
+def single_transaction(rows):
+    """The former path: one executemany over everything, one commit"""
+    conn, _ = get_db_connection()
+    conn.cursor().executemany(
+        "INSERT INTO " + CPE_RECORDS_TABLE + " "
+        "(vendor, product_name, version, other_fields, size_mb, install_date, install_path) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [db_config._cpe_insert_row(row) for row in rows]
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('count', nargs='?', type=int, default=200_000)
+    parser.add_argument('--chunks', nargs='+', type=int, default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    rows = sample_rows(args.count)
+    with tempfile.TemporaryDirectory() as directory:
+        configure_sqlite_data_dir(directory)
+        set_current_db_config({'backend': 'sqlite', 'database': 'bench.db'}, shared=False)
+        print(f"{args.count:,} rows, SQLite (WAL)")
+
+        clear_table()
+        start = time.perf_counter()
+        single_transaction(rows)
+        rate = args.count / (time.perf_counter() - start)
+        print(f"  {'single executemany':<26} {rate:12,.0f} rows/s")
+
+        for chunk_size in args.chunks:
+            clear_table()
+            result = save_multiple_cpe_to_database(rows, chunk_size=chunk_size)
+            print(f"  {f'chunked, {chunk_size} rows':<26} {result['rows_per_sec']:12,} rows/s"
+                  f"  ({result['chunks']} commits)")
+
+        # Upsert into an empty table, the same rows again, then with 10% changed
+        clear_table()
+        changed = [dict(row, size_mb=row['size_mb'] + 1) if index % 10 == 0 else row
+                   for index, row in enumerate(rows)]
+        for label, batch in (('upsert, new rows', rows), ('upsert, unchanged', rows),
+                             ('upsert, 10% changed', changed)):
+            result = save_multiple_cpe_to_database(batch, upsert=True)
+            print(f"  {label:<26} {result['rows_per_sec']:12,} rows/s"
+                  f"  ({result['inserted']:,} inserted, {result['updated']:,} updated,"
+                  f" {result['skipped']:,} skipped)")
+
+        # Every 100th row is bad; the bisecting retry isolates only those
+        bad_rows = [dict(row) for row in rows]
+        for row in bad_rows[::100]:
+            row['vendor'] = None
+        conn, _ = get_db_connection()
+        conn.execute("CREATE TRIGGER bench_reject BEFORE INSERT ON " + CPE_RECORDS_TABLE +
+                     " WHEN NEW.vendor IS NULL BEGIN SELECT RAISE(ABORT, 'vendor is required'); END")
+        conn.commit()
+        conn.close()
+        clear_table()
+        result = save_multiple_cpe_to_database(bad_rows)
+        print(f"  {'chunked, 1% bad rows':<26} {result['rows_per_sec']:12,} rows/s"
+              f"  ({result['success']:,} saved, {result['failed']:,} failed)")
+
+        start = time.perf_counter()
+        stream, error = open_cpe_record_stream({})
+        read = sum(1 for _ in stream)
+        rate = read / (time.perf_counter() - start)
+        print(f"  {'streamed read':<26} {rate:12,.0f} rows/s")
+        close_connection_pool()
+
+
+if __name__ == '__main__':
+    main()
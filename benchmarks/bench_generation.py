@@ -0,0 +1,66 @@
+# bench_generation.py - Random CPE generation throughput by worker count
+"""
+Usage:
+    python benchmarks/bench_generation.py [count] [--store cpe_dictionary.db] [--workers 1 2 4]
+
+Without --store the built-in sample dictionary is used. Worker counts
+default to powers of two up to the CPU count. Pool start-up (including
+building each worker's matcher) is excluded by a warm-up run. The first
+line is the former serial path, which drew installation metadata row by
+row instead of once per block.
+"""
+import argparse
+import os
+import sys
+import random
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cpe_generation import CPEGenerator, open_source, generate_random_cpe, GENERATION_BLOCK_SIZE
+from cpe_match import CPEMatcher
+
+
+def default_workers():
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('count', nargs='?', type=int, default=100_000)
+    parser.add_argument('--store')
+    parser.add_argument('--workers', nargs='+', type=int, default=default_workers())
+    args = parser.parse_args()
+
+    if args.store:
+        spec = ('store', args.store)
+    else:
+        from app import CPE_DICTIONARY
+        spec = ('dictionary', CPE_DICTIONARY)
+    generator = CPEGenerator(CPEMatcher(open_source(spec)), spec, max_workers=max(args.workers))
+
+    print(f"{args.count:,} rows, {os.cpu_count()} CPUs, source: {spec[0]}")
+    rng, today = random.Random(1), datetime.now()
+    start = time.perf_counter()
+    [generate_random_cpe(generator.matcher, rng, today) for _ in range(args.count)]
+    baseline = args.count / (time.perf_counter() - start)
+    print(f"  {'per-row metadata':<16} {baseline:10,.0f} rows/s  {1:5.2f}x")
+    for workers in args.workers:
+        if workers > 1:
+            generator.generate(GENERATION_BLOCK_SIZE * workers, seed=0, workers=workers)
+        start = time.perf_counter()
+        generator.generate(args.count, seed=1, workers=workers)
+        rate = args.count / (time.perf_counter() - start)
+        print(f"  {f'workers={workers}':<16} {rate:10,.0f} rows/s  {rate / baseline:5.2f}x")
+    generator.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# bench_metadata.py - Per-row vs bulk installation metadata generation
+"""
+Usage:
+    python benchmarks/bench_metadata.py [count]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cpe_generation import (
+    NUMPY_AVAILABLE,
+    generate_installation_metadata,
+    generate_installation_metadata_bulk
+)
+
+
+def legacy_metadata():
+    """The former per-row generator from app.py"""
+    size_mb = round(random.uniform(10, 2000), 2)
+    days_ago = random.randint(0, 730)
+    install_date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d')
+    locations = [
+        'C:\\Program Files\\',
+        'C:\\Program Files (x86)\\',
+        'C:\\Users\\Public\\',
+        'C:\\ProgramData\\'
+    ]
+    return {'size_mb': size_mb, 'install_date': install_date, 'install_location': random.choice(locations)}
+
+
+def timed(label, func, count, baseline=None):
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    speedup = f"{baseline / seconds:6.1f}x" if baseline else "   1.0x"
+    print(f"  {label:<28} {seconds:7.3f} s  {count / seconds:12,.0f} rows/s  {speedup}")
+    return seconds
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    default_path = 'NumPy' if NUMPY_AVAILABLE else 'random.Random (numpy not installed)'
+    print(f"{count:,} rows, default bulk path: {default_path}")
+    baseline = timed('per-row (legacy)', lambda: [legacy_metadata() for _ in range(count)], count)
+    timed('per-row (date table)', lambda: [generate_installation_metadata() for _ in range(count)], count, baseline)
+    timed('bulk, random.Random', lambda: generate_installation_metadata_bulk(count, random.Random(1)), count, baseline)
+    if NUMPY_AVAILABLE:
+        import numpy as np
+        timed('bulk, NumPy', lambda: generate_installation_metadata_bulk(count, np.random.default_rng(1)), count, baseline)
+    else:
+        print("  bulk, NumPy                  skipped (numpy not installed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# bench_parse.py - parse_cpe_uri vs parse_cpe_batch throughput
+"""
+Usage:
+    python benchmarks/bench_parse.py [count]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cpe_parser import parse_cpe_uri, parse_cpe_batch
+
+
+def make_inventory(count, seed=42):
+    """
+    Build a synthetic inventory of CPE strings. Like the NVD dictionary,
+    most entries leave the optional attributes as ANY.
+    """
+    rng = random.Random(seed)
+    values = ['*', '*', 'sp1', 'lts', 'x64', 'en', 'pro']
+    inventory = []
+    for _ in range(count):
+        if rng.random() < 0.8:
+            tail = '*:*:*:*:*:*'
+        else:
+            tail = ':'.join(rng.choice(values) for _ in range(6))
+        inventory.append(
+            f"cpe:2.3:{rng.choice('aoh')}:vendor{rng.randrange(5000)}:product{rng.randrange(50000)}:"
+            f"{rng.randrange(20)}.{rng.randrange(10)}.{rng.randrange(100)}:{tail}"
+        )
+    return inventory
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    inventory = make_inventory(count)
+
+    started = time.perf_counter()
+    columns = parse_cpe_batch(inventory)
+    batch_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = [parse_cpe_uri(cpe) for cpe in inventory]
+    single_seconds = time.perf_counter() - started
+
+    # Spot-check equivalence
+    for i in random.Random(0).sample(range(count), min(count, 1000)):
+        assert rows[i] == {name: columns[name][i] for name in rows[i]}
+
+    print(f"{count:,} CPE strings")
+    print(f"  parse_cpe_uri:   {single_seconds:.2f}s  ({count / single_seconds:,.0f} rows/sec)")
+    print(f"  parse_cpe_batch: {batch_seconds:.2f}s  ({count / batch_seconds:,.0f} rows/sec)")
+    print(f"  speedup: {single_seconds / batch_seconds:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
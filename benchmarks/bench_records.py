@@ -0,0 +1,53 @@
+# bench_records.py - Memory of result rows as dicts vs CPERecord
+"""
+Usage:
+    python benchmarks/bench_records.py [count]
+"""
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cpe_parser import parse_cpe_uri
+from cpe_record import parse_cpe_record
+from bench_parse import make_inventory
+
+
+def make_metadata(rng):
+    return {
+        'size_mb': round(rng.uniform(10, 2000), 2),
+        'install_date': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        'install_location': rng.choice(['C:\\Program Files\\', 'C:\\ProgramData\\']),
+    }
+
+
+def measure(build):
+    tracemalloc.start()
+    rows = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    inventory = make_inventory(count)
+
+    rng = random.Random(1)
+    rows, dict_bytes = measure(lambda: [{**parse_cpe_uri(cpe), **make_metadata(rng)} for cpe in inventory])
+    del rows
+
+    rng = random.Random(1)
+    rows, record_bytes = measure(lambda: [parse_cpe_record(cpe).with_metadata(make_metadata(rng)) for cpe in inventory])
+    del rows
+
+    print(f"{count:,} result rows")
+    print(f"  dict rows:  {dict_bytes / 2**20:,.1f} MB  ({dict_bytes / count:,.0f} bytes/row)")
+    print(f"  CPERecord:  {record_bytes / 2**20:,.1f} MB  ({record_bytes / count:,.0f} bytes/row)")
+    print(f"  reduction:  {dict_bytes / record_bytes:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
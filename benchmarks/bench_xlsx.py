@@ -0,0 +1,96 @@
+# bench_xlsx.py - XLSX export: in-memory workbook vs write-only streaming
+"""
+Usage:
+    python benchmarks/bench_xlsx.py [count ...] [--legacy-max N]
+
+Each export runs in a forked child so peak RSS is measured per case;
+the reported memory is the growth over the RSS after the input rows
+were built. The legacy exporter is skipped above --legacy-max rows
+(default 100000), where it needs several GB.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment
+
+from cpe_export import EXPORT_HEADERS, EXPORT_FIELDS, write_xlsx_export
+from cpe_record import parse_cpe_record
+from bench_parse import make_inventory
+from bench_records import make_metadata
+
+
+def legacy_export(items, fp):
+    """The former export_xlsx body: normal workbook, widths from ws.columns"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "CPE Data"
+    header_fill = PatternFill(start_color="667EEA", end_color="667EEA", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    for col_num, header in enumerate(EXPORT_HEADERS, 1):
+        cell = ws.cell(row=1, column=col_num, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+    for row_num, item in enumerate(items, 2):
+        for col_num, field in enumerate(EXPORT_FIELDS, 1):
+            ws.cell(row=row_num, column=col_num, value=item.get(field, ''))
+    for column in ws.columns:
+        max_length = max(len(str(cell.value)) for cell in column)
+        ws.column_dimensions[column[0].column_letter].width = min(max_length + 2, 50)
+    wb.save(fp)
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(export, rows, queue):
+    baseline = rss_mb()
+    start = time.perf_counter()
+    with tempfile.TemporaryFile() as fp:
+        export(rows, fp)
+        size = fp.tell()
+    queue.put((time.perf_counter() - start, rss_mb() - baseline, size))
+
+
+def measure(export, rows):
+    queue = multiprocessing.Queue()
+    child = multiprocessing.Process(target=run, args=(export, rows, queue))
+    child.start()
+    result = queue.get()
+    child.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('counts', nargs='*', type=int, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy-max', type=int, default=100_000)
+    args = parser.parse_args()
+
+    multiprocessing.set_start_method('fork')
+    for count in args.counts:
+        rng = random.Random(1)
+        rows = [parse_cpe_record(cpe).with_metadata(make_metadata(rng)) for cpe in make_inventory(count)]
+        print(f"{count:,} rows")
+        cases = [('write-only', write_xlsx_export)]
+        if count <= args.legacy_max:
+            cases.insert(0, ('legacy', legacy_export))
+        for name, export in cases:
+            seconds, memory, size = measure(export, rows)
+            print(f"  {name:<11} {seconds:7.1f} s  {count / seconds:9,.0f} rows/s  "
+                  f"+{memory:7,.0f} MB peak RSS  {size / 2**20:6.1f} MB file")
+        del rows
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+# cpe_export.py - Streaming CSV, XLSX and JSON writers for exported CPE rows
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+
+# Export column headers and the result fields they are read from
+EXPORT_HEADERS = [
+    'CPE', 'Category', 'Vendor', 'Product', 'Version',
+    'Other Fields', 'Size (MB)', 'Install Date', 'Install Location'
+]
+EXPORT_FIELDS = [
+    'cpe', 'category', 'vendor', 'product', 'version',
+    'other_fields', 'size_mb', 'install_date', 'install_location'
+]
+
+# Rows encoded per chunk of a streamed export
+EXPORT_BATCH_ROWS = 1000
+
+# Excel's hard row limit per worksheet, header row included
+XLSX_MAX_ROWS = 1048576
+
+# Rows buffered at the start of each sheet to size its columns. A
+# write-only sheet emits its column widths before the first row, so
+# widths come from this lookahead (plus every earlier sheet) rather than
+# a second walk over the finished sheet.
+XLSX_WIDTH_SAMPLE_ROWS = 10000
+
+XLSX_MAX_COLUMN_WIDTH = 50
+
+XLSX_SHEET_TITLE = 'CPE Data'
+
+
+def export_row(item):
+    """Values of one result row (record or dict) in EXPORT_FIELDS order"""
+    return [item.get(field, '') for field in EXPORT_FIELDS]
+
+
+def iter_csv_export(items):
+    """
+    Yield the CSV export as UTF-8 bytes: BOM and header first, then rows
+    in batches of EXPORT_BATCH_ROWS. Output is identical to writing the
+    whole file at once and encoding it as utf-8-sig.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # Write header
+    writer.writerow(EXPORT_HEADERS)
+    pending = 0
+    prefix = codecs.BOM_UTF8
+
+    # Write data
+    for item in items:
+        writer.writerow(export_row(item))
+        pending += 1
+        if pending >= EXPORT_BATCH_ROWS:
+            yield prefix + buffer.getvalue().encode('utf-8')
+            prefix = b''
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if prefix or pending:
+        yield prefix + buffer.getvalue().encode('utf-8')
+
+
+def _json_item_dumps(item):
+    return json.dumps(item, ensure_ascii=False, indent=2)
+
+
+def iter_json_export(items, total, export_date, dumps=_json_item_dumps):
+    """
+    Yield the JSON export as UTF-8 bytes: the export_date/total_entries
+    header, then the data array one batch of items at a time.
+
+    Output is identical to json.dumps({'export_date': ..., 'total_entries':
+    ..., 'data': items}, ensure_ascii=False, indent=2). `dumps` encodes a
+    single item the same way (see json_provider.export_dumps); records are
+    converted with to_dict() first, keys sorted.
+    """
+    header = json.dumps({'export_date': export_date, 'total_entries': total}, ensure_ascii=False, indent=2)
+    chunk = [header[:-2], ',\n  "data": [']
+    separator = '\n    '
+    pending = 0
+
+    for item in items:
+        if hasattr(item, 'to_dict'):
+            # Same key order as rows uploaded by the browser, which come
+            # from API responses encoded with sorted keys
+            item = dict(sorted(item.to_dict().items()))
+        # Nested lines gain the 4 spaces of the enclosing object and array;
+        # encoded strings never contain a raw newline
+        chunk.append(separator + dumps(item).replace('\n', '\n    '))
+        separator = ',\n    '
+        pending += 1
+        if pending >= EXPORT_BATCH_ROWS:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+            pending = 0
+
+    chunk.append(']\n}' if separator == '\n    ' else '\n  ]\n}')
+    yield ''.join(chunk).encode('utf-8')
+
+
+def _header_cells(ws):
+    header_fill = PatternFill(start_color="667EEA", end_color="667EEA", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    alignment = Alignment(horizontal='center', vertical='center')
+    cells = []
+    for header in EXPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = alignment
+        cells.append(cell)
+    return cells
+
+
+def write_xlsx_export(items, fp, max_rows=XLSX_MAX_ROWS):
+    """
+    Write result rows to `fp` as an XLSX workbook in a single pass.
+
+    Uses a write-only workbook, so rows are streamed to openpyxl's on-disk
+    sheet buffers instead of being held as cell objects. When a sheet
+    reaches `max_rows` (header included) the export continues on
+    "CPE Data (2)", "CPE Data (3)", and so on. Returns the number of
+    sheets written.
+    """
+    wb = Workbook(write_only=True)
+    rows = map(export_row, items)
+    widths = [len(header) for header in EXPORT_HEADERS]
+    per_sheet = max_rows - 1
+    sheets = 0
+
+    while True:
+        lookahead = list(islice(rows, min(XLSX_WIDTH_SAMPLE_ROWS, per_sheet)))
+        if sheets and not lookahead:
+            break
+        sheets += 1
+        ws = wb.create_sheet(XLSX_SHEET_TITLE if sheets == 1 else f'{XLSX_SHEET_TITLE} ({sheets})')
+
+        # Size columns from the lookahead before the first row is written
+        for row in lookahead:
+            for col, value in enumerate(row):
+                length = len(str(value))
+                if length > widths[col]:
+                    widths[col] = length
+        for col, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(col)].width = min(width + 2, XLSX_MAX_COLUMN_WIDTH)
+
+        ws.append(_header_cells(ws))
+        for row in lookahead:
+            ws.append(row)
+        remaining = per_sheet - len(lookahead)
+        if len(lookahead) < min(XLSX_WIDTH_SAMPLE_ROWS, per_sheet):
+            break
+        # Keep tracking widths past the lookahead so later sheets use them
+        for row in islice(rows, remaining):
+            ws.append(row)
+            for col, value in enumerate(row):
+                length = len(str(value))
+                if length > widths[col]:
+                    widths[col] = length
+            remaining -= 1
+        if remaining:
+            break
+
+    wb.save(fp)
+    return sheets
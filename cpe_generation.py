@@ -0,0 +1,303 @@
+# cpe_generation.py - Random CPE generation, serial or sharded across worker processes
+import hashlib
+import multiprocessing
+import os
+import random
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from cpe_index import CPEIndex
+from cpe_match import CPEMatcher
+from cpe_record import CPERecord, RECORD_FIELDS, parse_cpe_record
+from cpe_store import CPEStore
+
+# Common vendor names for random generation
+COMMON_VENDORS = [
+    'microsoft', 'google', 'apple', 'oracle', 'adobe', 'mozilla',
+    'cisco', 'ibm', 'intel', 'hp', 'dell', 'lenovo', 'asus',
+    'samsung', 'sony', 'lg', 'vmware', 'redhat', 'canonical',
+    'apache', 'nginx', 'nodejs', 'python', 'java', 'php'
+]
+
+PRODUCT_PREFIXES = ['server', 'client', 'pro', 'enterprise', 'professional', 'community', 'standard', 'ultimate']
+PRODUCT_TYPES = ['suite', 'manager', 'viewer', 'editor', 'player', 'reader', 'browser', 'office', 'database', 'framework']
+
+# Installation location (default C drive)
+INSTALL_LOCATIONS = [
+    'C:\\Program Files\\',
+    'C:\\Program Files (x86)\\',
+    'C:\\Users\\Public\\',
+    'C:\\ProgramData\\'
+]
+
+# Install dates fall within this many days before today (inclusive)
+INSTALL_DATE_WINDOW = 730
+
+# Rows generated per seeded block. Each block has its own RNG derived
+# from the seed and the block number, so output for a seed does not
+# depend on how blocks are spread across processes.
+GENERATION_BLOCK_SIZE = 1000
+
+MAX_GENERATION_WORKERS = os.cpu_count() or 1
+
+# Workers start from a clean interpreter rather than a fork of the web
+# server, which has threads, locks and open connections that a forked
+# child would inherit in whatever state they were in
+WORKER_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+@lru_cache(maxsize=4)
+def _date_table(day):
+    return tuple(
+        (day - timedelta(days=days_ago)).strftime('%Y-%m-%d')
+        for days_ago in range(INSTALL_DATE_WINDOW + 1)
+    )
+
+
+def install_date_table(today=None):
+    """Install date strings indexed by days ago, 0 to INSTALL_DATE_WINDOW"""
+    return _date_table((today or datetime.now()).date())
+
+
+def round_size(size_mb):
+    """
+    Round a size to 2 decimals the way np.round(size_mb, 2) does: scale by
+    100 and round half to even. round(size_mb, 2) rounds the exact decimal
+    value instead and can differ in the last digit, so every generator uses
+    this to give the same sizes with or without NumPy
+    """
+    return round(size_mb * 100) / 100
+
+
+def generate_installation_metadata(rng=random, today=None):
+    """Generate simulated installation metadata"""
+    # Random size between 10MB and 2000MB
+    size_mb = round_size(rng.uniform(10, 2000))
+
+    # Random installation date within last 2 years
+    install_date = install_date_table(today)[rng.randint(0, INSTALL_DATE_WINDOW)]
+
+    return {
+        'size_mb': size_mb,
+        'install_date': install_date,
+        'install_location': rng.choice(INSTALL_LOCATIONS)
+    }
+
+
+def generate_installation_metadata_bulk(count, rng=None, today=None):
+    """
+    Generate installation metadata for `count` rows in one call, as
+    columns: {'size_mb': [...], 'install_date': [...], 'install_location': [...]}
+
+    Distributions match generate_installation_metadata: size uniform in
+    [10, 2000) rounded by round_size, install date uniform over the last
+    INSTALL_DATE_WINDOW + 1 days, location uniform over INSTALL_LOCATIONS.
+
+    `rng` may be a numpy Generator or a random.Random. The default uses
+    NumPy when it is installed, else the random module. A random.Random
+    keeps results reproducible whether or not NumPy is available.
+    """
+    dates = install_date_table(today)
+    if rng is None:
+        rng = np.random.default_rng() if NUMPY_AVAILABLE else random
+
+    if NUMPY_AVAILABLE and isinstance(rng, np.random.Generator):
+        return {
+            'size_mb': np.round(rng.uniform(10, 2000, count), 2).tolist(),
+            'install_date': np.array(dates, dtype=object)[rng.integers(0, len(dates), count)].tolist(),
+            'install_location': np.array(INSTALL_LOCATIONS, dtype=object)[
+                rng.integers(0, len(INSTALL_LOCATIONS), count)
+            ].tolist()
+        }
+
+    uniform = rng.random
+    return {
+        'size_mb': [round_size(10 + 1990 * uniform()) for _ in range(count)],
+        'install_date': rng.choices(dates, k=count),
+        'install_location': rng.choices(INSTALL_LOCATIONS, k=count)
+    }
+
+
+def attach_installation_metadata(records, rng=None, today=None):
+    """Return copies of records with bulk-generated installation metadata"""
+    metadata = generate_installation_metadata_bulk(len(records), rng, today)
+    return [
+        record.with_installation(size_mb, install_date, install_location)
+        for record, size_mb, install_date, install_location in zip(
+            records, metadata['size_mb'], metadata['install_date'], metadata['install_location']
+        )
+    ]
+
+
+def random_cpe_record(matcher, rng=random):
+    """Generate a random CPE record without metadata, corrected to the closest dictionary entry"""
+    vendor = rng.choice(COMMON_VENDORS)
+
+    # Generate product name
+    if rng.random() > 0.5:
+        product = f"{rng.choice(PRODUCT_PREFIXES)}_{rng.choice(PRODUCT_TYPES)}"
+    else:
+        product = f"{vendor}_{rng.choice(PRODUCT_TYPES)}"
+
+    # Generate version
+    major = rng.randint(1, 20)
+    minor = rng.randint(0, 9)
+    patch = rng.randint(0, 99)
+    version = f"{major}.{minor}.{patch}"
+
+    # Create CPE string
+    cpe_string = f"cpe:2.3:a:{vendor}:{product}:{version}:*:*:*:*:*:*:*"
+
+    # Correct it to the closest real entry in the CPE dictionary
+    matches = matcher.nearest(vendor, product, version, part='a', k=1)
+    if matches:
+        cpe_string = matches[0]
+
+    # Parse the final CPE to get all fields including category
+    record = parse_cpe_record(cpe_string)
+    if record is None:
+        # Fallback to the generated fields if parsing fails
+        record = CPERecord(cpe=cpe_string, vendor=vendor, product=product, version=version)
+
+    return record
+
+
+def generate_random_cpe(matcher, rng=random, today=None):
+    """Generate random CPE with metadata, corrected to the closest dictionary entry"""
+    return random_cpe_record(matcher, rng).with_metadata(generate_installation_metadata(rng, today))
+
+
+def block_seed(seed, block):
+    """64-bit RNG seed for one block, derived from the user seed"""
+    digest = hashlib.sha256(f"{seed}:{block}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def generate_block(matcher, seed, block, size, today):
+    """Generate one seeded block of records, with its metadata drawn in one bulk call"""
+    rng = random.Random(block_seed(seed, block))
+    records = [random_cpe_record(matcher, rng) for _ in range(size)]
+    return attach_installation_metadata(records, rng, today)
+
+
+# Worker process state, set up once per process by _init_worker
+_worker_matcher = None
+
+
+def open_source(source_spec):
+    """
+    Open a CPE source from a picklable spec: ('store', path) for an
+    ingested CPEStore, or ('dictionary', cpe_strings) for a CPEIndex
+    """
+    kind, value = source_spec
+    return CPEStore(value) if kind == 'store' else CPEIndex(value)
+
+
+def _init_worker(source_spec):
+    # Each worker reads the source by path rather than receiving the
+    # parent's indexes; the matcher builds them on the worker's first block
+    global _worker_matcher
+    _worker_matcher = CPEMatcher(open_source(source_spec))
+
+
+def _generate_block_rows(seed, block, size, today):
+    # Plain tuples pickle smaller and faster than records
+    return [
+        tuple(getattr(record, name) for name in RECORD_FIELDS)
+        for record in generate_block(_worker_matcher, seed, block, size, today)
+    ]
+
+
+class CPEGenerator:
+    """
+    Random CPE generation, optionally spread over a process pool.
+
+    A request for `count` rows is cut into GENERATION_BLOCK_SIZE blocks;
+    block b draws from random.Random(block_seed(seed, b)). The same seed
+    therefore gives the same rows (for the same day, since install dates
+    are relative to today) whatever the worker count. With workers > 1
+    up to `workers` blocks run at once in a shared pool of processes,
+    each with its own matcher over the same CPE source; results come
+    back in block order.
+    """
+
+    def __init__(self, matcher, source_spec, max_workers=MAX_GENERATION_WORKERS):
+        self.matcher = matcher
+        self.source_spec = source_spec
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(WORKER_START_METHOD),
+                    initializer=_init_worker,
+                    initargs=(self.source_spec,)
+                )
+            return self._pool
+
+    def iter_blocks(self, count, seed=None, workers=1):
+        """
+        Yield (processed, records) one block at a time, in order
+        A seed of None draws a fresh one from the OS
+        """
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        workers = max(1, min(workers, self.max_workers))
+        today = datetime.now()
+        blocks = [
+            (seed, block, min(GENERATION_BLOCK_SIZE, count - start), today)
+            for block, start in enumerate(range(0, count, GENERATION_BLOCK_SIZE))
+        ]
+
+        processed = 0
+        if workers == 1:
+            for args in blocks:
+                records = generate_block(self.matcher, *args)
+                processed += len(records)
+                yield processed, records
+            return
+
+        # Keep at most `workers` blocks in flight so the caller's limit holds
+        pool = self._get_pool()
+        remaining = iter(blocks)
+        pending = deque()
+        for _, args in zip(range(workers), remaining):
+            pending.append(pool.submit(_generate_block_rows, *args))
+        try:
+            while pending:
+                rows = pending.popleft().result()
+                args = next(remaining, None)
+                if args is not None:
+                    pending.append(pool.submit(_generate_block_rows, *args))
+                records = [CPERecord.from_row(row) for row in rows]
+                processed += len(records)
+                yield processed, records
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def generate(self, count, seed=None, workers=1):
+        """Return `count` random records"""
+        records = []
+        for _, block in self.iter_blocks(count, seed, workers):
+            records.extend(block)
+        return records
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
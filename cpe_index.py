@@ -0,0 +1,95 @@
+# cpe_index.py - CPE dictionary index and stratified sampler
+import random
+
+# CPE part types, in the order auto-fetch distributes them
+PART_TYPES = ('a', 'o', 'h')
+
+
+class CPEIndex:
+    """
+    In-memory index over a CPE dictionary, built once at load time.
+
+    Entries are partitioned by part type (a/o/h), vendor and (vendor, product)
+    so lookups and sampling never rescan the whole dictionary per request.
+    """
+
+    def __init__(self, cpe_strings):
+        self.entries = []
+        self.by_part = {part: [] for part in PART_TYPES}
+        self.by_vendor = {}
+        self.by_product = {}
+        self._positions = {}
+
+        for cpe_string in cpe_strings:
+            if cpe_string in self._positions:
+                continue
+            parts = cpe_string.split(':')
+            if len(parts) < 5:
+                continue
+
+            position = len(self.entries)
+            self._positions[cpe_string] = position
+            self.entries.append(cpe_string)
+
+            if parts[2] in self.by_part:
+                self.by_part[parts[2]].append(position)
+            self.by_vendor.setdefault(parts[3], []).append(position)
+            self.by_product.setdefault((parts[3], parts[4]), []).append(position)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, cpe_string):
+        return cpe_string in self._positions
+
+    def iter_products(self):
+        """Yield each distinct (vendor, product) pair"""
+        return iter(self.by_product)
+
+    def vendor_entries(self, vendor):
+        """Return all CPE strings for a vendor"""
+        return [self.entries[i] for i in self.by_vendor.get(vendor, ())]
+
+    def product_entries(self, vendor, product):
+        """Return all CPE strings for a vendor/product pair"""
+        return [self.entries[i] for i in self.by_product.get((vendor, product), ())]
+
+    def sample_stratified(self, count, rng=random):
+        """
+        Draw up to `count` distinct CPE strings, split as evenly as possible
+        across the a/o/h part types.
+
+        Categories that run short are topped up from the rest of the
+        dictionary. Only index positions are sampled, so the cost is O(count)
+        regardless of dictionary size and no category list is copied.
+        """
+        count = min(count, len(self.entries))
+        per_category = count // len(PART_TYPES)
+        remainder = count % len(PART_TYPES)
+
+        chosen = []
+        for idx, part in enumerate(PART_TYPES):
+            # Add extra items to first categories for remainder
+            category_count = per_category + (1 if idx < remainder else 0)
+            positions = self.by_part[part]
+            available = min(category_count, len(positions))
+            if available:
+                chosen.extend(positions[i] for i in rng.sample(range(len(positions)), available))
+
+        # If we don't have enough CPEs, fill from any other entry. Sampling
+        # `needed + len(chosen)` positions guarantees at least `needed` of
+        # them were not already chosen.
+        needed = count - len(chosen)
+        if needed > 0:
+            taken = set(chosen)
+            draw = min(len(self.entries), needed + len(taken))
+            for position in rng.sample(range(len(self.entries)), draw):
+                if position not in taken:
+                    chosen.append(position)
+                    needed -= 1
+                    if not needed:
+                        break
+
+        # Shuffle to randomize order
+        rng.shuffle(chosen)
+        return [self.entries[i] for i in chosen]
@@ -0,0 +1,373 @@
+# cpe_match.py - Nearest-match engine for correcting CPEs to real dictionary entries
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from cpe_cache import LRUCache
+
+# Posting lists longer than this are skipped during candidate generation
+# (as long as rarer n-grams are available); they carry little signal.
+MAX_POSTING_LENGTH = 5000
+
+# Number of n-gram candidates reranked by exact edit distance
+RERANK_CANDIDATES = 8
+
+# Vendors with fewer products are scanned directly instead of indexed
+SMALL_VENDOR_PRODUCTS = 32
+
+# Products whose version index is kept in memory; the least recently
+# matched are rebuilt from the source when needed again
+VERSION_INDEX_CACHE_SIZE = 4096
+
+# Vendors whose product n-gram index is kept in memory
+PRODUCT_INDEX_CACHE_SIZE = 1024
+
+_VERSION_SPLIT = re.compile(r'[._\-]')
+
+
+def edit_distance(a, b, limit=None):
+    """
+    Levenshtein distance between two strings.
+    Stops early and returns `limit + 1` once the distance exceeds `limit`.
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        left = i
+        for j, char_b in enumerate(b):
+            # Inline min() of insert/delete/substitute; this loop is the hot path
+            left += 1
+            up = previous[j + 1] + 1
+            if up < left:
+                left = up
+            diagonal = previous[j] + (char_a != char_b)
+            if diagonal < left:
+                left = diagonal
+            current.append(left)
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    if limit is not None and previous[-1] > limit:
+        return limit + 1
+    return previous[-1]
+
+
+def _ngrams(text, n=3):
+    padded = f"$${text}$"
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def version_distance(target, candidate):
+    """
+    Sort key measuring how far `candidate` is from the `target` version.
+    Versions sharing more leading components are closer; at the first
+    differing component, numeric components are compared by magnitude.
+    """
+    if not target:
+        return (0, 0)
+    target_parts = _VERSION_SPLIT.split(target)
+    candidate_parts = _VERSION_SPLIT.split(candidate)
+
+    common = 0
+    for t, c in zip(target_parts, candidate_parts):
+        if t != c:
+            break
+        common += 1
+
+    if common < len(target_parts) and common < len(candidate_parts):
+        t, c = target_parts[common], candidate_parts[common]
+        diff = _component_distance(t, c)
+    else:
+        diff = abs(len(target_parts) - len(candidate_parts))
+    return (-common, diff)
+
+
+def _component_distance(t, c):
+    # isdecimal, not isdigit: int() rejects digits such as '²'
+    return abs(int(t) - int(c)) if t.isdecimal() and c.isdecimal() else edit_distance(t, c)
+
+
+class _VersionNode:
+    __slots__ = ('children', 'numeric', 'other', 'exact', 'by_cpe', 'by_length')
+
+    def __init__(self):
+        self.children = {}
+        self.exact = []       # entries whose version ends at this node
+        self.by_cpe = []      # every entry below this node, sorted by CPE
+        self.by_length = []   # the same as (component count, CPE), sorted
+
+
+class VersionIndex:
+    """
+    Version components of one product's entries as a trie, so the entries
+    closest to a version are found without scoring every version.
+
+    Results follow the order of (version_distance, cpe). Entries sharing
+    d leading components with the target sit below the target's depth-d
+    node, outside its depth-(d + 1) child; groups are read deepest first.
+    Within a group, numeric sibling components are found by bisecting
+    outward from the target's value, so a product with thousands of
+    versions costs a few lookups instead of a full scan.
+    """
+
+    def __init__(self, cpe_strings):
+        self.root = _VersionNode()
+        for cpe in cpe_strings:
+            fields = cpe.split(':')
+            components = _VERSION_SPLIT.split(fields[5]) if len(fields) > 5 else ['']
+            node = self.root
+            node.by_cpe.append(cpe)
+            node.by_length.append((len(components), cpe))
+            for component in components:
+                node = node.children.setdefault(component, _VersionNode())
+                node.by_cpe.append(cpe)
+                node.by_length.append((len(components), cpe))
+            node.exact.append(cpe)
+        self._finish(self.root)
+
+    def _finish(self, root):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node.exact.sort()
+            node.by_cpe.sort()
+            node.by_length.sort()
+            node.numeric = sorted((int(c), c) for c in node.children if c.isdecimal())
+            node.other = [c for c in node.children if not c.isdecimal()]
+            stack.extend(node.children.values())
+
+    def nearest(self, version, k):
+        """Up to k CPE strings in (version_distance(version, ...), cpe) order"""
+        if not version:
+            return self.root.by_cpe[:k]
+        target = _VERSION_SPLIT.split(version)
+
+        path = [self.root]
+        for component in target:
+            node = path[-1].children.get(component)
+            if node is None:
+                break
+            path.append(node)
+
+        results = []
+        depth = len(path) - 1
+        if depth == len(target):
+            # Every entry below shares the whole target; longer ones are further
+            results = [cpe for _, cpe in path[-1].by_length[:k]]
+            depth -= 1
+        while depth >= 0 and len(results) < k:
+            results.extend(self._group(path[depth], target, depth, k - len(results)))
+            depth -= 1
+        return results
+
+    def _group(self, node, target, depth, k):
+        # Entries sharing exactly `depth` components with the target, best first
+        t = target[depth]
+        buckets = [(len(target) - depth, node.exact)] if node.exact else []
+
+        if t.isdecimal():
+            value = int(t)
+            keys = node.numeric
+            right = bisect_left(keys, (value, ''))
+            left = right - 1
+            found = 0
+            last = None
+            # Walk outward by numeric distance until k entries are certain
+            while left >= 0 or right < len(keys):
+                if right >= len(keys) or (left >= 0 and value - keys[left][0] <= keys[right][0] - value):
+                    number, component = keys[left]
+                    left -= 1
+                else:
+                    number, component = keys[right]
+                    right += 1
+                diff = abs(number - value)
+                if found >= k and diff != last:
+                    break
+                if component != t:
+                    buckets.append((diff, node.children[component].by_cpe))
+                    found += len(node.children[component].by_cpe)
+                    last = diff
+            others = node.other
+        else:
+            others = node.children
+
+        for component in others:
+            if component != t:
+                buckets.append((edit_distance(t, component), node.children[component].by_cpe))
+
+        ranked = sorted((diff, cpe) for diff, cpes in buckets for cpe in cpes[:k])
+        return [cpe for _, cpe in ranked[:k]]
+
+
+class NGramIndex:
+    """Character n-gram inverted index for approximate string lookup"""
+
+    def __init__(self, strings):
+        self.strings = list(strings)
+        self.exact = {s: i for i, s in enumerate(self.strings)}
+        self.postings = {}
+        for idx, s in enumerate(self.strings):
+            for gram in _ngrams(s):
+                self.postings.setdefault(gram, []).append(idx)
+
+    def nearest(self, query, k=RERANK_CANDIDATES):
+        """Return up to k (distance, string) pairs closest to query"""
+        if query in self.exact:
+            return [(0, query)]
+
+        grams = _ngrams(query)
+        posting_lists = sorted(
+            (self.postings[g] for g in grams if g in self.postings), key=len
+        )
+        if not posting_lists:
+            return []
+
+        # Use rare n-grams first; common ones only if nothing rarer exists
+        selected = [p for p in posting_lists if len(p) <= MAX_POSTING_LENGTH] or posting_lists[:1]
+        shared = Counter()
+        for postings in selected:
+            shared.update(postings)
+
+        candidates = [self.strings[idx] for idx, _ in shared.most_common(RERANK_CANDIDATES)]
+        return _rerank(query, candidates, k)
+
+
+def _rerank(query, candidates, k):
+    """Rank candidates by edit distance, bounding each comparison by the current k-th best"""
+    ranked = []
+    limit = None
+    for candidate in candidates:
+        distance = edit_distance(query, candidate, limit)
+        if limit is not None and distance > limit:
+            continue
+        ranked.append((distance, abs(len(candidate) - len(query)), candidate))
+        if len(ranked) >= k:
+            ranked.sort()
+            del ranked[k:]
+            limit = ranked[-1][0]
+    ranked.sort()
+    return [(distance, c) for distance, _, c in ranked[:k]]
+
+
+class CPEMatcher:
+    """
+    Finds the real dictionary entries closest to an arbitrary CPE.
+
+    Matching runs in three narrowing stages so only small candidate sets
+    are ever compared: vendor (n-gram index over all vendors), product
+    (within the matched vendors) and version (within the matched product).
+
+    The source may be a CPEIndex or CPEStore; it must provide
+    iter_products() and product_entries(vendor, product). It is read on
+    the first match, not at construction, so creating a matcher is free.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._products_by_vendor = None
+        self._vendor_index = None
+        self._product_indexes = LRUCache(PRODUCT_INDEX_CACHE_SIZE)
+        self._version_indexes = LRUCache(VERSION_INDEX_CACHE_SIZE)
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # One pass over the source's products, on first use
+        with self._lock:
+            if self._vendor_index is None:
+                products_by_vendor = {}
+                for vendor, product in self.source.iter_products():
+                    products_by_vendor.setdefault(vendor, []).append(product)
+                self._products_by_vendor = products_by_vendor
+                self._vendor_index = NGramIndex(list(products_by_vendor))
+
+    @property
+    def products_by_vendor(self):
+        if self._vendor_index is None:
+            self._load()
+        return self._products_by_vendor
+
+    @property
+    def vendor_index(self):
+        if self._vendor_index is None:
+            self._load()
+        return self._vendor_index
+
+    def _nearest_products(self, vendor, product, k):
+        products = self.products_by_vendor.get(vendor, [])
+        if len(products) <= SMALL_VENDOR_PRODUCTS:
+            if product in products:
+                return [(0, product)]
+            return _rerank(product, products, k)
+
+        index = self._product_indexes.get(vendor)
+        if index is None:
+            index = NGramIndex(products)
+            self._product_indexes.put(vendor, index)
+        return index.nearest(product, k)
+
+    def _version_indexes_for(self, vendor, product):
+        # {part: VersionIndex} for one product, built on first use
+        indexes = self._version_indexes.get((vendor, product))
+        if indexes is None:
+            by_part = {}
+            for cpe in self.source.product_entries(vendor, product):
+                by_part.setdefault(cpe.split(':')[2], []).append(cpe)
+            indexes = {entry_part: VersionIndex(cpes) for entry_part, cpes in by_part.items()}
+            self._version_indexes.put((vendor, product), indexes)
+        return indexes
+
+    def _nearest_versions(self, vendor, product, version, part, k):
+        """Up to k entries of one product, requested part first, then by version distance"""
+        indexes = self._version_indexes_for(vendor, product)
+        if part:
+            groups = [
+                [indexes[part]] if part in indexes else [],
+                [index for entry_part, index in indexes.items() if entry_part != part]
+            ]
+        else:
+            groups = [list(indexes.values())]
+
+        results = []
+        for group in groups:
+            # Each index yields its own best k; merging those gives the group's best k
+            candidates = [cpe for index in group for cpe in index.nearest(version, k - len(results))]
+            if len(group) > 1:
+                candidates.sort(key=lambda cpe: (version_distance(version, cpe.split(':')[5]), cpe))
+            results.extend(candidates[:k - len(results)])
+            if len(results) >= k:
+                break
+        return results
+
+    def nearest(self, vendor, product, version='', part=None, k=5):
+        """
+        Return up to k dictionary CPE strings closest to the given fields,
+        best match first
+        """
+        pairs = []
+        for vendor_distance, vendor_match in self.vendor_index.nearest(vendor, 3):
+            for product_distance, product_match in self._nearest_products(vendor_match, product, k):
+                pairs.append((vendor_distance + product_distance, vendor_match, product_match))
+        pairs.sort()
+
+        results = []
+        for _, vendor_match, product_match in pairs:
+            results.extend(self._nearest_versions(vendor_match, product_match, version, part, k - len(results)))
+            if len(results) >= k:
+                break
+        return results
+
+    def nearest_cpe(self, cpe_string, k=5):
+        """Return up to k dictionary CPE strings closest to a CPE 2.3 string"""
+        fields = cpe_string.split(':')
+        if len(fields) < 5:
+            return []
+        version = fields[5] if len(fields) > 5 and fields[5] != '*' else ''
+        return self.nearest(fields[3], fields[4], version, part=fields[2], k=k)
@@ -0,0 +1,165 @@
+# cpe_parser.py - CPE 2.3 string parsing (single and batch)
+
+# Part type code to display category
+CATEGORY_MAP = {
+    'a': 'Application',
+    'o': 'Operating System',
+    'h': 'Hardware'
+}
+
+# Columns returned by parse_cpe_batch, in parse_cpe_uri key order
+BATCH_COLUMNS = (
+    'cpe', 'category', 'category_code', 'vendor', 'product', 'version',
+    'update', 'edition', 'language', 'sw_edition', 'target_sw', 'target_hw',
+    'other_fields'
+)
+
+# Fill value for attributes missing from short CPE strings
+_PADDING = ['*'] * 12
+_ALL_ANY = ('*',) * 6
+
+
+def parse_cpe_uri(cpe_string):
+    """
+    Parse CPE URI format (cpe:2.3:a:vendor:product:version:...)
+    Returns dict with parsed components
+    """
+    try:
+        if not cpe_string.startswith('cpe:'):
+            return None
+        
+        parts = cpe_string.split(':')
+        if len(parts) < 5:
+            return None
+        
+        # Extract category (part type: a, o, h)
+        part_type = parts[2] if len(parts) > 2 else ''
+        category = CATEGORY_MAP.get(part_type, 'Unknown')
+        
+        result = {
+            'cpe': cpe_string,
+            'category': category,
+            'category_code': part_type,
+            'vendor': parts[3] if len(parts) > 3 and parts[3] != '*' else '',
+            'product': parts[4] if len(parts) > 4 and parts[4] != '*' else '',
+            'version': parts[5] if len(parts) > 5 and parts[5] != '*' else '',
+            'update': parts[6] if len(parts) > 6 and parts[6] != '*' else '',
+            'edition': parts[7] if len(parts) > 7 and parts[7] != '*' else '',
+            'language': parts[8] if len(parts) > 8 and parts[8] != '*' else '',
+            'sw_edition': parts[9] if len(parts) > 9 and parts[9] != '*' else '',
+            'target_sw': parts[10] if len(parts) > 10 and parts[10] != '*' else '',
+            'target_hw': parts[11] if len(parts) > 11 and parts[11] != '*' else '',
+        }
+        
+        # Create other fields description
+        other_fields = []
+        if result['update']:
+            other_fields.append(f"Update: {result['update']}")
+        if result['edition']:
+            other_fields.append(f"Edition: {result['edition']}")
+        if result['language']:
+            other_fields.append(f"Language: {result['language']}")
+        if result['sw_edition']:
+            other_fields.append(f"SW Edition: {result['sw_edition']}")
+        if result['target_sw']:
+            other_fields.append(f"Target SW: {result['target_sw']}")
+        if result['target_hw']:
+            other_fields.append(f"Target HW: {result['target_hw']}")
+        
+        result['other_fields'] = ', '.join(other_fields) if other_fields else 'None'
+        
+        return result
+    except Exception as e:
+        print(f"Error parsing CPE: {e}")
+        return None
+
+
+def parse_cpe_batch(cpe_strings):
+    """
+    Parse many CPE strings in one pass into column arrays.
+
+    Accepts any iterable of strings. Returns a dict mapping each name in
+    BATCH_COLUMNS to a list, plus a 'valid' list of booleans. Row i of a
+    valid entry equals parse_cpe_uri(cpe_strings[i]); rows that
+    parse_cpe_uri would reject have valid=False and None in every column.
+    """
+    columns = {name: [] for name in BATCH_COLUMNS}
+    valid = []
+
+    # Bind appends once; the loop below runs millions of times per batch
+    (add_cpe, add_category, add_category_code, add_vendor, add_product,
+     add_version, add_update, add_edition, add_language, add_sw_edition,
+     add_target_sw, add_target_hw, add_other_fields) = [
+        columns[name].append for name in BATCH_COLUMNS
+    ]
+    add_valid = valid.append
+    category_get = CATEGORY_MAP.get
+
+    for cpe_string in cpe_strings:
+        parts = None
+        if type(cpe_string) is str and cpe_string.startswith('cpe:'):
+            parts = cpe_string.split(':')
+            if len(parts) < 12:
+                parts = parts + _PADDING[len(parts):] if len(parts) >= 5 else None
+
+        if parts is None:
+            for name in BATCH_COLUMNS:
+                columns[name].append(None)
+            add_valid(False)
+            continue
+
+        (_, _, part_type, vendor, product, version, update, edition,
+         language, sw_edition, target_sw, target_hw) = parts[:12]
+        add_cpe(cpe_string)
+        add_category(category_get(part_type, 'Unknown'))
+        add_category_code(part_type)
+        add_vendor('' if vendor == '*' else vendor)
+        add_product('' if product == '*' else product)
+        add_version('' if version == '*' else version)
+
+        if (update, edition, language, sw_edition, target_sw, target_hw) == _ALL_ANY:
+            # Most dictionary entries leave every optional attribute as ANY
+            add_update('')
+            add_edition('')
+            add_language('')
+            add_sw_edition('')
+            add_target_sw('')
+            add_target_hw('')
+            add_other_fields('None')
+        else:
+            other_fields = []
+            if update == '*':
+                update = ''
+            elif update:
+                other_fields.append(f"Update: {update}")
+            if edition == '*':
+                edition = ''
+            elif edition:
+                other_fields.append(f"Edition: {edition}")
+            if language == '*':
+                language = ''
+            elif language:
+                other_fields.append(f"Language: {language}")
+            if sw_edition == '*':
+                sw_edition = ''
+            elif sw_edition:
+                other_fields.append(f"SW Edition: {sw_edition}")
+            if target_sw == '*':
+                target_sw = ''
+            elif target_sw:
+                other_fields.append(f"Target SW: {target_sw}")
+            if target_hw == '*':
+                target_hw = ''
+            elif target_hw:
+                other_fields.append(f"Target HW: {target_hw}")
+            add_update(update)
+            add_edition(edition)
+            add_language(language)
+            add_sw_edition(sw_edition)
+            add_target_sw(target_sw)
+            add_target_hw(target_hw)
+            add_other_fields(', '.join(other_fields) if other_fields else 'None')
+        add_valid(True)
+
+    columns['valid'] = valid
+    return columns
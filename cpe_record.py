@@ -0,0 +1,145 @@
+# cpe_record.py - Compact record type for parsed CPE rows
+import re
+import sys
+
+from cpe_parser import parse_cpe_uri
+
+# Parsed CPE fields, in parse_cpe_uri key order
+PARSED_FIELDS = (
+    'cpe', 'category', 'category_code', 'vendor', 'product', 'version',
+    'update', 'edition', 'language', 'sw_edition', 'target_sw', 'target_hw',
+    'other_fields'
+)
+
+# Simulated installation metadata fields
+METADATA_FIELDS = ('size_mb', 'install_date', 'install_location')
+
+RECORD_FIELDS = PARSED_FIELDS + METADATA_FIELDS
+
+_intern = sys.intern
+
+_DIGIT_RUNS = re.compile(r'(\d+)')
+
+
+class CPERecord:
+    """
+    One CPE result row: parsed CPE fields plus installation metadata.
+
+    Uses __slots__ instead of a per-row dict, and interns repeated
+    strings such as vendor, product and category. Provides a dict-style
+    get() so export and database code accept records and plain dicts
+    alike. Convert with to_dict() only at the JSON response boundary.
+    """
+
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, cpe='', category='', category_code='', vendor='', product='',
+                 version='', update='', edition='', language='', sw_edition='',
+                 target_sw='', target_hw='', other_fields='None', size_mb=None,
+                 install_date=None, install_location=None):
+        self.cpe = cpe
+        self.category = _intern(category)
+        self.category_code = _intern(category_code)
+        self.vendor = _intern(vendor)
+        self.product = _intern(product)
+        self.version = _intern(version)
+        self.update = update
+        self.edition = edition
+        self.language = language
+        self.sw_edition = sw_edition
+        self.target_sw = target_sw
+        self.target_hw = target_hw
+        self.other_fields = _intern(other_fields)
+        self.size_mb = size_mb
+        self.install_date = _intern(install_date) if install_date is not None else None
+        self.install_location = _intern(install_location) if install_location is not None else None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a parse_cpe_uri result or result-row dict"""
+        return cls(**{name: data[name] for name in RECORD_FIELDS if data.get(name) is not None})
+
+    @classmethod
+    def from_row(cls, row):
+        """Build a record from a sequence of values in RECORD_FIELDS order, e.g. a database row"""
+        record = cls.__new__(cls)
+        for name, value in zip(RECORD_FIELDS, row):
+            setattr(record, name, value)
+        return record
+
+    def with_metadata(self, metadata):
+        """Return a copy of this record with installation metadata attached"""
+        return self.with_installation(
+            metadata['size_mb'], metadata['install_date'], metadata['install_location']
+        )
+
+    def with_installation(self, size_mb, install_date, install_location):
+        """Return a copy of this record with the given installation metadata"""
+        record = CPERecord.__new__(CPERecord)
+        for name in PARSED_FIELDS:
+            setattr(record, name, getattr(self, name))
+        record.size_mb = size_mb
+        record.install_date = _intern(install_date)
+        record.install_location = _intern(install_location)
+        return record
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            return default if value is None else value
+        return default
+
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if not isinstance(other, CPERecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in RECORD_FIELDS)
+
+    def __repr__(self):
+        return f"CPERecord({self.cpe!r})"
+
+    def to_dict(self):
+        """JSON-ready dict, identical to the former {**parsed, **metadata} rows"""
+        data = {name: getattr(self, name) for name in PARSED_FIELDS}
+        if self.size_mb is not None:
+            data['size_mb'] = self.size_mb
+            data['install_date'] = self.install_date
+            data['install_location'] = self.install_location
+        return data
+
+
+_FIELD_SET = frozenset(RECORD_FIELDS)
+
+
+def parse_cpe_record(cpe_string):
+    """Parse a CPE string into a CPERecord, or None if it is not a valid CPE"""
+    parsed = parse_cpe_uri(cpe_string)
+    if parsed is None:
+        return None
+    return CPERecord(**parsed)
+
+
+def records_to_dicts(records):
+    """Convert records (or plain dict rows) to JSON-ready dicts"""
+    return [r.to_dict() if isinstance(r, CPERecord) else r for r in records]
+
+
+def version_sort_key(version):
+    """
+    String key that orders version strings naturally: '1.9' < '1.10' < '10.0'
+
+    Each run of digits is written as its length (two digits) followed by
+    the digits without leading zeros, so plain string comparison orders
+    numbers by value. Other text is compared case-insensitively.
+    """
+    if not version:
+        return ''
+    parts = _DIGIT_RUNS.split(version.lower())
+    for index in range(1, len(parts), 2):
+        digits = parts[index].lstrip('0') or '0'
+        parts[index] = f'{len(digits):02d}{digits}'
+    return ''.join(parts)
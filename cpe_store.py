@@ -0,0 +1,400 @@
+# cpe_store.py - Local CPE dictionary store built from the NVD official feed
+"""
+Offline ingestion of the NVD official CPE dictionary into a local SQLite store.
+
+Usage:
+    python cpe_store.py official-cpe-dictionary_v2.3.xml.gz
+    python cpe_store.py nvdcpe-2.0.tar.gz --db cpe_dictionary.db
+
+Supported inputs (optionally gzip compressed):
+    - CPE 2.3 XML dictionary (official-cpe-dictionary_v2.3.xml)
+    - NVD CPE JSON 2.0 product files (nvdcpe-2.0-chunk-*.json or API responses)
+    - tar archives of the JSON 2.0 product files (nvdcpe-2.0.tar.gz)
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import tarfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+from json_stream import iter_json_array
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_STORE_PATH = 'cpe_dictionary.db'
+INGEST_BATCH_SIZE = 10000
+
+# SQLite variable limit is 999 on older builds
+_MAX_SQL_VARIABLES = 500
+
+_CPE_DICT_NS = '{http://cpe.mitre.org/dictionary/2.0}'
+_CPE_23_NS = '{http://scap.nist.gov/schema/cpe-extension/2.3}'
+
+# Split on ':' but not on escaped '\:'
+_CPE_FIELD_SPLIT = re.compile(r'(?<!\\):')
+
+_SCHEMA = """
+CREATE TABLE cpe_dictionary (
+    id INTEGER PRIMARY KEY,
+    cpe TEXT NOT NULL,
+    part TEXT NOT NULL,
+    vendor TEXT NOT NULL,
+    product TEXT NOT NULL,
+    version TEXT NOT NULL,
+    title TEXT,
+    deprecated INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE cpe_store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_INDEXES = """
+CREATE UNIQUE INDEX idx_cpe_dictionary_cpe ON cpe_dictionary (cpe);
+CREATE INDEX idx_cpe_dictionary_vendor_product ON cpe_dictionary (vendor, product, version);
+"""
+
+
+def split_cpe23(cpe_string):
+    """Split a CPE 2.3 formatted string into fields, honouring '\\:' escapes"""
+    return _CPE_FIELD_SPLIT.split(cpe_string)
+
+
+class CPEStore:
+    """
+    Read access to an ingested CPE dictionary.
+
+    Rows are stored ordered by part type, so each part occupies one
+    contiguous id range and sampling only needs random ids, never a scan.
+    The interface mirrors CPEIndex so either can back the API routes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+        conn = self._connection()
+        meta = dict(conn.execute("SELECT key, value FROM cpe_store_meta"))
+        self.part_ranges = json.loads(meta.get('part_ranges', '{}'))
+        self.total = int(meta.get('entry_count', 0))
+        self.ingested_at = meta.get('ingested_at')
+
+    def _connection(self):
+        # sqlite3 connections may not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self.total
+
+    def __contains__(self, cpe_string):
+        row = self._connection().execute(
+            "SELECT 1 FROM cpe_dictionary WHERE cpe = ?", (cpe_string,)
+        ).fetchone()
+        return row is not None
+
+    def _fetch_ids(self, ids):
+        """Return CPE strings for the given ids, in the same order"""
+        conn = self._connection()
+        found = {}
+        for start in range(0, len(ids), _MAX_SQL_VARIABLES):
+            chunk = ids[start:start + _MAX_SQL_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            found.update(conn.execute(
+                f"SELECT id, cpe FROM cpe_dictionary WHERE id IN ({placeholders})", chunk
+            ))
+        return [found[i] for i in ids if i in found]
+
+    def iter_products(self):
+        """Yield each distinct (vendor, product) pair"""
+        return iter(self._connection().execute(
+            "SELECT DISTINCT vendor, product FROM cpe_dictionary ORDER BY vendor, product"
+        ))
+
+    def vendor_entries(self, vendor, limit=None):
+        """Return CPE strings for a vendor"""
+        query = "SELECT cpe FROM cpe_dictionary WHERE vendor = ? ORDER BY id"
+        params = [vendor]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [row[0] for row in self._connection().execute(query, params)]
+
+    def product_entries(self, vendor, product, limit=None):
+        """Return CPE strings for a vendor/product pair"""
+        return self.search(vendor, product, limit=limit)
+
+    def search(self, vendor, product, version='', limit=None):
+        """Return CPE strings matching vendor, product and optionally a version prefix"""
+        query = "SELECT cpe FROM cpe_dictionary WHERE vendor = ? AND product = ?"
+        params = [vendor, product]
+        if version:
+            query += " AND substr(version, 1, ?) = ?"
+            params.extend([len(version), version])
+        query += " ORDER BY id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [row[0] for row in self._connection().execute(query, params)]
+
+    def sample_stratified(self, count, rng=random):
+        """
+        Draw up to `count` distinct CPE strings, split as evenly as possible
+        across the a/o/h part types. See CPEIndex.sample_stratified.
+        """
+        count = min(count, self.total)
+        parts = ('a', 'o', 'h')
+        per_category = count // len(parts)
+        remainder = count % len(parts)
+
+        chosen = []
+        for idx, part in enumerate(parts):
+            category_count = per_category + (1 if idx < remainder else 0)
+            first_id, size = self.part_ranges.get(part, (0, 0))
+            available = min(category_count, size)
+            if available:
+                chosen.extend(first_id + i for i in rng.sample(range(size), available))
+
+        needed = count - len(chosen)
+        if needed > 0:
+            taken = set(chosen)
+            draw = min(self.total, needed + len(taken))
+            for offset in rng.sample(range(self.total), draw):
+                if offset + 1 not in taken:
+                    chosen.append(offset + 1)
+                    needed -= 1
+                    if not needed:
+                        break
+
+        rng.shuffle(chosen)
+        return self._fetch_ids(chosen)
+
+
+def open_cpe_store(path=DEFAULT_STORE_PATH):
+    """Open the local CPE store, or return None if it has not been ingested yet"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return CPEStore(path)
+    except sqlite3.Error as e:
+        print(f"Error opening CPE store {path}: {e}")
+        return None
+
+
+def _open_feed(path):
+    """Open a feed file as a binary stream, transparently decompressing gzip"""
+    if path.endswith('.gz') and not path.endswith(('.tar.gz', '.tgz')):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _feed_format(name):
+    name = name[:-3] if name.endswith('.gz') else name
+    if name.endswith('.xml'):
+        return 'xml'
+    if name.endswith('.json'):
+        return 'json'
+    return None
+
+
+def iter_xml_feed(fp):
+    """
+    Yield (cpe23, title, deprecated) from the CPE 2.3 XML dictionary.
+    Processed items are cleared from the tree to keep memory bounded.
+    """
+    root = None
+    for event, elem in ET.iterparse(fp, events=('start', 'end')):
+        if root is None:
+            root = elem
+            continue
+        if event != 'end' or elem.tag != _CPE_DICT_NS + 'cpe-item':
+            continue
+
+        item23 = elem.find(_CPE_23_NS + 'cpe23-item')
+        if item23 is not None:
+            title = None
+            for title_elem in elem.iterfind(_CPE_DICT_NS + 'title'):
+                title = title_elem.text
+                if title_elem.get('{http://www.w3.org/XML/1998/namespace}lang', '').startswith('en'):
+                    break
+            deprecated = elem.get('deprecated', 'false') == 'true'
+            yield item23.get('name'), title, deprecated
+
+        root.clear()
+
+
+def iter_json_feed(fp):
+    """Yield (cpe23, title, deprecated) from an NVD CPE JSON 2.0 product file"""
+    for product in iter_json_array(fp, key='products'):
+        cpe = product.get('cpe', {})
+        title = None
+        for entry in cpe.get('titles', []):
+            title = entry.get('title')
+            if entry.get('lang', '').startswith('en'):
+                break
+        yield cpe.get('cpeName'), title, bool(cpe.get('deprecated', False))
+
+
+def iter_feed(path):
+    """Yield (cpe23, title, deprecated) from any supported feed file"""
+    if path.endswith(('.tar.gz', '.tgz', '.tar')):
+        # Stream mode reads members sequentially without seeking
+        mode = 'r|' if path.endswith('.tar') else 'r|gz'
+        with tarfile.open(path, mode) as archive:
+            for member in archive:
+                feed_format = _feed_format(member.name)
+                if not member.isfile() or feed_format is None:
+                    continue
+                fp = archive.extractfile(member)
+                if member.name.endswith('.gz'):
+                    fp = gzip.GzipFile(fileobj=fp)
+                yield from (iter_xml_feed(fp) if feed_format == 'xml' else iter_json_feed(fp))
+        return
+
+    feed_format = _feed_format(path)
+    if feed_format is None:
+        raise ValueError(f"Unsupported feed file: {path}")
+    with _open_feed(path) as fp:
+        yield from (iter_xml_feed(fp) if feed_format == 'xml' else iter_json_feed(fp))
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def ingest_feeds(feed_paths, db_path=DEFAULT_STORE_PATH, batch_size=INGEST_BATCH_SIZE,
+                 include_deprecated=False, progress=None):
+    """
+    Stream-parse NVD CPE feed files into a fresh local store.
+
+    The store is built in a temporary file and swapped in atomically, so
+    running processes keep reading the previous copy during a refresh.
+
+    Args:
+        feed_paths: list of feed file paths
+        db_path: destination SQLite file
+        batch_size: rows per insert batch
+        include_deprecated: keep entries NVD marked as deprecated
+        progress: optional callable(entries_read) invoked after each batch
+
+    Returns:
+        dict: ingest statistics (entries, skipped, seconds, entries_per_sec, peak_rss_mb)
+    """
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    started = time.perf_counter()
+    read_count = 0
+    skipped = 0
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(_SCHEMA)
+        # Staging table dedupes by CPE; rows are copied into part order afterwards
+        conn.execute(
+            "CREATE TEMP TABLE cpe_staging ("
+            "cpe TEXT PRIMARY KEY, part TEXT, vendor TEXT, product TEXT, "
+            "version TEXT, title TEXT, deprecated INTEGER) WITHOUT ROWID"
+        )
+
+        batch = []
+        for feed_path in feed_paths:
+            for cpe23, title, deprecated in iter_feed(feed_path):
+                read_count += 1
+                fields = split_cpe23(cpe23) if cpe23 else []
+                if len(fields) < 6 or fields[0] != 'cpe' or (deprecated and not include_deprecated):
+                    skipped += 1
+                    continue
+                batch.append((cpe23, fields[2], fields[3], fields[4], fields[5], title, int(deprecated)))
+                if len(batch) >= batch_size:
+                    conn.executemany("INSERT OR IGNORE INTO cpe_staging VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+                    batch = []
+                    if progress:
+                        progress(read_count)
+        if batch:
+            conn.executemany("INSERT OR IGNORE INTO cpe_staging VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+
+        conn.execute(
+            "INSERT INTO cpe_dictionary (cpe, part, vendor, product, version, title, deprecated) "
+            "SELECT cpe, part, vendor, product, version, title, deprecated "
+            "FROM cpe_staging ORDER BY part, cpe"
+        )
+        conn.execute("DROP TABLE cpe_staging")
+        conn.executescript(_INDEXES)
+
+        part_ranges = {
+            part: (first_id, size)
+            for part, first_id, size in conn.execute(
+                "SELECT part, MIN(id), COUNT(*) FROM cpe_dictionary GROUP BY part"
+            )
+        }
+        entry_count = sum(size for _, size in part_ranges.values())
+        conn.executemany("INSERT INTO cpe_store_meta VALUES (?, ?)", [
+            ('part_ranges', json.dumps(part_ranges)),
+            ('entry_count', str(entry_count)),
+            ('ingested_at', time.strftime('%Y-%m-%d %H:%M:%S')),
+            ('source', json.dumps([os.path.basename(p) for p in feed_paths])),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+
+    seconds = time.perf_counter() - started
+    return {
+        'entries': entry_count,
+        'read': read_count,
+        'skipped': skipped,
+        'duplicates': read_count - skipped - entry_count,
+        'seconds': round(seconds, 2),
+        'entries_per_sec': round(read_count / seconds) if seconds else read_count,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest the NVD CPE dictionary into a local store')
+    parser.add_argument('feeds', nargs='+', help='CPE 2.3 XML or JSON 2.0 feed files (.gz/.tar.gz supported)')
+    parser.add_argument('--db', default=DEFAULT_STORE_PATH, help=f'output store path (default: {DEFAULT_STORE_PATH})')
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE, help='rows per insert batch')
+    parser.add_argument('--include-deprecated', action='store_true', help='keep deprecated CPE entries')
+    args = parser.parse_args()
+
+    def report(entries_read):
+        print(f"  {entries_read:,} entries read...", flush=True)
+
+    stats = ingest_feeds(args.feeds, args.db, args.batch_size, args.include_deprecated, report)
+
+    print(f"Ingested {stats['entries']:,} CPE entries into {args.db}")
+    print(f"  read: {stats['read']:,}  skipped: {stats['skipped']:,}  duplicates: {stats['duplicates']:,}")
+    print(f"  time: {stats['seconds']}s  throughput: {stats['entries_per_sec']:,} entries/sec")
+    if stats['peak_rss_mb'] is not None:
+        print(f"  peak RSS: {stats['peak_rss_mb']} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,38 @@
 # db_config.py - 資料庫設定檔
+import hashlib
 import json
 import os
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.request import pathname2url
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+
+from metrics import DB_CHECKOUT_LATENCY, DB_COMMIT_LATENCY, DB_CONNECT_LATENCY, DB_ROWS, STAGE_LATENCY
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 沒有 fcntl，改用 msvcrt 鎖定檔案
+    fcntl = None
+    import msvcrt
 
 try:
     import pyodbc
     PYODBC_AVAILABLE = True
 except ImportError:
     PYODBC_AVAILABLE = False
-    print("Warning: pyodbc is not installed. Database functionality will be disabled.")
-    print("To enable database features, install pyodbc: pip install pyodbc")
+    print("Warning: pyodbc is not installed. SQL Server connections will be disabled (SQLite is still available).")
+    print("To enable SQL Server connections, install pyodbc: pip install pyodbc")
+
+# 各後端的資料庫錯誤；資料格式錯誤或違反條件約束時只影響個別資料列
+if PYODBC_AVAILABLE:
+    DB_ERRORS = (pyodbc.Error, sqlite3.Error)
+    ROW_ERRORS = (pyodbc.DataError, pyodbc.IntegrityError, sqlite3.DataError, sqlite3.IntegrityError)
+else:
+    DB_ERRORS = (sqlite3.Error,)
+    ROW_ERRORS = (sqlite3.DataError, sqlite3.IntegrityError)
 
 # 預設 SQL Server 連線設定
 # 注意：此應用程式僅支援本地資料庫連線（localhost）以確保安全性
@@ -36,42 +60,288 @@ ALLOWED_LOCALHOST_NAMES = [
 # 資料庫連線設定常數
 CONNECTION_TIMEOUT = 10  # 連線超時秒數
 CPE_RECORDS_TABLE = 'cpe_records'  # CPE 記錄資料表名稱
+# 寫入欄位；upsert 模式另外寫入 record_hash（識別同一筆軟體）與 content_hash（全部欄位內容）
+CPE_INSERT_COLUMNS = "vendor, product_name, version, other_fields, size_mb, install_date, install_path"
+CPE_UPSERT_COLUMNS = CPE_INSERT_COLUMNS + ", record_hash, content_hash"
 # 用於儲存動態配置的檔案
 DB_CONFIG_FILE = 'db_connections.json'
+# 目前使用的連線，由同一台主機上的所有 worker 行程共用
+DB_CURRENT_FILE = 'db_current.json'
+# 寫入上述兩個檔案時持有的鎖定檔
+DB_CONFIG_LOCK_FILE = 'db_connections.lock'
+# 快取的設定最多每隔此秒數檢查一次檔案是否被其他行程修改
+CONFIG_CHECK_INTERVAL = 1.0
+# 連線設定未指定 backend 時使用的資料庫類型（sqlserver 或 sqlite）
+DEFAULT_DB_BACKEND = 'sqlserver'
+# SQLite 資料庫檔案只能位於此目錄之下；連線設定中的 database 為此目錄下的相對路徑
+SQLITE_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sqlite_data')
 
-# 目前使用的資料庫配置
-current_db_config = None
+# 連線池設定（每組連線設定各自一個連線池）
+POOL_MIN_SIZE = 1  # 閒置回收時至少保留的連線數
+POOL_MAX_SIZE = 10  # 同時開啟的連線數上限
+POOL_IDLE_TIMEOUT = 300  # 閒置超過此秒數的連線會被關閉
+POOL_MAINTENANCE_INTERVAL = 30  # 背景回收閒置連線的檢查間隔秒數
+POOL_VALIDATE_AFTER = 5  # 閒置超過此秒數的連線在取出時先以 SELECT 1 驗證
+POOL_CHECKOUT_TIMEOUT = CONNECTION_TIMEOUT  # 連線池已滿時等待可用連線的秒數
 
-def load_db_connections():
-    """從檔案載入已儲存的資料庫連線設定"""
-    if os.path.exists(DB_CONFIG_FILE):
+# 熔斷器設定（每組連線設定各自一個熔斷器）
+BREAKER_FAILURE_THRESHOLD = 3  # 連續連線失敗幾次後暫停連線
+BREAKER_RESET_TIMEOUT = 5  # 第一次暫停的秒數，之後每次試探失敗加倍
+BREAKER_MAX_RESET_TIMEOUT = 300  # 暫停秒數上限
+
+# 健康檢查設定
+HEALTH_CHECK_WORKERS = 8  # 同時檢查的連線數
+HEALTH_CHECK_DEADLINE = CONNECTION_TIMEOUT + 5  # 整次檢查的時限秒數
+
+# 批次寫入設定
+INSERT_CHUNK_SIZE = 1000  # 每段寫入並提交的筆數
+USE_FAST_EXECUTEMANY = True  # 以參數陣列一次綁定整段資料（pyodbc fast_executemany）
+MAX_REPORTED_ROW_ERRORS = 10  # 回傳結果中最多列出的失敗資料列數
+
+# 讀取設定
+DB_FETCH_ROWS = 1000  # 串流讀取時每次 fetchmany 的筆數
+DEFAULT_PAGE_SIZE = 100  # 分頁查詢預設每頁筆數
+MAX_PAGE_SIZE = 1000  # 分頁查詢每頁筆數上限
+# 可篩選的欄位與對應的資料表欄位；值含 * 時視為萬用字元
+RECORD_FILTER_COLUMNS = {'vendor': 'vendor', 'product': 'product_name', 'version': 'version'}
+
+
+class _FileLock:
+    """跨行程的獨占檔案鎖（POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            # msvcrt 鎖定的是位元組範圍，固定鎖定第一個位元組
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc_info):
         try:
-            with open(DB_CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"載入資料庫連線設定失敗: {e}")
-            return {}
-    return {}
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class _ConfigFile:
+    """
+    快取一個 JSON 檔案的內容
+
+    以檔案的 mtime、inode 與大小判斷是否需要重新讀取，且最多每隔
+    CONFIG_CHECK_INTERVAL 秒檢查一次，其餘時間直接回傳快取。
+    """
+
+    def __init__(self, path, default):
+        self.path = path
+        self.default = default
+        self.value = default
+        self._signature = None
+        self._checked = 0.0
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+    def refresh(self, force=False):
+        """檔案有變動時重新讀取，回傳內容是否改變"""
+        now = time.monotonic()
+        if not force and now - self._checked < CONFIG_CHECK_INTERVAL:
+            return False
+        self._checked = now
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return False
+        value = self.default
+        if signature is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    value = json.load(f)
+            except Exception as e:
+                print(f"載入設定檔 {self.path} 失敗: {e}")
+        self._signature = signature
+        changed = value != self.value
+        self.value = value
+        return changed
+
+    def write(self, value):
+        """寫入暫存檔後以 os.replace 取代原檔，讀取端不會看到寫到一半的內容"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(self.path) + '.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.value = value
+        self._signature = self._stat_signature()
+        self._checked = time.monotonic()
+
+
+class ConnectionRegistry:
+    """
+    已儲存的連線設定與目前使用的連線
+
+    兩者都快取在記憶體中，取得目前連線時通常不需要讀取檔案；其他
+    worker 行程的修改最多在 CONFIG_CHECK_INTERVAL 秒後生效。寫入時
+    持有檔案鎖，並在鎖內重新讀取最新內容後再修改，多個行程同時修改
+    也不會互相覆蓋。目前使用的連線寫入 current_path，所有行程共用。
+    """
+
+    def __init__(self, path=DB_CONFIG_FILE, current_path=DB_CURRENT_FILE,
+                 lock_path=DB_CONFIG_LOCK_FILE, on_current_change=None, on_connections_change=None):
+        self._connections = _ConfigFile(path, {})
+        self._current = _ConfigFile(current_path, None)
+        self.lock_path = lock_path
+        self.on_current_change = on_current_change
+        self.on_connections_change = on_connections_change
+        self._local_current = None
+        self._lock = threading.RLock()
+
+    def _file_lock(self):
+        return _FileLock(self.lock_path)
+
+    def connections(self):
+        """回傳已儲存的連線設定（副本，可自由修改）"""
+        with self._lock:
+            previous = self._connections.value
+            if self._connections.refresh():
+                self._notify_connections(previous, self._connections.value)
+            # 每組連線設定都是單層 dict，複製一層即可
+            return {name: dict(config) for name, config in self._connections.value.items()}
+
+    def modify(self, update):
+        """
+        在檔案鎖內讀取最新的連線設定，呼叫 update(connections) 修改後寫回
+
+        update 回傳 False 時不寫回。
+
+        Returns:
+            tuple: (update 的回傳值, 錯誤訊息或 None)
+        """
+        with self._lock:
+            try:
+                with self._file_lock():
+                    previous = self._connections.value
+                    self._connections.refresh(force=True)
+                    connections = {name: dict(config) for name, config in self._connections.value.items()}
+                    result = update(connections)
+                    if result is not False:
+                        self._connections.write(connections)
+                self._notify_connections(previous, self._connections.value)
+                return result, None
+            except OSError as e:
+                print(f"儲存資料庫連線設定失敗: {e}")
+                return None, str(e)
+
+    def current(self):
+        """目前使用的連線設定；未設定時為 None"""
+        with self._lock:
+            if self._local_current is not None:
+                return self._local_current
+            previous = self._current.value
+            if self._current.refresh():
+                self._notify(previous, self._current.value)
+            return self._current.value
+
+    def set_current(self, config, shared=True):
+        """
+        設定目前使用的連線
+
+        shared 為 False 時只影響本行程（例如效能測試），不寫入共用檔案。
+        """
+        with self._lock:
+            previous = self.current()
+            if shared:
+                self._local_current = None
+                with self._file_lock():
+                    self._current.write(config)
+            else:
+                self._local_current = config
+            self._notify(previous, config)
+
+    def _notify(self, previous, config):
+        if self.on_current_change is not None:
+            self.on_current_change(previous, config)
+
+    def _notify_connections(self, previous, connections):
+        if self.on_connections_change is not None and previous != connections:
+            self.on_connections_change(previous, connections)
+
+
+def _close_switched_pool(previous_config, config):
+    # 切換到不同資料庫時關閉原連線池（其他行程切換時也會在此關閉）
+    previous_config = previous_config or DEFAULT_DB_CONFIG
+    if _pool_key(previous_config) != _pool_key(config or DEFAULT_DB_CONFIG):
+        close_connection_pool(previous_config)
+
+
+def _close_removed_pools(previous_connections, connections):
+    # 連線設定被刪除或修改後，關閉舊設定的連線池（仍是目前使用的連線除外）
+    keep = {_pool_key(config) for config in connections.values()}
+    keep.add(_pool_key(get_current_db_config()))
+    for config in previous_connections.values():
+        if _pool_key(config) not in keep:
+            close_connection_pool(config)
+
+
+DB_CONNECTIONS = ConnectionRegistry(
+    on_current_change=_close_switched_pool,
+    on_connections_change=_close_removed_pools
+)
+
+def load_db_connections():
+    """取得已儲存的資料庫連線設定（使用快取，檔案變動時重新載入）"""
+    return DB_CONNECTIONS.connections()
+
+def modify_db_connections(update):
+    """
+    修改已儲存的資料庫連線設定，讀取、修改與寫回都在檔案鎖內完成
+
+    Args:
+        update: 接收連線設定 dict 並直接修改的函式；回傳 False 時不寫回
+
+    Returns:
+        tuple: (update 的回傳值, 錯誤訊息或 None)
+    """
+    return DB_CONNECTIONS.modify(update)
 
 def save_db_connections(connections):
-    """儲存資料庫連線設定到檔案"""
-    try:
-        with open(DB_CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(connections, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"儲存資料庫連線設定失敗: {e}")
-        return False
+    """以整份內容取代已儲存的資料庫連線設定"""
+    def replace(current):
+        current.clear()
+        current.update(connections)
+    _, error = modify_db_connections(replace)
+    return error is None
 
-def set_current_db_config(config):
-    """設定目前使用的資料庫配置"""
-    global current_db_config
-    current_db_config = config
+def set_current_db_config(config, shared=True):
+    """設定目前使用的資料庫配置，切換到不同資料庫時關閉原連線池"""
+    DB_CONNECTIONS.set_current(config, shared=shared)
 
 def get_current_db_config():
     """取得目前使用的資料庫配置"""
-    global current_db_config
-    return current_db_config if current_db_config else DEFAULT_DB_CONFIG
+    return DB_CONNECTIONS.current() or DEFAULT_DB_CONFIG
 
 def is_localhost(server):
     """
@@ -110,6 +380,16 @@ def get_error_suggestion(error_message):
     
     suggestions = []
     
+    # SQLite 相關錯誤
+    if 'unable to open database' in error_lower:
+        suggestions.append("📁 無法開啟 SQLite 資料庫檔案:")
+        suggestions.append("   • 請確認檔案路徑所在的資料夾存在")
+        suggestions.append("   • 請確認應用程式對該資料夾有寫入權限")
+    if 'database is locked' in error_lower:
+        suggestions.append("🔒 SQLite 資料庫忙碌中:")
+        suggestions.append("   • 另一個行程正在寫入同一個資料庫檔案，請稍後再試")
+        suggestions.append("   • 請勿將資料庫檔案放在網路磁碟上（WAL 模式需要本機檔案系統）")
+    
     # ODBC Driver 相關錯誤
     if 'driver' in error_lower or 'odbc' in error_lower:
         suggestions.append("🔧 ODBC 驅動程式問題:")
@@ -176,41 +456,373 @@ def get_error_suggestion(error_message):
     
     return '\n'.join(suggestions)
 
-def get_db_connection(config=None):
+
+class PoolTimeoutError(Exception):
+    """連線池已達上限且在等待時間內沒有可用連線"""
+
+
+class ConnectionPool:
     """
-    建立並返回資料庫連線
-    此函式僅支援連線到本地資料庫（localhost）
-    
+    單一資料庫連線設定的執行緒安全連線池
+
+    取出時優先使用最近歸還的閒置連線；閒置超過 validate_after 秒的連線
+    會先以 SELECT 1 驗證，失效則改建新連線。歸還時先 rollback 未提交的
+    交易，失敗的連線直接關閉。
+
+    maintain() 由背景執行緒定期呼叫（見 _PoolMaintenance），與是否有
+    請求無關：第一次呼叫時預先建立連線到 min_size 條，之後每次關閉
+    閒置超過 idle_timeout 秒的連線，但至少保留 min_size 條。取出與
+    歸還連線時也會順便回收。
+
     Args:
-        config: 資料庫配置字典，如果為 None 則使用當前配置
-    
-    Returns:
-        tuple: (connection, error_message)
-            - connection: pyodbc.Connection 或 None
-            - error_message: 錯誤訊息字串（如果成功則為 None）
+        connect: 建立新連線的函式
+        label: 統計資訊中顯示的名稱（不含密碼）
     """
-    if not PYODBC_AVAILABLE:
-        error_msg = "pyodbc 模組未安裝，無法連線到資料庫。"
-        suggestion = get_error_suggestion(error_msg)
-        return None, f"{error_msg}\n\n{suggestion}"
-    
-    # 使用提供的配置或當前配置
-    db_config = config if config else get_current_db_config()
-    
-    # 驗證伺服器位址是否為本地主機
-    server = db_config.get('server', '')
-    if not is_localhost(server):
-        error_msg = f"❌ 安全限制：此應用程式僅支援連線到本地資料庫\n"
-        error_msg += f"您嘗試連線的伺服器: {server}\n\n"
-        error_msg += "🔒 允許的本地伺服器位址:\n"
-        for allowed in ALLOWED_LOCALHOST_NAMES:
-            error_msg += f"   • {allowed}\n"
-        error_msg += "\n💡 建議:\n"
-        error_msg += "   • 請將伺服器位址改為 'localhost' 或 '127.0.0.1'\n"
-        error_msg += "   • 如果您需要連線到遠端資料庫，請聯絡系統管理員\n"
-        return None, error_msg
-    
-    try:
+
+    def __init__(self, connect, label='', min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT, validate_after=POOL_VALIDATE_AFTER):
+        self._connect = connect
+        self.label = label
+        self.min_size = min_size
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+        self._idle = []  # (connection, 歸還時間)，最舊的在最前面
+        self._in_use = 0
+        self._closed = False
+        self._warmed = False
+        self._cond = threading.Condition()
+        self._counters = {
+            'checkouts': 0,
+            'created': 0,
+            'reused': 0,
+            'validation_failures': 0,
+            'evicted': 0,
+            'waits': 0,
+            'timeouts': 0
+        }
+
+    def acquire(self, timeout=POOL_CHECKOUT_TIMEOUT):
+        """
+        取出一條連線，連線池已滿時最多等待 timeout 秒
+
+        Raises:
+            PoolTimeoutError: 等待逾時
+            DB_ERRORS: 建立新連線失敗
+        """
+        deadline = time.monotonic() + timeout
+        stale = []
+        try:
+            with self._cond:
+                connection, returned_at = self._checkout(deadline, timeout, stale)
+        finally:
+            self._close_all(stale)
+
+        try:
+            if connection is not None and time.monotonic() - returned_at >= self.validate_after:
+                if not self._validate(connection):
+                    self._close_all([connection])
+                    connection = None
+                    with self._cond:
+                        self._counters['validation_failures'] += 1
+            if connection is None:
+                connection = self._connect()
+                with self._cond:
+                    self._counters['created'] += 1
+            else:
+                with self._cond:
+                    self._counters['reused'] += 1
+            return connection
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, connection, discard=False):
+        """歸還連線；discard 為 True 或連線池已關閉時直接關閉連線"""
+        if not discard:
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                stale = [connection]
+            else:
+                self._idle.append((connection, time.monotonic()))
+                stale = self._evict_idle()
+            self._cond.notify()
+        self._close_all(stale)
+
+    def maintain(self):
+        """第一次呼叫時預先建立連線到 min_size 條，並關閉閒置過久的連線"""
+        if not self._warmed:
+            self._warmed = True
+            self.warm_up()
+        with self._cond:
+            stale = self._evict_idle()
+        self._close_all(stale)
+
+    def warm_up(self):
+        """建立連線直到共有 min_size 條；建立失敗時停止，由之後的取出重試"""
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + self._in_use >= self.min_size:
+                    return
+                # 先佔用名額，建立期間不會超過 max_size
+                self._in_use += 1
+            try:
+                connection = self._connect()
+            except Exception:
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                self._counters['created'] += 1
+            self.release(connection)
+
+    def close(self):
+        """關閉連線池：立即關閉閒置連線，使用中的連線於歸還時關閉"""
+        with self._cond:
+            self._closed = True
+            stale = [connection for connection, _ in self._idle]
+            self._idle = []
+            self._cond.notify_all()
+        self._close_all(stale)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'label': self.label,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'closed': self._closed,
+                **self._counters
+            }
+
+    def _checkout(self, deadline, timeout, stale):
+        # 需持有鎖；傳回 (閒置連線, 歸還時間)，或 (None, None) 表示已佔用名額、需建立新連線
+        waited = False
+        while True:
+            if self._closed:
+                raise RuntimeError("連線池已關閉")
+            stale.extend(self._evict_idle())
+            if self._idle:
+                connection, returned_at = self._idle.pop()
+            elif self._in_use < self.max_size:
+                connection, returned_at = None, None
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"連線池已滿（上限 {self.max_size} 條），等待 {timeout} 秒後仍無可用連線"
+                    )
+                if not waited:
+                    self._counters['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+                continue
+            self._in_use += 1
+            self._counters['checkouts'] += 1
+            return connection, returned_at
+
+    def _evict_idle(self):
+        # 需持有鎖；傳回應在鎖外關閉的連線
+        cutoff = time.monotonic() - self.idle_timeout
+        stale = []
+        while (self._idle and self._idle[0][1] < cutoff
+               and len(self._idle) + self._in_use > self.min_size):
+            stale.append(self._idle.pop(0)[0])
+        self._counters['evicted'] += len(stale)
+        return stale
+
+    @staticmethod
+    def _validate(connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_all(connections):
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+class CircuitBreaker:
+    """
+    單一資料庫連線設定的熔斷器
+
+    closed：正常連線。連續 failure_threshold 次連線失敗後轉為 open，
+    暫停 reset_timeout 秒；期間的連線要求立即失敗，不再等待連線逾時。
+    暫停結束後轉為 half_open，只放行一個試探連線：成功則回到 closed，
+    失敗則再次 open，暫停秒數加倍（最多 max_reset_timeout 秒）。
+    """
+
+    def __init__(self, label='', failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_TIMEOUT, max_reset_timeout=BREAKER_MAX_RESET_TIMEOUT):
+        self.label = label
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.last_error = None
+        self._open_timeout = reset_timeout
+        self._retry_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._counters = {'trips': 0, 'rejected': 0}
+
+    def allow(self):
+        """是否可嘗試連線；half_open 時只有第一個呼叫者取得試探機會"""
+        with self._lock:
+            if self.state == 'open' and time.monotonic() >= self._retry_at:
+                self.state = 'half_open'
+            if self.state == 'closed' or (self.state == 'half_open' and not self._probing):
+                self._probing = self.state == 'half_open'
+                return True
+            self._counters['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._open_timeout = self.reset_timeout
+            self._probing = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == 'half_open':
+                # 試探失敗，暫停時間加倍
+                self._open_timeout = min(self._open_timeout * 2, self.max_reset_timeout)
+                self._trip()
+            elif self.state == 'closed' and self.failures >= self.failure_threshold:
+                self._trip()
+            self._probing = False
+
+    def cancel(self):
+        """連線未完成但也不代表資料庫故障（例如連線池已滿），釋出試探機會"""
+        with self._lock:
+            self._probing = False
+
+    def retry_in(self):
+        """距離下次可試探連線的秒數"""
+        with self._lock:
+            return max(0.0, self._retry_at - time.monotonic()) if self.state == 'open' else 0.0
+
+    def stats(self):
+        return {
+            'label': self.label,
+            'state': self.state,
+            'failures': self.failures,
+            'retry_in': round(self.retry_in(), 1),
+            'last_error': self.last_error,
+            **self._counters
+        }
+
+    def _trip(self):
+        # 需持有鎖
+        self.state = 'open'
+        self._retry_at = time.monotonic() + self._open_timeout
+        self._counters['trips'] += 1
+
+
+class PooledConnection:
+    """
+    從連線池取出的連線，其餘屬性與方法皆轉給原本的資料庫連線
+    close() 會將連線歸還連線池而非真正關閉
+
+    Attributes:
+        backend: 此連線的資料庫後端（SQLServerBackend 或 SQLiteBackend）
+    """
+
+    def __init__(self, pool, connection, backend):
+        self._pool = pool
+        self._connection = connection
+        self.backend = backend
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise AttributeError(f"連線已歸還連線池，無法存取 {name}")
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+    def invalidate(self):
+        """關閉並丟棄此連線（例如連線已中斷時）"""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection, discard=True)
+
+
+def _localhost_error(server):
+    error_msg = f"❌ 安全限制：此應用程式僅支援連線到本地資料庫\n"
+    error_msg += f"您嘗試連線的伺服器: {server}\n\n"
+    error_msg += "🔒 允許的本地伺服器位址:\n"
+    for allowed in ALLOWED_LOCALHOST_NAMES:
+        error_msg += f"   • {allowed}\n"
+    error_msg += "\n💡 建議:\n"
+    error_msg += "   • 請將伺服器位址改為 'localhost' 或 '127.0.0.1'\n"
+    error_msg += "   • 如果您使用 SQL Server Express，可以嘗試 'localhost\\SQLEXPRESS'\n"
+    error_msg += "   • 如果您需要連線到遠端資料庫，請聯絡系統管理員\n"
+    return error_msg
+
+
+class SQLServerBackend:
+    """透過 pyodbc 連線的 SQL Server，僅支援本地主機"""
+
+    name = 'sqlserver'
+
+    def check_config(self, db_config):
+        """無法使用此設定連線時傳回錯誤訊息，否則傳回 None"""
+        if not PYODBC_AVAILABLE:
+            error_msg = "pyodbc 模組未安裝，無法連線到資料庫。"
+            suggestion = get_error_suggestion(error_msg)
+            return f"{error_msg}\n\n{suggestion}"
+
+        # 驗證伺服器位址是否為本地主機
+        server = db_config.get('server', '')
+        if not is_localhost(server):
+            return _localhost_error(server)
+        return None
+
+    def pool_key(self, db_config):
+        return (
+            self.name,
+            (db_config.get('server') or '').lower().strip(),
+            db_config.get('database') or '',
+            bool(db_config.get('trusted_connection', False)),
+            db_config.get('username') or '',
+            db_config.get('password') or ''
+        )
+
+    def label(self, db_config):
+        label = f"{db_config.get('server', '')}/{db_config.get('database', '')}"
+        if not db_config.get('trusted_connection', False) and db_config.get('username'):
+            label = f"{db_config['username']}@{label}"
+        return label
+
+    def connect(self, db_config):
         if db_config.get('trusted_connection', False):
             # Windows 驗證
             connection_string = (
@@ -228,16 +840,484 @@ def get_db_connection(config=None):
                 f"UID={db_config['username']};"
                 f"PWD={db_config['password']};"
             )
-        
-        conn = pyodbc.connect(connection_string, timeout=CONNECTION_TIMEOUT)
-        return conn, None
-    except pyodbc.Error as e:
+        return pyodbc.connect(connection_string, timeout=CONNECTION_TIMEOUT)
+
+    def probe(self, db_config, writable=False):
+        """以獨立連線檢查是否能連線"""
+        self.connect(db_config).close()
+
+    def ensure_schema(self, db_config):
+        # SQL Server 的資料表由使用者建立（見 README）
+        pass
+
+    def page_query(self, select_sql, order_sql, params, limit):
+        """加上筆數限制的查詢與參數"""
+        return "SELECT TOP (?) " + select_sql + order_sql, [limit] + list(params)
+
+    def prepare_bulk_cursor(self, cursor):
+        # 以參數陣列一次綁定整段資料，而非逐筆往返
+        cursor.fast_executemany = USE_FAST_EXECUTEMANY
+
+    def upsert_chunk(self, cursor, rows):
+        """
+        將一段資料載入暫存資料表，再以一次 MERGE 合併到 cpe_records
+
+        暫存資料表為連線專屬的 #cpe_staging，連線池中的連線會重複使用。
+        rows 中的 record_hash 不可重複。
+
+        Returns:
+            tuple: (inserted, updated)
+        """
+        cursor.execute(
+            "IF OBJECT_ID('tempdb..#cpe_staging') IS NULL "
+            "CREATE TABLE #cpe_staging ("
+            "vendor NVARCHAR(255), product_name NVARCHAR(255), version NVARCHAR(100), "
+            "other_fields NVARCHAR(MAX), size_mb DECIMAL(10,2), install_date DATE, "
+            "install_path NVARCHAR(500), record_hash CHAR(32) PRIMARY KEY, content_hash CHAR(32))"
+        )
+        cursor.execute("TRUNCATE TABLE #cpe_staging")
+        cursor.executemany(
+            "INSERT INTO #cpe_staging (" + CPE_UPSERT_COLUMNS + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        # HOLDLOCK 避免兩個連線同時插入相同的 record_hash
+        cursor.execute(
+            "MERGE " + CPE_RECORDS_TABLE + " WITH (HOLDLOCK) AS t "
+            "USING #cpe_staging AS s ON t.record_hash = s.record_hash "
+            "WHEN MATCHED AND t.content_hash <> s.content_hash THEN UPDATE SET "
+            "t.vendor = s.vendor, t.product_name = s.product_name, t.version = s.version, "
+            "t.other_fields = s.other_fields, t.size_mb = s.size_mb, t.install_date = s.install_date, "
+            "t.install_path = s.install_path, t.content_hash = s.content_hash "
+            "WHEN NOT MATCHED BY TARGET THEN INSERT (" + CPE_UPSERT_COLUMNS + ") VALUES ("
+            "s.vendor, s.product_name, s.version, s.other_fields, s.size_mb, s.install_date, "
+            "s.install_path, s.record_hash, s.content_hash) "
+            "OUTPUT $action;"
+        )
+        actions = [row[0] for row in cursor.fetchall()]
+        return actions.count('INSERT'), actions.count('UPDATE')
+
+
+class SQLiteBackend:
+    """
+    內嵌的 SQLite 資料庫，database 欄位為資料庫檔案路徑
+
+    使用 WAL 模式，讀取不會阻擋寫入；第一次連線時自動建立 cpe_records
+    資料表與索引，欄位與 SQL Server 相同。文字欄位比對不區分大小寫，
+    與 SQL Server 預設的定序一致。
+    """
+
+    name = 'sqlite'
+
+    def __init__(self):
+        self._prepared = set()  # 本行程中已建立資料表的檔案
+        self._prepared_lock = threading.Lock()
+
+    def check_config(self, db_config):
+        _, error_msg = resolve_sqlite_path(db_config.get('database'))
+        return error_msg
+
+    def pool_key(self, db_config):
+        path, _ = resolve_sqlite_path(db_config.get('database'))
+        return (self.name, path)
+
+    def label(self, db_config):
+        return f"sqlite:{db_config.get('database', '')}"
+
+    def _open(self, db_config, mode):
+        # mode 為 SQLite URI 的 ro / rw / rwc；只有 rwc 會建立不存在的檔案
+        path, error_msg = resolve_sqlite_path(db_config.get('database'))
+        if error_msg:
+            raise ValueError(error_msg)
+        # 連線池會在不同執行緒間交接連線（同一時間只有一個執行緒使用）
+        return sqlite3.connect(f"file:{pathname2url(path)}?mode={mode}", uri=True,
+                               timeout=CONNECTION_TIMEOUT, check_same_thread=False)
+
+    def connect(self, db_config):
+        """開啟既有的資料庫檔案；檔案不存在時不會建立"""
+        conn = self._open(db_config, 'rw')
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def probe(self, db_config, writable=False):
+        """
+        不修改任何檔案地檢查連線：檔案不存在視為失敗，不會建立；
+        writable 為 True 時另外確認可寫入
+        """
+        path, error_msg = resolve_sqlite_path(db_config.get('database'))
+        if error_msg:
+            raise ValueError(error_msg)
+        if not os.path.isfile(path):
+            raise sqlite3.OperationalError(
+                f"資料庫檔案不存在: {db_config['database']}（第一次儲存資料時會自動建立）"
+            )
+        conn = self._open(db_config, 'rw' if writable else 'ro')
+        try:
+            conn.execute("SELECT 1").fetchone()
+        finally:
+            conn.close()
+
+    def ensure_schema(self, db_config):
+        """儲存資料前呼叫：必要時建立資料庫檔案、cpe_records 資料表與索引"""
+        path, error_msg = resolve_sqlite_path(db_config.get('database'))
+        if error_msg:
+            raise ValueError(error_msg)
+        if path in self._prepared and os.path.isfile(path):
+            return
+        with self._prepared_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = self._open(db_config, 'rwc')
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SQLITE_SCHEMA)
+                # 舊版建立的資料表補上 upsert 使用的欄位
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({CPE_RECORDS_TABLE})")}
+                for column in ('record_hash', 'content_hash'):
+                    if column not in columns:
+                        conn.execute(f"ALTER TABLE {CPE_RECORDS_TABLE} ADD COLUMN {column} CHAR(32)")
+                conn.executescript(SQLITE_INDEXES)
+            finally:
+                conn.close()
+            self._prepared.add(path)
+
+    def page_query(self, select_sql, order_sql, params, limit):
+        return "SELECT " + select_sql + order_sql + " LIMIT ?", list(params) + [limit]
+
+    def prepare_bulk_cursor(self, cursor):
+        # sqlite3 的 executemany 本身即在同一交易中逐筆執行，不需額外設定
+        pass
+
+    def upsert_chunk(self, cursor, rows):
+        """
+        將一段資料載入暫存資料表，再以一次 INSERT ... ON CONFLICT 合併
+        （SQLite 沒有 MERGE）；新增與更新筆數在合併前以同一交易計算
+        """
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS cpe_staging ("
+            "vendor, product_name, version, other_fields, size_mb, install_date, "
+            "install_path, record_hash PRIMARY KEY, content_hash)"
+        )
+        cursor.execute("DELETE FROM temp.cpe_staging")
+        cursor.executemany(
+            "INSERT INTO temp.cpe_staging (" + CPE_UPSERT_COLUMNS + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        # CROSS JOIN 讓查詢由暫存資料表出發，逐筆查 record_hash 索引，
+        # 而不是掃描整個 cpe_records
+        existing, changed = cursor.execute(
+            "SELECT COUNT(*), COUNT(CASE WHEN t.content_hash IS NOT s.content_hash THEN 1 END) "
+            "FROM temp.cpe_staging AS s CROSS JOIN " + CPE_RECORDS_TABLE + " AS t "
+            "ON t.record_hash = s.record_hash WHERE t.record_hash IS NOT NULL"
+        ).fetchone()
+        # WHERE true 讓 SQLite 能區分 SELECT 與 ON CONFLICT 子句
+        cursor.execute(
+            "INSERT INTO " + CPE_RECORDS_TABLE + " (" + CPE_UPSERT_COLUMNS + ") "
+            "SELECT " + CPE_UPSERT_COLUMNS + " FROM temp.cpe_staging WHERE true "
+            "ON CONFLICT (record_hash) WHERE record_hash IS NOT NULL DO UPDATE SET "
+            "vendor = excluded.vendor, product_name = excluded.product_name, version = excluded.version, "
+            "other_fields = excluded.other_fields, size_mb = excluded.size_mb, "
+            "install_date = excluded.install_date, install_path = excluded.install_path, "
+            "content_hash = excluded.content_hash "
+            "WHERE " + CPE_RECORDS_TABLE + ".content_hash IS NOT excluded.content_hash"
+        )
+        return len(rows) - existing, changed
+
+
+# cpe_records 資料表（SQLite 版本，欄位與 SQL Server 相同）
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {CPE_RECORDS_TABLE} (
+    id INTEGER PRIMARY KEY,
+    vendor NVARCHAR(255) COLLATE NOCASE,
+    product_name NVARCHAR(255) COLLATE NOCASE,
+    version NVARCHAR(100) COLLATE NOCASE,
+    other_fields NVARCHAR,
+    size_mb DECIMAL(10,2),
+    install_date DATE,
+    install_path NVARCHAR(500),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    record_hash CHAR(32),
+    content_hash CHAR(32)
+);
+"""
+
+SQLITE_INDEXES = f"""
+CREATE INDEX IF NOT EXISTS IX_{CPE_RECORDS_TABLE}_vendor_product
+    ON {CPE_RECORDS_TABLE} (vendor, product_name, version);
+CREATE INDEX IF NOT EXISTS IX_{CPE_RECORDS_TABLE}_install_date
+    ON {CPE_RECORDS_TABLE} (install_date);
+CREATE UNIQUE INDEX IF NOT EXISTS UX_{CPE_RECORDS_TABLE}_record_hash
+    ON {CPE_RECORDS_TABLE} (record_hash) WHERE record_hash IS NOT NULL;
+"""
+
+# 可用的資料庫後端，以連線設定中的 backend 欄位選擇
+DB_BACKENDS = {
+    SQLServerBackend.name: SQLServerBackend(),
+    SQLiteBackend.name: SQLiteBackend()
+}
+
+
+def configure_sqlite_data_dir(path):
+    """設定 SQLite 資料庫檔案所在的目錄"""
+    global SQLITE_DATA_DIR
+    SQLITE_DATA_DIR = os.path.abspath(path)
+
+
+def resolve_sqlite_path(database):
+    """
+    將連線設定中的 SQLite 資料庫名稱解析為 SQLITE_DATA_DIR 之下的檔案路徑
+
+    只接受相對路徑；絕對路徑、含 .. 的路徑，以及經符號連結後位於
+    資料目錄之外的路徑都會被拒絕。
+
+    Returns:
+        tuple: (path, error_message)
+    """
+    if not database or not isinstance(database, str):
+        return None, "❌ 請在資料庫欄位輸入 SQLite 資料庫檔案名稱（例如 cpe_records.db）"
+    parts = database.replace('\\', '/').split('/')
+    if (os.path.isabs(database) or os.path.splitdrive(database)[0] or '..' in parts
+            or '\0' in database or database.startswith(':')):
+        return None, (
+            f"❌ 不允許的 SQLite 資料庫路徑: {database}\n\n"
+            f"💡 請輸入資料目錄（{SQLITE_DATA_DIR}）下的相對路徑，例如 cpe_records.db"
+        )
+    base = os.path.realpath(SQLITE_DATA_DIR)
+    path = os.path.realpath(os.path.join(base, database))
+    if path == base or os.path.commonpath([base, path]) != base:
+        return None, f"❌ 不允許的 SQLite 資料庫路徑: {database}（位於資料目錄之外）"
+    return path, None
+
+
+def get_db_backend(db_config):
+    """取得連線設定所使用的資料庫後端，不支援的類型傳回 None"""
+    return DB_BACKENDS.get(db_config.get('backend') or DEFAULT_DB_BACKEND)
+
+
+def _unsupported_backend_error(db_config):
+    return (
+        f"❌ 不支援的資料庫類型: {db_config.get('backend')}\n"
+        f"支援的類型: {'、'.join(DB_BACKENDS)}"
+    )
+
+
+# 連線池，以連線設定為鍵
+_connection_pools = {}
+_connection_pools_lock = threading.Lock()
+
+
+class _PoolMaintenance:
+    """
+    每 interval 秒對所有連線池呼叫 maintain() 的背景執行緒
+
+    第一次建立連線池時才啟動；新的連線池建立時立即喚醒，以便預先
+    建立連線。
+    """
+
+    def __init__(self, interval=POOL_MAINTENANCE_INTERVAL):
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def wake(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cpe-db-pool-maintenance', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            with _connection_pools_lock:
+                pools = list(_connection_pools.values())
+            for pool in pools:
+                try:
+                    pool.maintain()
+                except Exception as e:
+                    print(f"連線池維護失敗 ({pool.label}): {e}")
+
+
+_POOL_MAINTENANCE = _PoolMaintenance()
+
+
+def _pool_key(db_config):
+    backend = get_db_backend(db_config)
+    return backend.pool_key(db_config) if backend else None
+
+
+# 熔斷器，以連線設定為鍵；關閉連線池時保留，切換回原資料庫時狀態仍有效
+_circuit_breakers = {}
+
+
+def configure_circuit_breaker(failure_threshold=None, reset_timeout=None, max_reset_timeout=None):
+    """調整熔斷器設定，僅套用於之後建立的熔斷器"""
+    global BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, BREAKER_MAX_RESET_TIMEOUT
+    if failure_threshold is not None:
+        BREAKER_FAILURE_THRESHOLD = failure_threshold
+    if reset_timeout is not None:
+        BREAKER_RESET_TIMEOUT = reset_timeout
+    if max_reset_timeout is not None:
+        BREAKER_MAX_RESET_TIMEOUT = max_reset_timeout
+
+
+def get_circuit_breaker(db_config, backend):
+    """取得（必要時建立）該連線設定的熔斷器"""
+    key = backend.pool_key(db_config)
+    with _connection_pools_lock:
+        breaker = _circuit_breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                label=backend.label(db_config),
+                failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=BREAKER_RESET_TIMEOUT,
+                max_reset_timeout=BREAKER_MAX_RESET_TIMEOUT
+            )
+            _circuit_breakers[key] = breaker
+        return breaker
+
+
+def get_circuit_breaker_state(db_config):
+    """取得連線設定的熔斷器狀態；尚未連線過時為 closed"""
+    with _connection_pools_lock:
+        breaker = _circuit_breakers.get(_pool_key(db_config))
+    if breaker is None:
+        return {'state': 'closed', 'failures': 0, 'retry_in': 0.0, 'last_error': None}
+    return breaker.stats()
+
+
+def configure_connection_pool(min_size=None, max_size=None, idle_timeout=None):
+    """調整連線池設定，僅套用於之後建立的連線池"""
+    global POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_IDLE_TIMEOUT
+    if min_size is not None:
+        POOL_MIN_SIZE = min_size
+    if max_size is not None:
+        POOL_MAX_SIZE = max_size
+    if idle_timeout is not None:
+        POOL_IDLE_TIMEOUT = idle_timeout
+
+
+def get_connection_pool(db_config, backend):
+    """取得（必要時建立）該連線設定的連線池"""
+    key = backend.pool_key(db_config)
+    with _connection_pools_lock:
+        pool = _connection_pools.get(key)
+        if pool is None:
+            pool_config = dict(db_config)
+            connect_latency = DB_CONNECT_LATENCY.labels(backend.name)
+
+            def connect():
+                with connect_latency.time():
+                    return backend.connect(pool_config)
+
+            pool = ConnectionPool(
+                connect,
+                label=backend.label(db_config),
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                idle_timeout=POOL_IDLE_TIMEOUT
+            )
+            _connection_pools[key] = pool
+            _POOL_MAINTENANCE.wake()
+        return pool
+
+
+def close_connection_pool(db_config=None):
+    """
+    關閉連線池
+
+    Args:
+        db_config: 只關閉此連線設定的連線池；為 None 時關閉全部
+    """
+    with _connection_pools_lock:
+        if db_config is None:
+            pools = list(_connection_pools.values())
+            _connection_pools.clear()
+        else:
+            pool = _connection_pools.pop(_pool_key(db_config), None)
+            pools = [pool] if pool else []
+    for pool in pools:
+        pool.close()
+
+
+def get_connection_pool_stats():
+    """取得所有連線池的統計資訊"""
+    with _connection_pools_lock:
+        pools = list(_connection_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def get_db_connection(config=None, pooled=True, create=False):
+    """
+    建立並返回資料庫連線
+    SQL Server 僅支援連線到本地資料庫（localhost）；SQLite 使用本機檔案
+    
+    Args:
+        config: 資料庫配置字典，如果為 None 則使用當前配置
+        pooled: 是否從連線池取出連線（預設為 True）；連線池的連線呼叫
+            close() 時會歸還連線池
+        create: 是否在連線前建立資料表（SQLite 並會建立資料庫檔案）；
+            只有儲存資料時使用
+    
+    Returns:
+        tuple: (connection, error_message)
+            - connection: PooledConnection、原始資料庫連線或 None
+            - error_message: 錯誤訊息字串（如果成功則為 None）
+    """
+    # 使用提供的配置或當前配置
+    db_config = config if config else get_current_db_config()
+    
+    backend = get_db_backend(db_config)
+    if backend is None:
+        return None, _unsupported_backend_error(db_config)
+    error_msg = backend.check_config(db_config)
+    if error_msg:
+        return None, error_msg
+    
+    # 測試連線（pooled=False）不受熔斷器限制
+    breaker = get_circuit_breaker(db_config, backend) if pooled else None
+    if breaker is not None and not breaker.allow():
+        error_msg = f"❌ 資料庫暫時無法連線（連續 {breaker.failures} 次連線失敗，已暫停連線）\n\n"
+        error_msg += f"最後的錯誤訊息: {breaker.last_error}\n\n"
+        error_msg += "💡 建議:\n"
+        error_msg += f"   • 將於 {breaker.retry_in():.0f} 秒後自動重試連線\n"
+        error_msg += "   • 請確認 SQL Server 服務是否已啟動，或使用「測試連線」立即檢查\n"
+        return None, error_msg
+    
+    try:
+        if create:
+            backend.ensure_schema(db_config)
+        if not pooled:
+            return backend.connect(db_config), None
+        pool = get_connection_pool(db_config, backend)
+        with DB_CHECKOUT_LATENCY.labels(backend.name).time():
+            connection = pool.acquire()
+        breaker.record_success()
+        return PooledConnection(pool, connection, backend), None
+    except PoolTimeoutError as e:
+        breaker.cancel()
+        error_msg = f"❌ 資料庫連線忙碌中\n\n"
+        error_msg += f"錯誤訊息: {str(e)}\n\n"
+        error_msg += "💡 建議:\n"
+        error_msg += "   • 請稍後再試\n"
+        error_msg += "   • 如有大量同時寫入，可調高 CPE_DB_POOL_MAX_SIZE\n"
+        return None, error_msg
+    except DB_ERRORS as e:
+        if breaker is not None:
+            breaker.record_failure(e)
         error_msg = f"❌ 資料庫連線失敗\n\n"
         error_msg += f"錯誤訊息: {str(e)}\n\n"
         suggestion = get_error_suggestion(str(e))
         error_msg += f"{suggestion}"
         return None, error_msg
     except Exception as e:
+        if breaker is not None:
+            breaker.cancel()
         error_msg = f"❌ 發生未預期的錯誤\n\n"
         error_msg += f"錯誤訊息: {str(e)}\n\n"
         suggestion = get_error_suggestion(str(e))
@@ -254,32 +1334,23 @@ def test_db_connection(config):
     Returns:
         tuple: (success: bool, message: str)
     """
-    if not PYODBC_AVAILABLE:
-        error_msg = "pyodbc 模組未安裝"
-        suggestion = get_error_suggestion(error_msg)
-        return False, f"{error_msg}\n\n{suggestion}"
-    
-    # 驗證伺服器位址是否為本地主機
-    server = config.get('server', '')
-    if not is_localhost(server):
-        error_msg = f"❌ 安全限制：此應用程式僅支援連線到本地資料庫\n"
-        error_msg += f"您嘗試連線的伺服器: {server}\n\n"
-        error_msg += "🔒 允許的本地伺服器位址:\n"
-        for allowed in ALLOWED_LOCALHOST_NAMES:
-            error_msg += f"   • {allowed}\n"
-        error_msg += "\n💡 建議:\n"
-        error_msg += "   • 請將伺服器位址改為 'localhost' 或 '127.0.0.1'\n"
-        error_msg += "   • 如果您使用 SQL Server Express，可以嘗試 'localhost\\SQLEXPRESS'\n"
-        error_msg += "   • 如果您需要連線到遠端資料庫，請聯絡系統管理員\n"
+    backend = get_db_backend(config)
+    if backend is None:
+        return False, _unsupported_backend_error(config)
+    error_msg = backend.check_config(config)
+    if error_msg:
         return False, error_msg
     
     try:
-        conn, error_msg = get_db_connection(config)
-        if conn:
-            conn.close()
-            return True, "✅ 連線成功！資料庫連線正常運作。"
-        else:
-            return False, error_msg
+        # 測試時建立獨立連線，避免為未使用的設定建立連線池；
+        # 不建立資料庫檔案或資料表
+        backend.probe(config, writable=True)
+        return True, "✅ 連線成功！資料庫連線正常運作。"
+    except DB_ERRORS as e:
+        error_msg = f"❌ 資料庫連線失敗\n\n"
+        error_msg += f"錯誤訊息: {str(e)}\n\n"
+        error_msg += get_error_suggestion(str(e))
+        return False, error_msg
     except Exception as e:
         error_msg = f"❌ 連線測試失敗\n\n"
         error_msg += f"錯誤訊息: {str(e)}\n\n"
@@ -287,6 +1358,76 @@ def test_db_connection(config):
         error_msg += f"{suggestion}"
         return False, error_msg
 
+def _probe_connection(name, config):
+    """以獨立連線檢查一組連線設定，回傳單筆健康檢查結果"""
+    result = {'name': name, 'backend': config.get('backend') or DEFAULT_DB_BACKEND}
+    start = time.perf_counter()
+    backend = get_db_backend(config)
+    error = _unsupported_backend_error(config) if backend is None else backend.check_config(config)
+    if error is None:
+        try:
+            # SQLite 以唯讀方式開啟並執行 SELECT 1；檔案不存在即視為失敗
+            backend.probe(config)
+        except Exception as e:
+            error = str(e)
+    result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    if error is None:
+        result['status'] = 'ok'
+    else:
+        result.update(status='error', error=error, suggestion=get_error_suggestion(error))
+    return result
+
+
+def check_db_connections(connections, max_workers=HEALTH_CHECK_WORKERS, deadline=HEALTH_CHECK_DEADLINE):
+    """
+    同時檢查多組連線設定，依完成順序逐筆產生結果
+
+    每組連線以獨立連線測試（不經過連線池與熔斷器），結果附上該連線
+    目前的熔斷器狀態。超過 deadline 秒仍未完成的連線以 status 為
+    'timeout' 的結果回報，不再等待。
+
+    Args:
+        connections: {連線名稱: 連線設定}
+        max_workers: 同時檢查的連線數上限
+        deadline: 整次檢查的時限秒數
+
+    Yields:
+        dict: {'name', 'backend', 'status': 'ok' | 'error' | 'timeout',
+               'latency_ms', 'circuit_breaker'}；失敗時另有 'error' 與 'suggestion'
+    """
+    if not connections:
+        return
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(connections))),
+                                  thread_name_prefix='cpe-db-health')
+    futures = {
+        executor.submit(_probe_connection, name, config): name
+        for name, config in connections.items()
+    }
+    pending = set(futures)
+    try:
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                pending.discard(future)
+                result = future.result()
+                result['circuit_breaker'] = get_circuit_breaker_state(connections[result['name']])
+                yield result
+        except FutureTimeoutError:
+            elapsed_ms = round((time.monotonic() - start) * 1000, 1)
+            for name in sorted(futures[future] for future in pending):
+                yield {
+                    'name': name,
+                    'backend': connections[name].get('backend') or DEFAULT_DB_BACKEND,
+                    'status': 'timeout',
+                    'latency_ms': elapsed_ms,
+                    'error': f"超過 {deadline} 秒仍未完成連線檢查",
+                    'circuit_breaker': get_circuit_breaker_state(connections[name])
+                }
+    finally:
+        # 尚未開始的檢查直接取消；進行中的連線會在 CONNECTION_TIMEOUT 內自行結束
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
 def save_cpe_to_database(cpe_data):
     """
     將 CPE 資料儲存到資料庫
@@ -297,7 +1438,7 @@ def save_cpe_to_database(cpe_data):
     Returns:
         tuple: (success: bool, message: str)
     """
-    conn, error_msg = get_db_connection()
+    conn, error_msg = get_db_connection(create=True)
     if not conn:
         return False, error_msg if error_msg else "無法連線到資料庫"
     
@@ -308,46 +1449,20 @@ def save_cpe_to_database(cpe_data):
         # 使用參數化查詢來防止 SQL 注入
         insert_query = (
             "INSERT INTO " + CPE_RECORDS_TABLE + " "
-            "(vendor, product_name, version, other_fields, size_mb, install_date, install_path) "
+            "(" + CPE_INSERT_COLUMNS + ") "
             "VALUES (?, ?, ?, ?, ?, ?, ?)"
         )
         
-        cursor.execute(insert_query, (
-            cpe_data.get('vendor', ''),
-            cpe_data.get('product', ''),
-            cpe_data.get('version', ''),
-            cpe_data.get('other_fields', ''),
-            cpe_data.get('size_mb'),
-            cpe_data.get('install_date'),
-            cpe_data.get('install_path', 'C:\\')
-        ))
+        cursor.execute(insert_query, _cpe_insert_row(cpe_data))
         
-        conn.commit()
+        with DB_COMMIT_LATENCY.labels(conn.backend.name).time():
+            conn.commit()
+        DB_ROWS.labels('inserted').inc()
         cursor.close()
         conn.close()
         return True, "✅ 資料已成功儲存到資料庫"
-    except pyodbc.Error as e:
-        error_msg = f"❌ 儲存到資料庫失敗\n\n錯誤訊息: {str(e)}\n\n"
-        
-        # 檢查是否為資料表不存在的錯誤 (SQL Server 錯誤碼 208)
-        # 僅當錯誤訊息包含 'invalid object name' 時才提供建立資料表的建議
-        if 'invalid object name' in str(e).lower():
-            error_msg += "💡 建議:\n"
-            error_msg += f"   • 資料表 '{CPE_RECORDS_TABLE}' 可能不存在\n"
-            error_msg += "   • 請使用以下 SQL 指令建立資料表：\n\n"
-            error_msg += f"   CREATE TABLE {CPE_RECORDS_TABLE} (\n"
-            error_msg += "       id INT PRIMARY KEY IDENTITY(1,1),\n"
-            error_msg += "       vendor NVARCHAR(255),\n"
-            error_msg += "       product_name NVARCHAR(255),\n"
-            error_msg += "       version NVARCHAR(100),\n"
-            error_msg += "       other_fields NVARCHAR(MAX),\n"
-            error_msg += "       size_mb DECIMAL(10,2),\n"
-            error_msg += "       install_date DATE,\n"
-            error_msg += "       install_path NVARCHAR(500),\n"
-            error_msg += "       created_at DATETIME DEFAULT GETDATE()\n"
-            error_msg += "   );\n"
-        else:
-            error_msg += get_error_suggestion(str(e))
+    except DB_ERRORS as e:
+        error_msg = _insert_error_message("❌ 儲存到資料庫失敗", e)
         
         if conn:
             conn.close()
@@ -359,157 +1474,480 @@ def save_cpe_to_database(cpe_data):
             conn.close()
         return False, error_msg
 
-def get_cpe_from_database():
+# 讀取時選取的欄位，依 id 排序作為分頁鍵
+_RECORD_SELECT_COLUMNS = (
+    "id, vendor, product_name, version, other_fields, size_mb, install_date, install_path"
+)
+
+
+def _like_pattern(value):
+    """將含 * 的篩選值轉為 LIKE 樣式（跳脫 LIKE 的特殊字元）"""
+    for char in ('\\', '%', '_', '['):
+        value = value.replace(char, '\\' + char)
+    return value.replace('*', '%')
+
+
+def _record_filter_sql(filters, after_id=None):
     """
-    從資料庫取得所有 CPE 記錄
+    將篩選條件轉為 WHERE 子句與參數
+
+    Args:
+        filters: {'vendor', 'product', 'version', 'date_from', 'date_to'}，皆為選填
+        after_id: 只取 id 大於此值的資料（分頁用）
 
     Returns:
-        tuple: (records: list, error_message: str)
-            - records: CPE 記錄列表
-            - error_message: 錯誤訊息（如果成功則為 None）
+        tuple: (where_sql, params)
+    """
+    filters = filters or {}
+    clauses = []
+    params = []
+    for name, column in RECORD_FILTER_COLUMNS.items():
+        value = filters.get(name)
+        if not value:
+            continue
+        if '*' in value:
+            clauses.append(f"{column} LIKE ? ESCAPE '\\'")
+            params.append(_like_pattern(value))
+        else:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if filters.get('date_from'):
+        clauses.append("install_date >= ?")
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        clauses.append("install_date <= ?")
+        params.append(filters['date_to'])
+    if after_id is not None:
+        clauses.append("id > ?")
+        params.append(after_id)
+    where_sql = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where_sql, params
+
+
+def _db_row_to_record(columns, row):
+    """將一列查詢結果轉為 CPE 資料字典"""
+    record = dict(zip(columns, row))
+    vendor = (record.get('vendor') or '').lower().replace(' ', '_')
+    product = (record.get('product_name') or '').lower().replace(' ', '_')
+    version = record.get('version') or '*'
+    record['cpe'] = f"cpe:2.3:a:{vendor}:{product}:{version}:*:*:*:*:*:*:*"
+    record['product'] = record.get('product_name', '')
+    # 與擷取/產生的資料使用相同欄位名稱，匯出時才能對應
+    record['install_location'] = record.get('install_path')
+    # DECIMAL 與 DATE 轉為一般型別，確保所有序列化格式都能處理
+    if record.get('size_mb') is not None:
+        record['size_mb'] = float(record['size_mb'])
+    if record.get('install_date') is not None:
+        record['install_date'] = str(record['install_date'])
+    return record
+
+
+def _query_error_message(error):
+    error_msg = f"❌ 查詢資料庫失敗\n\n錯誤訊息: {str(error)}\n\n"
+    error_msg += get_error_suggestion(str(error))
+    return error_msg
+
+
+class CPERecordStream:
+    """
+    串流讀取 cpe_records 的查詢結果
+
+    以 fetchmany 每次取 batch_size 筆，記憶體用量與資料表大小無關。
+    迭代完畢或呼叫 close() 時關閉游標並歸還連線。
+    """
+
+    def __init__(self, conn, cursor, batch_size=DB_FETCH_ROWS):
+        self._conn = conn
+        self._cursor = cursor
+        self._batch_size = batch_size
+
+    def __iter__(self):
+        try:
+            columns = [column[0] for column in self._cursor.description]
+            while True:
+                rows = self._cursor.fetchmany(self._batch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield _db_row_to_record(columns, row)
+        finally:
+            self.close()
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            self._cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
+    def __del__(self):
+        # 未迭代就被丟棄時（例如用戶端中斷下載）仍歸還連線
+        self.close()
+
+
+def open_cpe_record_stream(filters=None, batch_size=DB_FETCH_ROWS):
+    """
+    依 id 順序串流讀取符合篩選條件的 CPE 記錄
+
+    查詢會先執行，連線或 SQL 錯誤在開始迭代前就會回報。
+
+    Args:
+        filters: 篩選條件，見 _record_filter_sql
+        batch_size: 每次 fetchmany 的筆數
+
+    Returns:
+        tuple: (stream: CPERecordStream, error_message: str)
     """
     conn, error_msg = get_db_connection()
     if not conn:
-        return [], error_msg if error_msg else "無法連線到資料庫"
+        return None, error_msg if error_msg else "無法連線到資料庫"
 
     try:
         cursor = conn.cursor()
-
+        where_sql, params = _record_filter_sql(filters)
         # 使用常數作為資料表名稱（非使用者輸入），因此是安全的
-        select_query = (
-            "SELECT id, vendor, product_name, version, other_fields, "
-            "size_mb, install_date, install_path "
-            "FROM " + CPE_RECORDS_TABLE
+        # 篩選值一律以參數傳入來防止 SQL 注入
+        cursor.execute(
+            "SELECT " + _RECORD_SELECT_COLUMNS + " FROM " + CPE_RECORDS_TABLE + where_sql + " ORDER BY id",
+            params
         )
-        cursor.execute(select_query)
+        return CPERecordStream(conn, cursor, batch_size), None
+    except DB_ERRORS as e:
+        conn.close()
+        return None, _query_error_message(e)
+    except Exception as e:
+        conn.close()
+        error_msg = f"❌ 發生未預期的錯誤\n\n錯誤訊息: {str(e)}\n\n"
+        error_msg += get_error_suggestion(str(e))
+        return None, error_msg
 
-        columns = [column[0] for column in cursor.description]
-        records = []
-        for row in cursor.fetchall():
-            record = dict(zip(columns, row))
-            vendor = (record.get('vendor') or '').lower().replace(' ', '_')
-            product = (record.get('product_name') or '').lower().replace(' ', '_')
-            version = record.get('version') or '*'
-            record['cpe'] = f"cpe:2.3:a:{vendor}:{product}:{version}:*:*:*:*:*:*:*"
-            record['product'] = record.get('product_name', '')
-            # Convert date to string to ensure compatibility with all serialisation formats
-            if record.get('install_date') is not None:
-                record['install_date'] = str(record['install_date'])
-            records.append(record)
 
+def get_cpe_records_page(filters=None, after_id=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    以 keyset 分頁讀取 CPE 記錄：依 id 排序，取 id 大於 after_id 的下一頁
+
+    Args:
+        filters: 篩選條件，見 _record_filter_sql
+        after_id: 上一頁最後一筆的 id（第一頁為 None）
+        limit: 每頁筆數（上限 MAX_PAGE_SIZE）
+
+    Returns:
+        tuple: (page: dict, error_message: str)
+            - page: {'data': 記錄列表, 'next_after': 下一頁的 after_id，沒有下一頁時為 None}
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    conn, error_msg = get_db_connection()
+    if not conn:
+        return None, error_msg if error_msg else "無法連線到資料庫"
+
+    try:
+        cursor = conn.cursor()
+        where_sql, params = _record_filter_sql(filters, after_id)
+        # 多取一筆以判斷是否還有下一頁
+        cursor.execute(*conn.backend.page_query(
+            _RECORD_SELECT_COLUMNS + " FROM " + CPE_RECORDS_TABLE + where_sql, " ORDER BY id", params, limit + 1
+        ))
+        columns = [column[0] for column in cursor.description]
+        records = [_db_row_to_record(columns, row) for row in cursor.fetchall()]
         cursor.close()
-        conn.close()
-        return records, None
-    except pyodbc.Error as e:
-        error_msg = f"❌ 查詢資料庫失敗\n\n錯誤訊息: {str(e)}\n\n"
+        has_more = len(records) > limit
+        records = records[:limit]
+        return {
+            'data': records,
+            'next_after': records[-1]['id'] if has_more else None
+        }, None
+    except DB_ERRORS as e:
+        return None, _query_error_message(e)
+    except Exception as e:
+        error_msg = f"❌ 發生未預期的錯誤\n\n錯誤訊息: {str(e)}\n\n"
         error_msg += get_error_suggestion(str(e))
-        if conn:
-            conn.close()
-        return [], error_msg
+        return None, error_msg
+    finally:
+        conn.close()
+
+
+def count_cpe_records(filters=None):
+    """
+    計算符合篩選條件的 CPE 記錄筆數
+
+    Returns:
+        tuple: (count: int, error_message: str)
+    """
+    conn, error_msg = get_db_connection()
+    if not conn:
+        return 0, error_msg if error_msg else "無法連線到資料庫"
+
+    try:
+        cursor = conn.cursor()
+        where_sql, params = _record_filter_sql(filters)
+        cursor.execute("SELECT COUNT(*) FROM " + CPE_RECORDS_TABLE + where_sql, params)
+        count = cursor.fetchone()[0]
+        cursor.close()
+        return count, None
+    except DB_ERRORS as e:
+        return 0, _query_error_message(e)
     except Exception as e:
         error_msg = f"❌ 發生未預期的錯誤\n\n錯誤訊息: {str(e)}\n\n"
         error_msg += get_error_suggestion(str(e))
-        if conn:
-            conn.close()
+        return 0, error_msg
+    finally:
+        conn.close()
+
+
+def get_cpe_from_database(filters=None):
+    """
+    從資料庫取得所有（或符合篩選條件的）CPE 記錄
+    大量資料請改用 open_cpe_record_stream 或 get_cpe_records_page
+
+    Returns:
+        tuple: (records: list, error_message: str)
+            - records: CPE 記錄列表
+            - error_message: 錯誤訊息（如果成功則為 None）
+    """
+    stream, error_msg = open_cpe_record_stream(filters)
+    if stream is None:
         return [], error_msg
+    try:
+        return list(stream), None
+    except DB_ERRORS as e:
+        return [], _query_error_message(e)
+
+
+def _cpe_insert_row(cpe_data):
+    """將一筆 CPE 資料轉為 INSERT 參數"""
+    return (
+        cpe_data.get('vendor', ''),
+        cpe_data.get('product', ''),
+        cpe_data.get('version', ''),
+        cpe_data.get('other_fields', ''),
+        cpe_data.get('size_mb'),
+        cpe_data.get('install_date'),
+        # 擷取與產生的資料使用 install_location，舊版上傳資料使用 install_path
+        cpe_data.get('install_location') or cpe_data.get('install_path') or 'C:\\'
+    )
+
+
+def _hash_text(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _cpe_upsert_row(cpe_data):
+    """
+    將一筆 CPE 資料轉為 upsert 參數：INSERT 參數再加上兩個雜湊
+
+    record_hash 以 vendor、product、version（不分大小寫）識別同一筆軟體，
+    content_hash 涵蓋所有寫入欄位，用來判斷既有資料是否需要更新。
+    """
+    row = _cpe_insert_row(cpe_data)
+    record_hash = _hash_text(f"{row[0] or ''}\x1f{row[1] or ''}\x1f{row[2] or ''}".lower())
+    return row + (record_hash, _hash_text('\x1f'.join(map(str, row))))
+
+
+def _upsert_rows(cpe_list):
+    """
+    轉為 upsert 參數；同一批中重複的軟體只保留最後一筆，
+    較早的重複資料以 None 佔位，寫入時計為略過
+    """
+    rows = [_cpe_upsert_row(cpe_data) for cpe_data in cpe_list]
+    latest = {row[7]: index for index, row in enumerate(rows)}
+    return [row if latest[row[7]] == index else None for index, row in enumerate(rows)]
+
+
+def _upsert_chunk(backend, cursor, rows):
+    """合併一段資料，回傳新增、更新、略過筆數"""
+    staged = [row for row in rows if row is not None]
+    inserted, updated = backend.upsert_chunk(cursor, staged) if staged else (0, 0)
+    return {
+        'inserted': inserted,
+        'updated': updated,
+        'skipped': len(rows) - inserted - updated
+    }
+
+
+def _insert_error_message(title, error):
+    """組合寫入失敗的錯誤訊息，資料表不存在時附上建立資料表的 SQL"""
+    error_msg = f"{title}\n\n錯誤訊息: {str(error)}\n\n"
+
+    # 檢查是否為資料表不存在的錯誤 (SQL Server 錯誤碼 208)
+    # 僅當錯誤訊息包含 'invalid object name' 時才提供建立資料表的建議
+    if 'invalid column name' in str(error).lower() and 'hash' in str(error).lower():
+        # 舊版建立的資料表沒有 upsert 使用的雜湊欄位
+        error_msg += "💡 建議:\n"
+        error_msg += f"   • 資料表 '{CPE_RECORDS_TABLE}' 缺少 upsert 模式需要的欄位\n"
+        error_msg += "   • 請使用以下 SQL 指令新增欄位與索引：\n\n"
+        error_msg += f"   ALTER TABLE {CPE_RECORDS_TABLE} ADD record_hash CHAR(32) NULL, content_hash CHAR(32) NULL;\n"
+        error_msg += f"   CREATE UNIQUE INDEX UX_{CPE_RECORDS_TABLE}_record_hash\n"
+        error_msg += f"       ON {CPE_RECORDS_TABLE} (record_hash) WHERE record_hash IS NOT NULL;\n"
+    elif 'invalid object name' in str(error).lower():
+        error_msg += "💡 建議:\n"
+        error_msg += f"   • 資料表 '{CPE_RECORDS_TABLE}' 可能不存在\n"
+        error_msg += "   • 請使用以下 SQL 指令建立資料表：\n\n"
+        error_msg += f"   CREATE TABLE {CPE_RECORDS_TABLE} (\n"
+        error_msg += "       id INT PRIMARY KEY IDENTITY(1,1),\n"
+        error_msg += "       vendor NVARCHAR(255),\n"
+        error_msg += "       product_name NVARCHAR(255),\n"
+        error_msg += "       version NVARCHAR(100),\n"
+        error_msg += "       other_fields NVARCHAR(MAX),\n"
+        error_msg += "       size_mb DECIMAL(10,2),\n"
+        error_msg += "       install_date DATE,\n"
+        error_msg += "       install_path NVARCHAR(500),\n"
+        error_msg += "       created_at DATETIME DEFAULT GETDATE(),\n"
+        error_msg += "       record_hash CHAR(32) NULL,\n"
+        error_msg += "       content_hash CHAR(32) NULL\n"
+        error_msg += "   );\n"
+        error_msg += f"   CREATE UNIQUE INDEX UX_{CPE_RECORDS_TABLE}_record_hash\n"
+        error_msg += f"       ON {CPE_RECORDS_TABLE} (record_hash) WHERE record_hash IS NOT NULL;\n"
+    else:
+        error_msg += get_error_suggestion(str(error))
+    return error_msg
+
+
+def _insert_rows(conn, write_chunk, rows, offset, result):
+    """
+    寫入一段資料並提交
+
+    write_chunk(rows) 寫入資料並回傳各類筆數（inserted / updated / skipped）。
+    若因資料錯誤或違反條件約束而失敗，將該段對半拆開重試，直到找出
+    有問題的單筆資料；其他錯誤（資料表不存在、連線中斷等）直接拋出。
+    """
+    try:
+        counts = write_chunk(rows)
+        with DB_COMMIT_LATENCY.labels(conn.backend.name).time():
+            conn.commit()
+        result['success'] += len(rows)
+        for key, count in counts.items():
+            result[key] += count
+    except ROW_ERRORS as e:
+        conn.rollback()
+        if len(rows) == 1:
+            result['failed'] += 1
+            result['failed_rows'].append(offset)
+            if len(result['errors']) < MAX_REPORTED_ROW_ERRORS:
+                result['errors'].append({'index': offset, 'error': str(e)})
+            return
+        middle = len(rows) // 2
+        _insert_rows(conn, write_chunk, rows[:middle], offset, result)
+        _insert_rows(conn, write_chunk, rows[middle:], offset + middle, result)
 
 
-def save_multiple_cpe_to_database(cpe_list):
+def _fail_remaining_rows(result, row_count):
+    """寫入中斷時，將尚未處理的資料列計為失敗"""
+    # 各段與拆開後的兩半依序處理，已處理的資料列必定是開頭連續的一段
+    resolved = result['success'] + result['failed']
+    result['failed_rows'].extend(range(resolved, row_count))
+    result['failed'] = row_count - result['success']
+
+
+def _record_save_metrics(result, elapsed):
+    """將一次批次儲存的筆數與耗時計入 /metrics"""
+    for outcome in ('inserted', 'updated', 'skipped', 'failed'):
+        if result[outcome]:
+            DB_ROWS.labels(outcome).inc(result[outcome])
+    STAGE_LATENCY.labels('db_save').observe(elapsed)
+
+
+def save_multiple_cpe_to_database(cpe_list, chunk_size=INSERT_CHUNK_SIZE, upsert=False):
     """
     批次將多筆 CPE 資料儲存到資料庫
-    
+
+    資料每 chunk_size 筆為一段，一次送出並各自提交（SQL Server 使用
+    fast_executemany 以參數陣列綁定）。某段因資料錯誤失敗時會對半拆開
+    重試，只有真正有問題的資料列計為失敗，其餘照常寫入。
+
+    upsert 模式下重複儲存同一批資料不會產生重複記錄：每段先載入暫存
+    資料表，再以 record_hash 一次合併（SQL Server 為 MERGE，SQLite 為
+    INSERT ... ON CONFLICT）。新的軟體會新增，內容有變動的會更新，
+    內容相同的略過。
+
     Args:
         cpe_list: CPE 資料列表
-    
+        chunk_size: 每段筆數
+        upsert: 是否以 record_hash 合併既有資料
+
     Returns:
-        dict: {'success': 成功筆數, 'failed': 失敗筆數, 'message': 訊息}
+        dict: {
+            'success': 成功筆數（新增 + 更新 + 略過）, 'failed': 失敗筆數, 'message': 訊息,
+            'inserted': 新增筆數, 'updated': 更新筆數, 'skipped': 內容相同而略過的筆數,
+            'chunks': 段數, 'elapsed': 秒數, 'rows_per_sec': 每秒寫入筆數,
+            'errors': 失敗資料列（最多 MAX_REPORTED_ROW_ERRORS 筆，含索引與錯誤訊息）,
+            'failed_rows': 所有失敗資料列的索引（遞增排序）
+        }
     """
-    conn, error_msg = get_db_connection()
+    result = {'success': 0, 'failed': 0, 'message': '', 'chunks': 0,
+              'inserted': 0, 'updated': 0, 'skipped': 0, 'elapsed': 0.0, 'rows_per_sec': 0, 'errors': [], 'failed_rows': []}
+    if not cpe_list:
+        result['message'] = "沒有需要儲存的資料"
+        return result
+
+    conn, error_msg = get_db_connection(create=True)
     if not conn:
-        return {
-            'success': 0, 
-            'failed': len(cpe_list),
-            'message': error_msg if error_msg else "無法連線到資料庫"
-        }
-    
-    success_count = 0
-    failed_count = 0
-    
+        result['failed'] = len(cpe_list)
+        result['failed_rows'] = list(range(len(cpe_list)))
+        result['message'] = error_msg if error_msg else "無法連線到資料庫"
+        _record_save_metrics(result, 0.0)
+        return result
+
+    # 使用常數作為資料表名稱（非使用者輸入），因此是安全的
+    # 使用參數化查詢來防止 SQL 注入
+    insert_query = (
+        "INSERT INTO " + CPE_RECORDS_TABLE + " "
+        "(" + CPE_INSERT_COLUMNS + ") "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)"
+    )
+    chunk_size = max(1, chunk_size)
+    start = time.perf_counter()
+
     try:
         cursor = conn.cursor()
-        
-        # 使用常數作為資料表名稱（非使用者輸入），因此是安全的
-        # 使用參數化查詢來防止 SQL 注入
-        insert_query = (
-            "INSERT INTO " + CPE_RECORDS_TABLE + " "
-            "(vendor, product_name, version, other_fields, size_mb, install_date, install_path) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?)"
-        )
-        
-        # Prepare data for batch insertion
-        data_to_insert = [
-            (
-                cpe_data.get('vendor', ''),
-                cpe_data.get('product', ''),
-                cpe_data.get('version', ''),
-                cpe_data.get('other_fields', ''),
-                cpe_data.get('size_mb'),
-                cpe_data.get('install_date'),
-                cpe_data.get('install_path', 'C:\\')
-            )
-            for cpe_data in cpe_list
-        ]
-        
-        # Use executemany for better performance
-        cursor.executemany(insert_query, data_to_insert)
-        success_count = len(cpe_list)
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return {
-            'success': success_count, 
-            'failed': failed_count,
-            'message': f"✅ 成功儲存 {success_count} 筆資料到資料庫"
-        }
-    except pyodbc.Error as e:
-        error_msg = f"❌ 批次儲存失敗\n\n錯誤訊息: {str(e)}\n\n"
-        
-        # 檢查是否為資料表不存在的錯誤 (SQL Server 錯誤碼 208)
-        # 僅當錯誤訊息包含 'invalid object name' 時才提供建立資料表的建議
-        if 'invalid object name' in str(e).lower():
-            error_msg += "💡 建議:\n"
-            error_msg += f"   • 資料表 '{CPE_RECORDS_TABLE}' 可能不存在\n"
-            error_msg += "   • 請使用以下 SQL 指令建立資料表：\n\n"
-            error_msg += f"   CREATE TABLE {CPE_RECORDS_TABLE} (\n"
-            error_msg += "       id INT PRIMARY KEY IDENTITY(1,1),\n"
-            error_msg += "       vendor NVARCHAR(255),\n"
-            error_msg += "       product_name NVARCHAR(255),\n"
-            error_msg += "       version NVARCHAR(100),\n"
-            error_msg += "       other_fields NVARCHAR(MAX),\n"
-            error_msg += "       size_mb DECIMAL(10,2),\n"
-            error_msg += "       install_date DATE,\n"
-            error_msg += "       install_path NVARCHAR(500),\n"
-            error_msg += "       created_at DATETIME DEFAULT GETDATE()\n"
-            error_msg += "   );\n"
+        conn.backend.prepare_bulk_cursor(cursor)
+        if upsert:
+            rows = _upsert_rows(cpe_list)
+
+            def write_chunk(chunk):
+                return _upsert_chunk(conn.backend, cursor, chunk)
         else:
-            error_msg += get_error_suggestion(str(e))
-        
-        if conn:
-            conn.close()
-        return {
-            'success': 0, 
-            'failed': len(cpe_list),
-            'message': error_msg
-        }
+            rows = [_cpe_insert_row(cpe_data) for cpe_data in cpe_list]
+
+            def write_chunk(chunk):
+                cursor.executemany(insert_query, chunk)
+                return {'inserted': len(chunk)}
+
+        for offset in range(0, len(rows), chunk_size):
+            _insert_rows(conn, write_chunk, rows[offset:offset + chunk_size], offset, result)
+            result['chunks'] += 1
+        cursor.close()
+
+        result['message'] = f"✅ 成功儲存 {result['success']} 筆資料到資料庫"
+        if upsert:
+            result['message'] += (
+                f"（新增 {result['inserted']}、更新 {result['updated']}、"
+                f"略過 {result['skipped']} 筆）"
+            )
+        if result['failed']:
+            first_error = result['errors'][0]
+            result['message'] += (
+                f"\n⚠️ {result['failed']} 筆資料無法儲存"
+                f"（例如第 {first_error['index'] + 1} 筆: {first_error['error']}）"
+            )
+    except DB_ERRORS as e:
+        # 已提交的段落會保留，其餘資料計為失敗
+        _fail_remaining_rows(result, len(cpe_list))
+        result['message'] = _insert_error_message("❌ 批次儲存失敗", e)
+        if result['success']:
+            result['message'] = f"⚠️ 已儲存 {result['success']} 筆，其餘 {result['failed']} 筆未儲存\n\n" + result['message']
     except Exception as e:
-        error_msg = f"❌ 發生未預期的錯誤\n\n錯誤訊息: {str(e)}\n\n"
-        error_msg += get_error_suggestion(str(e))
-        if conn:
-            conn.close()
-        return {
-            'success': 0, 
-            'failed': len(cpe_list),
-            'message': error_msg
-        }
+        _fail_remaining_rows(result, len(cpe_list))
+        result['message'] = f"❌ 發生未預期的錯誤\n\n錯誤訊息: {str(e)}\n\n"
+        result['message'] += get_error_suggestion(str(e))
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    _record_save_metrics(result, elapsed)
+    result['elapsed'] = round(elapsed, 3)
+    if result['elapsed'] > 0:
+        result['rows_per_sec'] = round(result['success'] / result['elapsed'])
+    return result
@@ -0,0 +1,177 @@
+# jobs.py - Background jobs for large fetch/generate runs
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+DEFAULT_JOB_WORKERS = 2
+
+# Records produced, stored and saved per progress step
+JOB_CHUNK_SIZE = 1000
+
+# Finished jobs kept for polling; the oldest are forgotten first
+MAX_FINISHED_JOBS = 100
+
+JOB_STATES = ('queued', 'running', 'completed', 'failed', 'cancelled')
+_FINISHED_STATES = ('completed', 'failed', 'cancelled')
+
+
+class Job:
+    """State of one background job, updated by its worker thread"""
+
+    def __init__(self, kind, total, params):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.total = total
+        self.params = params
+        self.status = 'queued'
+        self.processed = 0
+        self.rows = 0
+        self.result_id = None
+        self.database = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    @property
+    def done(self):
+        return self.status in _FINISHED_STATES
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'params': self.params,
+            'total': self.total,
+            'processed': self.processed,
+            'rows': self.rows,
+            'progress': round(self.processed / self.total, 4) if self.total else 1.0,
+            'result_id': self.result_id,
+            'database': self.database,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded thread pool and keeps their state for polling.
+
+    A job's work is a callable returning an iterator of
+    (processed, records) chunks; it runs on the worker thread, so nothing
+    is produced before the job starts. Each chunk is appended to the
+    result store and optionally passed to `save` (e.g. the database
+    writer), then progress is updated. Cancellation is checked between
+    chunks; rows stored up to that point stay available.
+
+    Job state lives in this process only.
+    """
+
+    def __init__(self, result_store, max_workers=DEFAULT_JOB_WORKERS):
+        self.result_store = result_store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cpe-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind, total, work, params=None, save=None, store=True):
+        """Queue a job and return it; `store=False` skips the result store"""
+        job = Job(kind, total, params or {})
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_finished()
+        job.future = self._executor.submit(self._run, job, work, save, store)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Request cancellation; returns the job, or None if it is unknown"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Never started
+            job.status = 'cancelled'
+            job.finished = time.time()
+        return job
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, work, save, store):
+        job.status = 'running'
+        job.started = time.time()
+        result_id = self.result_store.create(job.kind) if store else None
+        job.result_id = result_id
+        if save is not None:
+            job.database = {'success_count': 0, 'failed_count': 0, 'inserted': 0, 'updated': 0, 'skipped': 0,
+                            'elapsed': 0.0, 'rows_per_sec': 0, 'message': ''}
+
+        try:
+            for processed, records in work():
+                if job.cancel_event.is_set():
+                    break
+                if result_id:
+                    job.rows += self.result_store.append(result_id, records, job.rows)
+                else:
+                    job.rows += len(records)
+                if save is not None and records:
+                    db_result = save(records)
+                    job.database['success_count'] += db_result['success']
+                    job.database['failed_count'] += db_result['failed']
+                    for key in ('inserted', 'updated', 'skipped'):
+                        job.database[key] += db_result.get(key, 0)
+                    job.database['elapsed'] += db_result.get('elapsed', 0.0)
+                    if job.database['elapsed'] > 0:
+                        job.database['rows_per_sec'] = round(
+                            job.database['success_count'] / job.database['elapsed']
+                        )
+                    job.database['message'] = db_result.get('message', '')
+                job.processed = processed
+            job.status = 'cancelled' if job.cancel_event.is_set() else 'completed'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            if result_id:
+                self.result_store.finish(result_id, job.rows)
+            job.finished = time.time()
+
+    def shutdown(self):
+        """
+        Cancel every job and wait for running ones to stop; queued jobs
+        never start, running ones stop after their current chunk
+        """
+        for job in self.list():
+            if not job.done:
+                self.cancel(job.id)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_chunks(items, chunk_size=JOB_CHUNK_SIZE):
+    """Yield (processed, chunk) pairs over any iterable, chunk_size items at a time"""
+    iterator = iter(items)
+    processed = 0
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        processed += len(chunk)
+        yield processed, chunk
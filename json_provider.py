@@ -0,0 +1,97 @@
+# json_provider.py - Pluggable JSON encoder for API responses and exports
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Accepted values for the CPE_JSON_PROVIDER environment variable
+JSON_PROVIDERS = ('auto', 'orjson', 'stdlib')
+
+# json.dumps keyword arguments the orjson path can honour; anything else
+# (cls, custom separators with indent, ...) goes through the stdlib
+_ORJSON_DUMP_ARGS = frozenset(('indent', 'separators', 'sort_keys', 'ensure_ascii', 'default'))
+
+
+def resolve_json_provider(name):
+    """Map a CPE_JSON_PROVIDER value to the backend actually used: 'orjson' or 'stdlib'"""
+    name = (name or 'auto').strip().lower()
+    if name not in JSON_PROVIDERS:
+        print(f"Warning: unknown JSON provider '{name}', using 'auto'.")
+        name = 'auto'
+    if name == 'stdlib':
+        return 'stdlib'
+    if not ORJSON_AVAILABLE:
+        if name == 'orjson':
+            print("Warning: orjson is not installed. Falling back to the standard json module.")
+            print("To enable the fast JSON provider, install orjson: pip install orjson")
+        return 'stdlib'
+    return 'orjson'
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    Output is semantically identical to DefaultJSONProvider: keys are
+    sorted when sort_keys is set, and dates, dataclasses and __html__
+    objects still go through Flask's default() hook. Non-ASCII text is
+    always emitted as UTF-8 rather than \\u escapes. Values orjson cannot
+    encode (e.g. integers wider than 64 bits) fall back to the stdlib.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if not _ORJSON_DUMP_ARGS.issuperset(kwargs) or kwargs.get('indent') not in (None, 2):
+            return super().dumps(obj, **kwargs)
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent') == 2:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode('utf-8')
+        except orjson.JSONEncodeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # Let the stdlib accept what it can (NaN, huge integers) and
+            # raise its usual error otherwise
+            return super().loads(s)
+
+
+def init_json_provider(app, name='auto'):
+    """Install the configured JSON provider on a Flask app and return the backend name"""
+    backend = resolve_json_provider(name)
+    if backend == 'orjson':
+        app.json = OrjsonProvider(app)
+    return backend
+
+
+def export_dumps(backend):
+    """
+    Return an encoder producing the same text as
+    json.dumps(obj, ensure_ascii=False, indent=2), keys in insertion order
+    """
+    if backend == 'orjson':
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+
+        def dumps(obj):
+            try:
+                return orjson.dumps(obj, option=option).decode('utf-8')
+            except orjson.JSONEncodeError:
+                return json.dumps(obj, ensure_ascii=False, indent=2)
+        return dumps
+
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return dumps
@@ -0,0 +1,122 @@
+# json_stream.py - Streaming JSON array reader
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',:]}'
+
+
+class _JSONReader:
+    """Incremental reader that decodes one JSON value at a time from a file-like object"""
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = None
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Read one more chunk into the buffer; returns False at end of input"""
+        if self.eof:
+            return False
+        while True:
+            raw = self.fp.read(self.chunk_size)
+            if not isinstance(raw, bytes):
+                chunk = raw
+                break
+            if self.text_decoder is None:
+                self.text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+            # A partial multi-byte sequence decodes to '' until completed
+            chunk = self.text_decoder.decode(raw, final=not raw)
+            if chunk or not raw:
+                break
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop consumed text so the buffer stays bounded
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON input')
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found}' in JSON input")
+        self.pos += 1
+
+    def next_char(self):
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A value not followed by a delimiter may be a truncated number
+                if self.eof or (end < len(self.buf) and self.buf[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_json_array(fp, key=None, chunk_size=65536):
+    """
+    Yield the elements of a JSON array one at a time without loading
+    the whole document into memory
+
+    Args:
+        fp: file-like object, text or binary
+        key: name of the top-level object field holding the array; a
+             document that is itself an array is accepted either way
+        chunk_size: number of bytes/characters read per refill
+
+    Yields:
+        each element of the array
+    """
+    reader = _JSONReader(fp, chunk_size)
+
+    if key is None or reader.peek() == '[':
+        reader.expect('[')
+    else:
+        reader.expect('{')
+        while True:
+            if reader.peek() == '}':
+                raise ValueError(f'JSON key "{key}" not found')
+            name = reader.decode_value()
+            reader.expect(':')
+            if name == key:
+                reader.expect('[')
+                break
+            # Skip values of other fields
+            reader.decode_value()
+            if reader.peek() == ',':
+                reader.next_char()
+
+    if reader.peek() == ']':
+        return
+
+    while True:
+        yield reader.decode_value()
+        char = reader.next_char()
+        if char == ']':
+            return
+        if char != ',':
+            raise ValueError(f"Expected ',' or ']' but found '{char}' in JSON array")
@@ -0,0 +1,348 @@
+# metrics.py - In-process metrics with Prometheus text exposition
+import math
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+# Request latency buckets in seconds (the Prometheus client defaults)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Pipeline stages and exports may run for minutes on background jobs
+STAGE_BUCKETS = (0.001, 0.005, 0.025, 0.1, 0.5, 1, 2.5, 10, 30, 60, 300)
+
+# Connection checkouts and commits are usually sub-millisecond on a warm pool
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Payload sizes in bytes, 256 B to 64 MB in steps of 4x
+SIZE_BUCKETS = tuple(256 * 4 ** n for n in range(10))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class _Timer:
+    """Context manager observing the seconds spent in its block"""
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        The series for these label values, created on first use
+        Callers on a hot path should keep the returned child
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(tuple(str(value) for value in values), self._new_child())
+                self._children.setdefault(values, child)
+        return child
+
+    def _series(self):
+        with self._lock:
+            seen = set()
+            series = []
+            for values, child in self._children.items():
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    series.append((tuple(str(value) for value in values), child))
+            return sorted(series, key=lambda item: item[0])
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic total; the name should end in _total"""
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in self._series():
+            yield self.name, self.labelnames, values, None, child.value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self):
+        bounds = self.buckets + (math.inf,)
+        for values, child in self._series():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield self.name + '_bucket', self.labelnames, values, ('le', _format_value(float(bound))), cumulative
+            yield self.name + '_sum', self.labelnames, values, None, total
+            yield self.name + '_count', self.labelnames, values, None, cumulative
+
+
+class MetricsRegistry:
+    """
+    Named counters and histograms plus collectors read at scrape time.
+
+    Recording only touches the series' own lock: a counter increment or
+    a histogram observation costs well under a microsecond, so stages
+    are timed per batch rather than per row. Values that other
+    components already track (cache and pool counters, queue depth) are
+    not recorded twice; a collector reads them when /metrics is scraped.
+
+    Metrics live in this process only; with several worker processes
+    each one exposes its own series.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f'Metric {metric.name} is already registered differently')
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collect):
+        """
+        Add a callable returning (name, kind, documentation, samples)
+        tuples, where kind is 'counter' or 'gauge' and samples is a list
+        of ({label: value}, number). A failing collector is skipped.
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labelnames, values, extra, value in metric.samples():
+                lines.append(f'{name}{_label_text(labelnames, values, extra)} {_format_value(value)}')
+
+        for collect in collectors:
+            try:
+                families = list(collect())
+            except Exception:
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_label_text(labels.keys(), labels.values())} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()
+
+REQUEST_LATENCY = METRICS.histogram(
+    'cpe_http_request_duration_seconds',
+    'Time from request start until the response is returned (streamed bodies: until the first byte)',
+    ('route', 'method', 'status')
+)
+REQUEST_SIZE = METRICS.histogram(
+    'cpe_http_request_size_bytes', 'Request body size', ('route',), SIZE_BUCKETS
+)
+RESPONSE_SIZE = METRICS.histogram(
+    'cpe_http_response_size_bytes', 'Response body size, for responses with a known length', ('route',), SIZE_BUCKETS
+)
+STAGE_LATENCY = METRICS.histogram(
+    'cpe_stage_duration_seconds', 'Time spent in one batch of a pipeline stage', ('stage',), STAGE_BUCKETS
+)
+ROWS_PRODUCED = METRICS.counter(
+    'cpe_rows_produced_total', 'Records produced, by source', ('source',)
+)
+ROWS_EXPORTED = METRICS.counter(
+    'cpe_rows_exported_total', 'Records written to export files, by format', ('format',)
+)
+EXPORT_BYTES = METRICS.counter(
+    'cpe_export_bytes_total', 'Bytes of export files produced, by format', ('format',)
+)
+DB_ROWS = METRICS.counter(
+    'cpe_db_rows_total', 'Rows handled by database saves, by outcome', ('outcome',)
+)
+DB_CHECKOUT_LATENCY = METRICS.histogram(
+    'cpe_db_checkout_seconds', 'Time to take a connection from the pool', ('backend',), DB_BUCKETS
+)
+DB_CONNECT_LATENCY = METRICS.histogram(
+    'cpe_db_connect_seconds', 'Time to open a new database connection', ('backend',), DB_BUCKETS
+)
+DB_COMMIT_LATENCY = METRICS.histogram(
+    'cpe_db_commit_seconds', 'Time to commit one chunk of a bulk save', ('backend',), DB_BUCKETS
+)
+
+
+def time_stage(stage):
+    """Context manager timing one batch of a pipeline stage"""
+    return STAGE_LATENCY.labels(stage).time()
+
+
+def count_rows(items, counter):
+    """Yield items unchanged, adding how many passed to counter at the end"""
+    count = 0
+    try:
+        for item in items:
+            count += 1
+            yield item
+    finally:
+        counter.inc(count)
+
+
+def count_bytes(chunks, counter, timer=None):
+    """
+    Yield chunks unchanged, adding their encoded size to counter at the end;
+    timer, if given, observes the seconds until the stream was exhausted
+    """
+    size = 0
+    start = time.perf_counter()
+    try:
+        for chunk in chunks:
+            size += len(chunk.encode('utf-8')) if isinstance(chunk, str) else len(chunk)
+            yield chunk
+    finally:
+        counter.inc(size)
+        if timer is not None:
+            timer.observe(time.perf_counter() - start)
+
+
+def init_app(app, path='/metrics', registry=METRICS):
+    """Record latency and payload sizes of every request and serve `path`"""
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        # The URL rule, not the path, keeps label values bounded
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_LATENCY.labels(route, request.method, response.status_code).observe(time.perf_counter() - start)
+        if request.content_length:
+            REQUEST_SIZE.labels(route).observe(request.content_length)
+        if not response.is_streamed and response.content_length is not None:
+            RESPONSE_SIZE.labels(route).observe(response.content_length)
+        return response
+
+    def metrics_endpoint():
+        """Prometheus scrape endpoint"""
+        return Response(registry.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+    app.add_url_rule(path, 'metrics', metrics_endpoint, methods=['GET'])
+    return registry
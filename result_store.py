@@ -0,0 +1,395 @@
+# result_store.py - Server-side store for result sets, referenced by result ID
+"""
+Result sets produced by the fetch/generate/lookup routes are kept in a
+SQLite file so the export endpoints can stream them by ID instead of the
+browser uploading the rows again. SQLite makes the store shared by every
+worker process of the app.
+
+Stored results expire a TTL after they are finished; when the total
+number of stored rows exceeds the configured maximum, the oldest results
+are evicted first. Results still being written are left alone until
+they are far older than any job should run.
+
+Results can also be read a page at a time in any field order. The first
+request for an order ranks the whole result set once and keeps the
+ranking next to the rows, so every later page of that order is an
+index range read addressed by an opaque cursor.
+"""
+import base64
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from cpe_record import CPERecord, RECORD_FIELDS, version_sort_key
+
+DEFAULT_RESULT_STORE_PATH = 'cpe_results.db'
+DEFAULT_RESULT_TTL = 3600  # seconds
+DEFAULT_RESULT_MAX_ROWS = 1000000
+
+# Unfinished results older than this were abandoned by a crashed or
+# killed writer and are purged
+DEFAULT_UNFINISHED_TIMEOUT = 24 * 3600  # seconds
+
+# Rows fetched per round trip when streaming a result set
+RESULT_FETCH_ROWS = 1000
+
+# Rows per page when reading a result set a page at a time
+DEFAULT_PAGE_ROWS = 50
+MAX_PAGE_ROWS = 1000
+
+# Seconds a writer waits for another process holding the database lock
+_BUSY_TIMEOUT = 10
+
+_COLUMN_TYPES = {'size_mb': 'REAL'}
+
+# Quoted, since some field names ("update") are SQL keywords
+_COLUMNS = ', '.join(f'"{name}"' for name in RECORD_FIELDS)
+_ROW_COLUMNS = ', '.join(f'r."{name}"' for name in RECORD_FIELDS)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    row_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_results_expires ON results (expires);
+CREATE INDEX IF NOT EXISTS idx_results_created ON results (created);
+CREATE TABLE IF NOT EXISTS result_rows (
+    result_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    %s,
+    version_key TEXT,
+    PRIMARY KEY (result_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS result_order (
+    result_id TEXT NOT NULL,
+    ordering TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (result_id, ordering, rank)
+) WITHOUT ROWID;
+""" % ',\n    '.join(f'"{name}" {_COLUMN_TYPES.get(name, "TEXT")}' for name in RECORD_FIELDS)
+
+_INSERT_ROW = "INSERT INTO result_rows (result_id, position, %s, version_key) VALUES (?, ?, %s, ?)" % (
+    _COLUMNS, ', '.join('?' * len(RECORD_FIELDS))
+)
+
+
+def _sort_expression(sort):
+    """
+    SQL sort key for a field: sizes by value, versions in natural order
+    (1.9 before 1.10), everything else as case-insensitive text
+    """
+    if sort not in RECORD_FIELDS:
+        raise ValueError(f"Cannot sort by '{sort}'")
+    if sort == 'size_mb':
+        return '"size_mb"'
+    if sort == 'version':
+        # Rows stored before version_key existed fall back to plain text
+        return "COALESCE(version_key, lower(COALESCE(\"version\", '')))"
+    return f"lower(COALESCE(CAST(\"{sort}\" AS TEXT), ''))"
+
+
+def _order_by(sort, descending):
+    """ORDER BY clause; ties keep stored order in both directions"""
+    if sort is None:
+        return "position"
+    return f"{_sort_expression(sort)} {'DESC' if descending else 'ASC'}, position"
+
+
+def _ordering_name(sort, descending):
+    return f"{sort}:{'desc' if descending else 'asc'}" if sort else ''
+
+
+def encode_cursor(ordering, rank):
+    """Opaque page cursor: the ordering and the rank of the next row"""
+    raw = json.dumps([ordering, rank], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        ordering, rank = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(ordering, str) or not isinstance(rank, int) or rank < 0:
+        raise ValueError('Invalid cursor')
+    return ordering, rank
+
+
+class ResultStore:
+    """
+    Bounded result-set store keyed by result ID.
+
+    A result is either written in one call with put(), or incrementally
+    with create() / append() / finish() when rows are produced while the
+    response is streaming or a job is running. Unfinished results are
+    invisible to readers; their TTL starts when finish() is called, and
+    they are only purged once older than `unfinished_timeout`.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_RESULT_TTL, max_rows=DEFAULT_RESULT_MAX_ROWS,
+                 unfinished_timeout=DEFAULT_UNFINISHED_TIMEOUT):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.unfinished_timeout = unfinished_timeout
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        # Stores created before sorting by version was supported
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(result_rows)")}
+        if 'version_key' not in columns:
+            conn.execute("ALTER TABLE result_rows ADD COLUMN version_key TEXT")
+
+    def _connection(self):
+        # sqlite3 connections may not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, kind):
+        """Register a new, still empty result set and return its ID"""
+        result_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO results (id, kind, created, expires, row_count) VALUES (?, ?, ?, ?, NULL)",
+            (result_id, kind, now, now + self.ttl)
+        )
+        return result_id
+
+    def append(self, result_id, records, start=0):
+        """
+        Append records (CPERecord or dict rows) at positions start, start+1, ...
+        Returns the number of rows written; raises LookupError if the
+        result set no longer exists
+        """
+        rows = [
+            (result_id, position, *[record.get(name) for name in RECORD_FIELDS],
+             version_sort_key(record.get('version')))
+            for position, record in enumerate(records, start)
+        ]
+        if rows:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                # Checked under the write lock, so purge cannot run in between
+                if not conn.execute("SELECT 1 FROM results WHERE id = ?", (result_id,)).fetchone():
+                    raise LookupError(f'Result {result_id} no longer exists')
+                conn.executemany(_INSERT_ROW, rows)
+        return len(rows)
+
+    def finish(self, result_id, row_count):
+        """Mark a result set complete and start its TTL, then enforce the TTL and size bounds"""
+        self._connection().execute(
+            "UPDATE results SET row_count = ?, expires = ? WHERE id = ?",
+            (row_count, time.time() + self.ttl, result_id)
+        )
+        self.purge()
+
+    def put(self, records, kind):
+        """Store a complete result set and return its ID"""
+        result_id = self.create(kind)
+        self.finish(result_id, self.append(result_id, records))
+        return result_id
+
+    def info(self, result_id):
+        """Metadata of a finished, unexpired result set, or None"""
+        row = self._connection().execute(
+            "SELECT id, kind, created, expires, row_count FROM results "
+            "WHERE id = ? AND row_count IS NOT NULL AND expires > ?",
+            (result_id, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('id', 'kind', 'created', 'expires', 'row_count'), row))
+
+    def iter_records(self, result_id, sort=None, descending=False, batch_size=RESULT_FETCH_ROWS):
+        """
+        Yield the rows of a result set as CPERecords, in stored order or
+        sorted by one field (ties keep stored order), in the same order
+        as page()
+        """
+        order = _order_by(sort, descending)
+
+        # A dedicated connection keeps the read snapshot independent of
+        # writes made on this thread while the caller consumes the rows
+        conn = sqlite3.connect(self.path, timeout=_BUSY_TIMEOUT)
+        try:
+            cursor = conn.execute(
+                f"SELECT {_COLUMNS} FROM result_rows WHERE result_id = ? ORDER BY {order}",
+                (result_id,)
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield CPERecord.from_row(row)
+        finally:
+            conn.close()
+
+    def page(self, result_id, sort=None, descending=False, cursor=None, limit=DEFAULT_PAGE_ROWS):
+        """
+        One page of a finished result set: (records, next_cursor)
+
+        Pass the returned cursor back to get the following page; it is
+        None after the last page. A cursor carries its own ordering, so
+        sort and descending are ignored when one is given. Raises
+        ValueError for an unknown sort field or a malformed cursor.
+        """
+        if cursor is not None:
+            ordering, rank = decode_cursor(cursor)
+            sort, _, direction = ordering.partition(':')
+            sort, descending = sort or None, direction == 'desc'
+            if sort is not None and (sort not in RECORD_FIELDS or direction not in ('asc', 'desc')):
+                raise ValueError('Invalid cursor')
+        else:
+            rank = 0
+            if sort is not None and sort not in RECORD_FIELDS:
+                raise ValueError(f"Cannot sort by '{sort}'")
+        ordering = _ordering_name(sort, descending)
+
+        conn = self._connection()
+        if sort is None:
+            # Stored order: positions are already the ranks
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM result_rows WHERE result_id = ? AND position >= ? "
+                "ORDER BY position LIMIT ?",
+                (result_id, rank, limit + 1)
+            ).fetchall()
+        else:
+            self._rank(result_id, sort, descending, ordering)
+            rows = conn.execute(
+                f"SELECT {_ROW_COLUMNS} "
+                "FROM result_order AS o JOIN result_rows AS r "
+                "ON r.result_id = o.result_id AND r.position = o.position "
+                "WHERE o.result_id = ? AND o.ordering = ? AND o.rank >= ? "
+                "ORDER BY o.rank LIMIT ?",
+                (result_id, ordering, rank, limit + 1)
+            ).fetchall()
+
+        next_cursor = encode_cursor(ordering, rank + limit) if len(rows) > limit else None
+        return [CPERecord.from_row(row) for row in rows[:limit]], next_cursor
+
+    def _rank(self, result_id, sort, descending, ordering):
+        # Rank the whole result set in this order once; later pages reuse it
+        conn = self._connection()
+        exists = "SELECT 1 FROM result_order WHERE result_id = ? AND ordering = ? LIMIT 1"
+        if conn.execute(exists, (result_id, ordering)).fetchone():
+            return
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another worker may have ranked it while we waited for the lock
+            if conn.execute(exists, (result_id, ordering)).fetchone():
+                return
+            conn.execute(
+                "INSERT INTO result_order (result_id, ordering, rank, position) "
+                f"SELECT ?, ?, ROW_NUMBER() OVER (ORDER BY {_order_by(sort, descending)}) - 1, position "
+                "FROM result_rows WHERE result_id = ?",
+                (result_id, ordering, result_id)
+            )
+
+    def summary(self, result_id):
+        """Distinct vendor and product counts of a result set"""
+        vendors, products = self._connection().execute(
+            "SELECT COUNT(DISTINCT vendor), COUNT(DISTINCT product) FROM result_rows WHERE result_id = ?",
+            (result_id,)
+        ).fetchone()
+        return {'vendors': vendors, 'products': products}
+
+    def delete(self, result_id):
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM result_order WHERE result_id = ?", (result_id,))
+            conn.execute("DELETE FROM result_rows WHERE result_id = ?", (result_id,))
+            conn.execute("DELETE FROM results WHERE id = ?", (result_id,))
+
+    def purge(self):
+        """
+        Drop expired and abandoned result sets, then the oldest ones beyond
+        max_rows, and rows whose result set is already gone
+        """
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM results WHERE row_count IS NOT NULL AND expires <= ? "
+                "UNION ALL SELECT id FROM results WHERE row_count IS NULL AND created <= ?",
+                (now, now - self.unfinished_timeout)
+            )]
+
+            # The newest result is always kept, even if it alone exceeds max_rows
+            stored = 0
+            for index, (result_id, row_count) in enumerate(conn.execute(
+                "SELECT id, row_count FROM results WHERE expires > ? AND row_count IS NOT NULL "
+                "ORDER BY created DESC", (now,)
+            )):
+                stored += row_count
+                if index and stored > self.max_rows:
+                    expired.append(result_id)
+            expired.extend(self._orphan_ids(conn))
+
+            for result_id in expired:
+                conn.execute("DELETE FROM result_order WHERE result_id = ?", (result_id,))
+                conn.execute("DELETE FROM result_rows WHERE result_id = ?", (result_id,))
+                conn.execute("DELETE FROM results WHERE id = ?", (result_id,))
+        return len(expired)
+
+    @staticmethod
+    def _orphan_ids(conn):
+        """
+        IDs with rows but no results entry, left by stores that purged a
+        result while it was being written. Steps through the distinct IDs
+        with one primary key seek each instead of scanning every row.
+        """
+        orphans = []
+        for table in ('result_rows', 'result_order'):
+            result_id = ''
+            while True:
+                row = conn.execute(
+                    f"SELECT result_id FROM {table} WHERE result_id > ? ORDER BY result_id LIMIT 1",
+                    (result_id,)
+                ).fetchone()
+                if row is None:
+                    break
+                result_id = row[0]
+                if result_id not in orphans and not conn.execute(
+                    "SELECT 1 FROM results WHERE id = ?", (result_id,)
+                ).fetchone():
+                    orphans.append(result_id)
+        return orphans
+
+    def stats(self):
+        count, rows = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(row_count), 0) FROM results WHERE row_count IS NOT NULL"
+        ).fetchone()
+        return {
+            'results': count,
+            'rows': rows,
+            'max_rows': self.max_rows,
+            'ttl': self.ttl
+        }
+
+
+def open_result_store(path, ttl=DEFAULT_RESULT_TTL, max_rows=DEFAULT_RESULT_MAX_ROWS):
+    """Open (creating if needed) the result store, or return None if it is disabled or unusable"""
+    if not path:
+        return None
+    try:
+        return ResultStore(path, ttl, max_rows)
+    except sqlite3.Error as e:
+        print(f"Warning: result store '{path}' is not available ({e}). Exports will require uploaded data.")
+        return None
@@ -0,0 +1,214 @@
+# write_behind.py - Write-behind queue for database saves
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict, deque
+
+# Rows that may wait in the queue; submit blocks (then fails) beyond this
+DEFAULT_QUEUE_ROWS = 100000
+
+# Rows coalesced into one save call, and how long the flusher waits for
+# a batch to fill before writing what it has
+DEFAULT_BATCH_ROWS = 5000
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+# How long submit waits for room before giving up
+DEFAULT_ENQUEUE_TIMEOUT = 2.0
+
+# Finished tickets kept for polling; the oldest are forgotten first
+MAX_FINISHED_TICKETS = 1000
+
+TICKET_STATES = ('queued', 'writing', 'completed', 'failed')
+_FINISHED_STATES = ('completed', 'failed')
+
+
+class QueueFullError(Exception):
+    """The write-behind queue stayed full for the whole enqueue timeout"""
+
+
+class QueueClosedError(Exception):
+    """The write-behind queue is shutting down and accepts no more rows"""
+
+
+class Ticket:
+    """Outcome of one queued save, updated by the flusher thread"""
+
+    def __init__(self, records):
+        self.id = uuid.uuid4().hex
+        self.records = records
+        self.rows = len(records)
+        self.status = 'queued'
+        self.success = 0
+        self.failed = 0
+        self.batch_message = ''
+        self.batch_rows = 0
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in _FINISHED_STATES
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'rows': self.rows,
+            'success_count': self.success,
+            'failed_count': self.failed,
+            'batch_message': self.batch_message,
+            'batch_rows': self.batch_rows,
+            'created': self.created,
+            'finished': self.finished
+        }
+
+
+class WriteBehindQueue:
+    """
+    Accepts rows to save, acknowledges at once with a ticket, and writes
+    them from a background thread.
+
+    The flusher coalesces whole tickets into batches of about
+    `batch_rows` and passes each batch to `save` in a single call. It
+    writes as soon as a batch is full, or `flush_interval` seconds after
+    the oldest waiting ticket arrived. `save` returns the dict of
+    save_multiple_cpe_to_database. Its 'failed_rows' indexes are mapped
+    back to the tickets in the batch, so every ticket gets its own
+    success and failure counts; the save message is kept as the
+    ticket's batch_message.
+
+    At most `max_rows` rows wait at once. submit() blocks for room up to
+    its timeout, then raises QueueFullError. A ticket larger than
+    `max_rows` is still accepted once the queue is empty. close() stops
+    intake, writes everything still queued and stops the flusher.
+    Tickets live in this process only.
+    """
+
+    def __init__(self, save, max_rows=DEFAULT_QUEUE_ROWS, batch_rows=DEFAULT_BATCH_ROWS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.save = save
+        self.max_rows = max_rows
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._pending_rows = 0
+        self._tickets = OrderedDict()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._counters = {'submitted': 0, 'rejected': 0, 'batches': 0, 'rows_written': 0, 'rows_failed': 0}
+        self._thread = threading.Thread(target=self._run, name='cpe-write-behind', daemon=True)
+        self._thread.start()
+
+    def submit(self, records, timeout=DEFAULT_ENQUEUE_TIMEOUT):
+        """Queue records and return their ticket; blocks up to `timeout` while full"""
+        ticket = Ticket(list(records))
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise QueueClosedError('Write-behind queue is shutting down')
+                if not self._pending_rows or self._pending_rows + ticket.rows <= self.max_rows:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['rejected'] += 1
+                    raise QueueFullError(
+                        f'Write-behind queue is full ({self._pending_rows} of {self.max_rows} rows waiting)'
+                    )
+                self._cond.wait(remaining)
+            self._pending.append((ticket, time.monotonic()))
+            self._pending_rows += ticket.rows
+            self._tickets[ticket.id] = ticket
+            self._counters['submitted'] += 1
+            self._forget_finished()
+            self._cond.notify_all()
+        return ticket
+
+    def get(self, ticket_id):
+        with self._cond:
+            return self._tickets.get(ticket_id)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending_tickets': len(self._pending),
+                'pending_rows': self._pending_rows,
+                'max_rows': self.max_rows,
+                'batch_rows': self.batch_rows,
+                'closed': self._closed,
+                **self._counters
+            }
+
+    def close(self, timeout=None):
+        """Stop accepting rows, write what is queued, and stop the flusher"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _forget_finished(self):
+        finished = [ticket_id for ticket_id, ticket in self._tickets.items() if ticket.done]
+        for ticket_id in finished[:max(0, len(finished) - MAX_FINISHED_TICKETS)]:
+            del self._tickets[ticket_id]
+
+    def _next_batch(self):
+        # Wait until a batch is full, the oldest ticket is due, or we are closing
+        with self._cond:
+            while True:
+                if self._pending:
+                    due = self._pending[0][1] + self.flush_interval
+                    if self._closed or self._pending_rows >= self.batch_rows or time.monotonic() >= due:
+                        break
+                    self._cond.wait(due - time.monotonic())
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+
+            batch = []
+            rows = 0
+            while self._pending and (not batch or rows + self._pending[0][0].rows <= self.batch_rows):
+                ticket, _ = self._pending.popleft()
+                ticket.status = 'writing'
+                batch.append(ticket)
+                rows += ticket.rows
+            self._pending_rows -= rows
+            # Room has opened up for blocked submitters
+            self._cond.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        records = []
+        for ticket in batch:
+            records.extend(ticket.records)
+        try:
+            result = self.save(records)
+            failed_rows = result.get('failed_rows', [])
+            message = result.get('message', '')
+        except Exception as e:
+            failed_rows = range(len(records))
+            message = str(e)
+
+        start = 0
+        with self._cond:
+            for ticket in batch:
+                end = start + ticket.rows
+                ticket.failed = bisect_left(failed_rows, end) - bisect_left(failed_rows, start)
+                ticket.success = ticket.rows - ticket.failed
+                ticket.status = 'failed' if ticket.rows and not ticket.success else 'completed'
+                ticket.batch_message = message
+                ticket.batch_rows = len(records)
+                ticket.records = None
+                ticket.finished = time.time()
+                start = end
+            self._counters['batches'] += 1
+            self._counters['rows_failed'] += len(failed_rows)
+            self._counters['rows_written'] += len(records) - len(failed_rows)